@@ -0,0 +1,324 @@
+"""Prueba de carga: N sesiones concurrentes recorren el flujo completo de app.py con un LLM falso.
+
+Cada sesión es un AppTest independiente (su propio st.session_state) dentro del mismo proceso, así que
+comparten lo mismo que las sesiones reales de un servidor de Streamlit: el gobernador, la caché, el pool
+de feedback y las métricas. El flujo por sesión es:
+
+    carga_inicial -> comenzar -> responder_pregunta x10 -> editar -> guardar_edicion -> generar_pitch
+
+Uso:
+    python benchmarks/bench_carga.py --sesiones 10 --latencia 0.5 --jitter 0.2 --tasa-error 0.05
+    python benchmarks/bench_carga.py --sesiones 20 --modo fondo --etiqueta pool-8   # p. ej. con CONSULTOR_HILOS_FEEDBACK=8
+
+Cada ejecución se añade como una línea a benchmarks/resultados/carga.jsonl junto con el commit actual, y
+se compara con la última ejecución anterior con la misma configuración para que las regresiones salten a la vista.
+El historial es local de cada máquina: benchmarks/resultados/ está en .gitignore.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_RESULTADOS = os.path.join(RAIZ, "benchmarks", "resultados", "carga.jsonl")
+
+PASOS = ("carga_inicial", "comenzar", "responder_pregunta", "editar", "guardar_edicion", "generar_pitch")
+PREFIJOS_ERROR = ("Hubo un error", "Error", "Se ha excedido la cuota")
+
+# Vocabulario para respuestas "buenas" (rama C del triaje), distintas en cada sesión para no acertar en caché.
+VOCABULARIO = (
+    "clientes familias barrio pedidos domicilio entrega semanal suscripcion precio margen costo proveedores "
+    "calidad artesanal local digital instagram whatsapp tienda feria alianzas gimnasios colegios empresas "
+    "jovenes adultos estudiantes ingresos ventas mensuales inversion equipo socio contador inventario permisos "
+    "registro marca diferenciacion competencia confianza garantia servicio rapido saludable sostenible reciclado"
+).split()
+
+MODOS = {
+    # modo: variables de entorno que app.py lee en cada rerun
+    "streaming": {"CONSULTOR_STREAMING": "1", "CONSULTOR_FEEDBACK_FONDO": "0"},
+    "bloqueante": {"CONSULTOR_STREAMING": "0", "CONSULTOR_FEEDBACK_FONDO": "0"},
+    "fondo": {"CONSULTOR_FEEDBACK_FONDO": "1"},
+}
+
+
+def _compartir_runtime():
+    """Permite varios AppTest.run() a la vez en el mismo proceso.
+
+    AppTest está pensado para una sola sesión: en cada run() crea un Runtime simulado, lo publica en
+    Runtime._instance, parchea la opción global.appTest y al terminar lo deja todo en None. Con varias
+    sesiones en paralelo, la primera que termina deja sin Runtime a las demás. Aquí se instala un único
+    Runtime simulado para todo el proceso (como en un servidor real, con caché y archivos compartidos)
+    y AppTest pasa a escribir en una clase de relleno.
+
+    También se comparte la caché de bytecode del script, como hace el servidor: AppTest recompila app.py
+    en cada run(), y compilar mientras otros hilos hacen exec() dispara un fallo de CPython 3.11
+    ("AST constructor recursion depth mismatch").
+    """
+    from contextlib import nullcontext
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    compartido = MagicMock(spec=Runtime)
+    compartido.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    compartido.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = compartido
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+
+    class _RuntimePorSesion:
+        _instance = None
+
+    app_test.Runtime = _RuntimePorSesion
+    cache_guion = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: cache_guion
+    app_test.patch_config_options = lambda opciones: nullcontext()
+
+
+def _respuesta(azar, palabras=35):
+    return " ".join(azar.choice(VOCABULARIO) for _ in range(palabras)).capitalize() + "."
+
+
+def _memoria_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource  # Fuera de Linux: pico de memoria, no la actual
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Sesion:
+    """Un emprendedor simulado que recorre la app de principio a fin."""
+
+    def __init__(self, numero, app, semilla, pausa):
+        from streamlit.testing.v1 import AppTest
+
+        self.numero = numero
+        self.app = AppTest.from_file(app, default_timeout=300)
+        self.azar = random.Random(semilla * 1000 + numero)
+        self.pausa = pausa
+        self.tiempos = {paso: [] for paso in PASOS}
+        self.error = None
+
+    def _paso(self, paso, accion):
+        if self.pausa:
+            time.sleep(self.azar.uniform(0, 2 * self.pausa))  # Tiempo de lectura/escritura del usuario
+        inicio = time.perf_counter()
+        accion()
+        self.app.run()
+        self.tiempos[paso].append(time.perf_counter() - inicio)
+        if self.app.exception:
+            raise RuntimeError(f"Excepción en app.py durante '{paso}': {self.app.exception[0].message}")
+
+    def recorrer(self):
+        at = self.app
+        try:
+            self._paso("carga_inicial", lambda: None)
+            at.text_input[0].input(f"Emprendimiento {self.numero}")
+            at.text_input[1].input(f"Fundador {self.numero}")
+            self._paso("comenzar", at.button(key="comenzar_btn_manual").click)
+            for q_id in range(1, 11):
+                at.text_area(key=f"respuesta_q{q_id}").input(_respuesta(self.azar))
+                self._paso("responder_pregunta", at.button(key=f"siguiente_q_manual{q_id}").click)
+            self._paso("editar", at.button(key="edit_btn_manual_1").click)
+            at.text_area(key="respuesta_q1").input(_respuesta(self.azar))
+            self._paso("guardar_edicion", at.button(key="siguiente_q_manual1").click)
+            self._paso("generar_pitch", at.button(key="completado_final_manual_v2").click)
+            if not at.session_state.resumen_y_pitch:
+                raise RuntimeError("La sesión terminó sin resumen y pitch.")
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        return self
+
+    def feedback_con_error(self):
+        try:
+            feedback = self.app.session_state.feedback_consultor
+        except Exception:
+            return 0
+        return sum(str(texto).startswith(PREFIJOS_ERROR) for texto in feedback.values())
+
+
+def ejecutar(app, sesiones, latencia, jitter, tasa_error, modo, semilla=1, rampa=0.0, pausa=0.0, con_cache=False, etiqueta=None):
+    os.environ.setdefault("GOOGLE_API_KEY", "clave-benchmark")
+    os.environ.update(MODOS[modo])
+    if not con_cache:
+        os.environ["CONSULTOR_CACHE"] = "0"
+    for ruta in (os.path.dirname(app), RAIZ):
+        if ruta not in sys.path:
+            sys.path.insert(0, ruta)
+    os.chdir(os.path.dirname(app))  # app.py carga static/style.css con ruta relativa
+
+    import consultor_ia
+    from gobernador_llm import configurar_gobernador
+    from llm_falso import LLMFalso
+
+    _compartir_runtime()
+    # Calentamiento: una sesión completa sin latencia importa todo lo que la app carga de forma perezosa
+    # (LangChain, componentes de Streamlit...), para que no cuente como memoria ni tiempo de las sesiones.
+    consultor_ia.fijar_llm(LLMFalso())
+    calentamiento = Sesion(-1, app, semilla, 0).recorrer()
+    if calentamiento.error:
+        raise RuntimeError(f"La sesión de calentamiento falló: {calentamiento.error}")
+    del calentamiento
+
+    llm = LLMFalso(latencia=latencia, jitter=jitter, tasa_error=tasa_error, semilla=semilla)
+    consultor_ia.fijar_llm(llm)
+    # Sin cuota que proteger, pero con reintentos y cortacircuitos reales; el backoff se acorta para no medir esperas.
+    configurar_gobernador(rpm=0, tpm=0, backoff_base=0.05, backoff_max=0.5)
+
+    memoria_inicial = _memoria_rss_mb()
+    lista = [Sesion(n, app, semilla, pausa) for n in range(sesiones)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sesiones, thread_name_prefix="sesion") as pool:
+        futuros = []
+        for sesion in lista:
+            futuros.append(pool.submit(sesion.recorrer))
+            if rampa:
+                time.sleep(rampa / sesiones)
+        for futuro in futuros:
+            futuro.result()
+    duracion = time.perf_counter() - inicio
+
+    if modo == "fondo":
+        # Espera a que el pool termine los feedbacks pendientes antes de contar errores.
+        limite = time.monotonic() + 60
+        while time.monotonic() < limite and any(s.app.session_state.feedback_fondo.pendientes() for s in lista if not s.error):
+            time.sleep(0.1)
+    # Las sesiones siguen vivas (con su session_state) al medir la memoria.
+    memoria_final = _memoria_rss_mb()
+
+    completadas = [s for s in lista if not s.error]
+    pasos = {}
+    for paso in PASOS:
+        tiempos = [t for s in lista for t in s.tiempos[paso]]
+        pasos[paso] = {
+            "n": len(tiempos),
+            "p50_ms": _percentil(tiempos, 50) * 1000,
+            "p95_ms": _percentil(tiempos, 95) * 1000,
+            "p99_ms": _percentil(tiempos, 99) * 1000,
+        }
+    total_pasos = sum(p["n"] for p in pasos.values())
+    return {
+        "commit": _commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "configuracion": {
+            "sesiones": sesiones, "latencia": latencia, "jitter": jitter, "tasa_error": tasa_error,
+            "modo": modo, "semilla": semilla, "rampa": rampa, "pausa": pausa, "con_cache": con_cache,
+            "etiqueta": etiqueta,
+        },
+        "duracion_s": duracion,
+        "sesiones_completadas": len(completadas),
+        "sesiones_fallidas": [{"sesion": s.numero, "error": s.error} for s in lista if s.error],
+        "sesiones_por_minuto": len(completadas) / duracion * 60 if duracion > 0 else 0.0,
+        "pasos_por_segundo": total_pasos / duracion if duracion > 0 else 0.0,
+        "pasos": pasos,
+        "memoria_mb": {
+            "inicial": memoria_inicial,
+            "final": memoria_final,
+            "por_sesion": (memoria_final - memoria_inicial) / sesiones if sesiones else 0.0,
+        },
+        "llm": {"llamadas": llm.llamadas, "errores_inyectados": llm.errores_inyectados},
+        "feedback_con_error": sum(s.feedback_con_error() for s in lista),
+    }
+
+
+def guardar(resultado, ruta=RUTA_RESULTADOS):
+    """Añade el resultado al historial y devuelve la ejecución anterior con la misma configuración (o None)."""
+    anterior = None
+    if os.path.exists(ruta):
+        with open(ruta, encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue
+                if registro.get("configuracion") == resultado["configuracion"]:
+                    anterior = registro
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    return anterior
+
+
+def _variacion(actual, anterior):
+    if not anterior:
+        return ""
+    return f" ({(actual - anterior) / anterior:+.0%} vs {anterior:.0f})"
+
+
+def imprimir(resultado, anterior=None):
+    c = resultado["configuracion"]
+    print(f"Commit {resultado['commit']} | {c['sesiones']} sesiones, modo {c['modo']}, latencia {c['latencia']} s ± {c['jitter']} s, errores {c['tasa_error']:.0%}")
+    if anterior:
+        print(f"Comparado con {anterior['commit']} ({anterior['fecha']})")
+    print(f"Duración {resultado['duracion_s']:.1f} s | {resultado['sesiones_completadas']}/{c['sesiones']} sesiones completas | "
+          f"{resultado['sesiones_por_minuto']:.1f} sesiones/min | {resultado['pasos_por_segundo']:.1f} pasos/s")
+    print(f"{'paso':<20}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for paso, datos in resultado["pasos"].items():
+        antes = anterior["pasos"].get(paso, {}).get("p95_ms") if anterior else None
+        print(f"{paso:<20}{datos['n']:>6}{datos['p50_ms']:>10.0f}{datos['p95_ms']:>10.0f}{datos['p99_ms']:>10.0f}{_variacion(datos['p95_ms'], antes)}")
+    memoria = resultado["memoria_mb"]
+    print(f"Memoria: {memoria['inicial']:.0f} -> {memoria['final']:.0f} MB ({memoria['por_sesion']:.2f} MB por sesión)")
+    print(f"LLM falso: {resultado['llm']['llamadas']} llamadas, {resultado['llm']['errores_inyectados']} errores inyectados; "
+          f"{resultado['feedback_con_error']} feedbacks mostraron error al usuario")
+    for fallo in resultado["sesiones_fallidas"]:
+        print(f"  Sesión {fallo['sesion']} falló: {fallo['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(RAIZ, "app.py"))
+    parser.add_argument("--sesiones", type=int, default=10, help="Sesiones concurrentes (por defecto 10)")
+    parser.add_argument("--latencia", type=float, default=0.5, help="Latencia media por llamada del LLM falso, en segundos")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variación uniforme ± de la latencia, en segundos")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Probabilidad de que una llamada falle con un 503")
+    parser.add_argument("--modo", choices=sorted(MODOS), default="streaming", help="Cómo se genera el feedback por pregunta")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--rampa", type=float, default=0.0, help="Segundos en los que se reparten los arranques de las sesiones")
+    parser.add_argument("--pausa", type=float, default=0.0, help="Tiempo medio de 'pensar' del usuario entre pasos, en segundos")
+    parser.add_argument("--con-cache", action="store_true", help="Deja activa la caché de respuestas de la IA")
+    parser.add_argument("--etiqueta", help="Nombre libre para distinguir variantes (p. ej. otra configuración de entorno)")
+    parser.add_argument("--no-guardar", action="store_true", help="No añade el resultado a benchmarks/resultados/carga.jsonl")
+    args = parser.parse_args()
+
+    resultado = ejecutar(
+        os.path.abspath(args.app), args.sesiones, args.latencia, args.jitter, args.tasa_error, args.modo,
+        semilla=args.semilla, rampa=args.rampa, pausa=args.pausa, con_cache=args.con_cache,
+        etiqueta=args.etiqueta,
+    )
+    anterior = None if args.no_guardar else guardar(resultado)
+    imprimir(resultado, anterior)
+    return 0 if not resultado["sesiones_fallidas"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
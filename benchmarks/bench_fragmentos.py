@@ -0,0 +1,226 @@
+"""Mide lo que cuesta cada interacción en app.py: duración del rerun y bytes enviados al navegador.
+
+AppTest siempre ejecuta el script completo, así que aquí se reproduce lo que hace el navegador con los
+fragmentos: si el widget que dispara la interacción se pintó dentro de un st.fragment, se pide un rerun
+solo de ese fragmento (con su fragment_id); si no, un rerun completo. Los fragmentos registrados se
+conservan entre reruns de la misma sesión, como en el servidor. Los bytes son la suma de los ForwardMsg
+que produce el rerun (deltas, eventos de inicio/fin...), antes de comprimir el websocket.
+
+Escenarios (cada uno se repite --repeticiones veces desde el mismo estado):
+    escribir_respuesta   cambiar el texto de la respuesta en la tarjeta de pregunta
+    generar_pitch        pulsar "Generar Resumen y Pitch" en el resumen (LLM falso sin latencia)
+    editar               pulsar "Editar" en una tarjeta del resumen (navega: siempre hay rerun completo)
+
+Uso:
+    python benchmarks/bench_fragmentos.py [--app RUTA/app.py] [--repeticiones 20]
+
+Para comparar con una versión sin fragmentos: `git worktree add /tmp/antes <commit>` y --app /tmp/antes/app.py.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from urllib import parse
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ESCENARIOS = ("escribir_respuesta", "generar_pitch", "editar")
+
+# Texto del LLM falso con la longitud de un feedback real de Gemini, para que las tarjetas pesen lo que pesan.
+TEXTO_FEEDBACK = (
+    "Tu respuesta muestra una idea clara del problema que quieres resolver y de las personas a las que te diriges. "
+    "Para fortalecerla, piensa en qué te diferencia de las alternativas que tu cliente ya usa hoy y en cómo lo vas a "
+    "comprobar con tus primeros clientes. ¿Qué evidencia tienes de que están dispuestos a pagar por ello? "
+) * 4
+RESPUESTA = (
+    "Vendemos pan artesanal sin gluten a familias del barrio con entrega semanal a domicilio, con suscripción "
+    "mensual y pedidos por WhatsApp; nos diferenciamos por la calidad, la confianza y el precio justo."
+)
+
+
+def _preparar_entorno(directorio_app):
+    os.environ.setdefault("GOOGLE_API_KEY", "clave-benchmark")
+    os.environ["CONSULTOR_CACHE"] = "0"
+    os.environ["CONSULTOR_SESIONES"] = "0"
+    os.environ["CONSULTOR_FEEDBACK_FONDO"] = "0"
+    for ruta in (directorio_app, RAIZ):
+        if ruta not in sys.path:
+            sys.path.insert(0, ruta)
+    os.chdir(directorio_app)  # app.py carga static/style.css con ruta relativa
+
+
+def _instalar_runner():
+    """Sustituye el LocalScriptRunner de AppTest por uno que conserva los fragmentos y admite reruns parciales.
+
+    Devuelve un dict de control: en "fragmento" se deja el fragment_id del próximo run() (o None) y en
+    "runner" queda el último runner, con sus ForwardMsg.
+    """
+    from streamlit.runtime.fragment import MemoryFragmentStorage
+    from streamlit.runtime.scriptrunner import RerunData, ScriptRunnerEvent
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.testing.v1.element_tree import parse_tree_from_messages
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner, require_widgets_deltas
+
+    FINALES = {
+        ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS, ScriptRunnerEvent.SCRIPT_STOPPED_WITH_COMPILE_ERROR,
+        ScriptRunnerEvent.SCRIPT_STOPPED_FOR_RERUN, ScriptRunnerEvent.FRAGMENT_STOPPED_WITH_SUCCESS,
+    }
+    control = {"fragmento": None, "runner": None}
+    almacenes = {}
+
+    class RunnerConFragmentos(LocalScriptRunner):
+        def __init__(self, script_path, session_state, *args, **kwargs):
+            super().__init__(script_path, session_state, *args, **kwargs)
+            self._fragment_storage = almacenes.setdefault(id(session_state), MemoryFragmentStorage())
+            self.tiempo_script = 0.0
+            self.on_event.connect(self._cronometrar, weak=False)
+            control["runner"] = self
+
+        def _cronometrar(self, sender, event, **kwargs):
+            # Tiempo ejecutando app.py (o el fragmento), sin el arranque del hilo ni el gc posterior.
+            if event == ScriptRunnerEvent.SCRIPT_STARTED:
+                self._inicio_script = time.perf_counter()
+            elif event in FINALES:
+                self.tiempo_script += time.perf_counter() - self._inicio_script
+
+        def run(self, widget_state=None, query_params=None, timeout=3, page_hash=""):
+            fragmento, control["fragmento"] = control["fragmento"], None
+            self.request_rerun(RerunData(
+                widget_states=widget_state,
+                query_string=parse.urlencode(query_params, doseq=True) if query_params else "",
+                page_script_hash=page_hash,
+                fragment_id_queue=[fragmento] if fragmento else [],
+                is_fragment_scoped_rerun=bool(fragmento),
+            ))
+            if not self._script_thread:
+                self.start()
+            require_widgets_deltas(self, timeout)
+            return parse_tree_from_messages(self.forward_msgs())
+
+    app_test.LocalScriptRunner = RunnerConFragmentos
+    # Como en el servidor, app.py se compila una vez y no en cada rerun (AppTest crea una caché por run).
+    cache_guion = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: cache_guion
+    return control
+
+
+def _fragmentos_por_widget(mensajes):
+    """{id de widget: fragment_id} de los widgets que se pintaron dentro de un fragmento."""
+    fragmentos = {}
+    for mensaje in mensajes:
+        if mensaje.WhichOneof("type") != "delta" or not mensaje.delta.fragment_id:
+            continue
+        elemento = mensaje.delta.new_element
+        tipo = elemento.WhichOneof("type")
+        widget = getattr(elemento, tipo, None) if tipo else None
+        if widget is not None and getattr(widget, "id", ""):
+            fragmentos[widget.id] = mensaje.delta.fragment_id
+    return fragmentos
+
+
+class Medidor:
+    def __init__(self, app):
+        from streamlit.testing.v1 import AppTest
+
+        self.control = _instalar_runner()
+        self.at = AppTest.from_file(app, default_timeout=60)
+        self.fragmentos = {}
+
+    def run(self):
+        """Rerun completo sin medir; deja el árbol de elementos completo y los fragmentos registrados."""
+        self.at.run()
+        self._comprobar()
+        self.fragmentos = _fragmentos_por_widget(self.control["runner"].forward_msgs())
+
+    def interactuar(self, widget):
+        """Ejecuta la interacción ya aplicada sobre widget (click, input...) como lo haría el navegador."""
+        fragmento = self.fragmentos.get(widget.id)
+        self.control["fragmento"] = fragmento
+        inicio = time.perf_counter()
+        self.at.run()
+        duracion = time.perf_counter() - inicio
+        self._comprobar()
+        runner = self.control["runner"]
+        total_bytes = sum(mensaje.ByteSize() for mensaje in runner.forward_msgs())
+        return {"total": duracion, "script": runner.tiempo_script, "bytes": total_bytes, "fragmento": fragmento is not None}
+
+    def _comprobar(self):
+        if self.at.exception:
+            raise RuntimeError(f"Excepción en app.py: {self.at.exception[0].message}")
+
+
+def _llegar_al_resumen(medidor):
+    at = medidor.at
+    medidor.run()
+    at.text_input[0].input("Benchmark S.A.S.")
+    at.text_input[1].input("Ana")
+    at.button(key="comenzar_btn_manual").click()
+    medidor.run()
+    for q_id in range(1, 11):
+        at.text_area(key=f"respuesta_q{q_id}").input(f"{RESPUESTA} ({q_id})")
+        at.button(key=f"siguiente_q_manual{q_id}").click()
+        medidor.run()
+
+
+def medir(app, repeticiones):
+    import consultor_ia
+    from gobernador_llm import configurar_gobernador
+    from llm_falso import LLMFalso
+
+    consultor_ia.fijar_llm(LLMFalso(texto=TEXTO_FEEDBACK))
+    # Sin límites de cuota: solo se mide el rerun, no las esperas del gobernador.
+    configurar_gobernador(rpm=0, tpm=0)
+    resultados = {escenario: [] for escenario in ESCENARIOS}
+
+    # escribir_respuesta: en la pregunta 1, cada repetición escribe un texto distinto.
+    medidor = Medidor(app)
+    medidor.run()
+    medidor.at.text_input[0].input("Benchmark S.A.S.")
+    medidor.at.text_input[1].input("Ana")
+    medidor.at.button(key="comenzar_btn_manual").click()
+    medidor.run()
+    for n in range(repeticiones):
+        widget = medidor.at.text_area(key="respuesta_q1").input(f"{RESPUESTA} v{n}")
+        resultados["escribir_respuesta"].append(medidor.interactuar(widget))
+        medidor.run()
+
+    # generar_pitch y editar: en el resumen, con las 10 respuestas y su feedback.
+    medidor = Medidor(app)
+    _llegar_al_resumen(medidor)
+    for _ in range(repeticiones):
+        widget = medidor.at.button(key="completado_final_manual_v2").click()
+        resultados["generar_pitch"].append(medidor.interactuar(widget))
+        medidor.run()
+    for _ in range(repeticiones):
+        widget = medidor.at.button(key="edit_btn_manual_5").click()
+        resultados["editar"].append(medidor.interactuar(widget))
+        # Vuelve al resumen guardando la edición (sin medir).
+        medidor.at.button(key="siguiente_q_manual5").click()
+        medidor.run()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(RAIZ, "app.py"))
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    app = os.path.abspath(args.app)
+    _preparar_entorno(os.path.dirname(app))
+    resultados = medir(app, args.repeticiones)
+
+    print(f"app: {app}")
+    for escenario, medidas in resultados.items():
+        mediana = {clave: statistics.median(m[clave] for m in medidas) for clave in ("total", "script", "bytes")}
+        parciales = sum(m["fragmento"] for m in medidas)
+        print(
+            f"{escenario}: rerun p50 {mediana['total'] * 1000:.1f} ms (script {mediana['script'] * 1000:.1f} ms) | "
+            f"{mediana['bytes'] / 1024:.1f} KiB enviados | reruns de fragmento {parciales}/{len(medidas)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Mide el coste de un rerun de app.py y el arranque en frío del proceso, con un LLM falso.
+
+Uso:
+    python benchmarks/bench_inicializacion.py [--app RUTA/app.py] [--reruns 30] [--arranques 5]
+
+Para comparar con una versión anterior basta con extraerla (p. ej. `git worktree add /tmp/antes <commit>`)
+y pasar --app /tmp/antes/app.py.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Código que ejecuta cada proceso de arranque en frío: importa Streamlit y pinta la primera pantalla.
+CODIGO_ARRANQUE = """
+import sys
+sys.path.insert(0, {directorio!r})
+from streamlit.testing.v1 import AppTest
+AppTest.from_file({app!r}, default_timeout=60).run()
+"""
+
+
+def _preparar_entorno(directorio_app):
+    # Una clave ficticia basta: ni el cliente real ni el falso llegan a llamar a la red en estos escenarios.
+    os.environ.setdefault("GOOGLE_API_KEY", "clave-benchmark")
+    for ruta in (directorio_app, RAIZ):
+        if ruta not in sys.path:
+            sys.path.insert(0, ruta)
+
+
+def medir_reruns(app, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    try:
+        import consultor_ia
+        from llm_falso import LLMFalso
+        consultor_ia.fijar_llm(LLMFalso())
+    except ImportError:
+        pass  # Versiones anteriores de app.py no admiten LLM inyectado.
+
+    at = AppTest.from_file(app, default_timeout=60).run()
+    at.text_input[0].input("Benchmark S.A.S.")
+    at.text_input[1].input("Ana")
+    at.button[0].click().run()
+
+    tiempos = []
+    for _ in range(reruns):
+        inicio = time.perf_counter()
+        at.run()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def medir_arranques(app, arranques):
+    codigo = CODIGO_ARRANQUE.format(directorio=os.path.dirname(app), app=app)
+    tiempos = []
+    for _ in range(arranques):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, "-c", codigo], check=True, capture_output=True, cwd=os.path.dirname(app))
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def _resumen(nombre, tiempos):
+    ordenados = sorted(tiempos)
+    p95 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))]
+    print(f"{nombre}: media {statistics.mean(tiempos) * 1000:.1f} ms | p50 {statistics.median(tiempos) * 1000:.1f} ms | p95 {p95 * 1000:.1f} ms (n={len(tiempos)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(RAIZ, "app.py"))
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--arranques", type=int, default=5)
+    args = parser.parse_args()
+
+    app = os.path.abspath(args.app)
+    _preparar_entorno(os.path.dirname(app))
+    os.chdir(os.path.dirname(app))  # app.py carga static/style.css con ruta relativa
+
+    print(f"App: {app}")
+    _resumen("Rerun (vista de pregunta)", medir_reruns(app, args.reruns))
+    _resumen("Arranque en frío del proceso", medir_arranques(app, args.arranques))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Prueba de estrés de pasarela_llm: muchos hilos llamando a la vez al LLM a través de consultor_ia.
+
+Cada hilo simula una sesión (o un trabajador de cli_cohortes) que hace --peticiones llamadas, mitad
+invoke y mitad stream (--streaming), con prompts elegidos al azar de un conjunto pequeño
+(--prompts-distintos), así que muchas llamadas idénticas coinciden en el tiempo. El LLM falso es
+asíncrono (ainvoke/astream con asyncio.sleep), como el cliente real de LangChain.
+
+Se mide, con y sin pasarela (la ruta sin pasarela hace la llamada síncrona desde cada hilo):
+    - peticiones al LLM frente a llamadas de los hilos (coalescencia)
+    - máximo de llamadas simultáneas que llegan al LLM (no puede superar --max-en-vuelo)
+    - latencia p50/p95/p99 por llamada y llamadas por segundo
+    - hilos vivos del proceso
+
+Termina con código 1 si se rompe alguna invariante: límite de concurrencia superado, una respuesta
+distinta de la del LLM, llamadas que quedan en vuelo al terminar o más peticiones al LLM que llamadas.
+
+Uso:
+    python benchmarks/bench_pasarela.py --hilos 64 --peticiones 8 --latencia 0.3 --jitter 0.1
+    python benchmarks/bench_pasarela.py --hilos 200 --max-en-vuelo 16 --tasa-error 0.05 --solo-pasarela
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def ejecutar(args, con_pasarela):
+    import consultor_ia
+    from gobernador_llm import configurar_gobernador
+    from llm_falso import LLMFalso
+    from pasarela_llm import configurar_pasarela
+    from prompts_consultor import Prompt
+    from registro_modelos import NIVEL_RAPIDO, configurar_registro
+
+    llm = LLMFalso(latencia=args.latencia, jitter=args.jitter, tasa_error=args.tasa_error, semilla=args.semilla)
+    consultor_ia.fijar_llm(llm)
+    # Un solo modelo y sin límites del gobernador: el único límite que se prueba es el de la pasarela.
+    configurar_registro(candidatos={NIVEL_RAPIDO: ["modelo-falso"]}, ruta_catalogo=None)
+    configurar_gobernador(rpm=0, tpm=0, concurrencia_max=10_000, reintentos=0, circuito_fallos=10_000)
+    pasarela = configurar_pasarela(max_en_vuelo=args.max_en_vuelo)
+    consultor_ia.PASARELA_ACTIVA = con_pasarela
+
+    prompts = [Prompt("Eres un consultor de emprendimientos.", f"Respuesta de prueba número {n}.") for n in range(args.prompts_distintos)]
+    latencias, errores, distintas = [], [], []
+    lock = threading.Lock()
+    barrera = threading.Barrier(args.hilos)
+    max_hilos = [threading.active_count()]
+
+    def trabajador(indice):
+        azar = random.Random(args.semilla * 1000 + indice)
+        barrera.wait()  # Todos arrancan a la vez para maximizar las llamadas coincidentes
+        for _ in range(args.peticiones):
+            prompt = azar.choice(prompts)
+            inicio = time.perf_counter()
+            try:
+                if azar.random() < args.streaming:
+                    texto = "".join(consultor_ia._texto_chunk(c) for c in consultor_ia._transmitir(NIVEL_RAPIDO, "estres", prompt))
+                else:
+                    texto = consultor_ia._texto_chunk(consultor_ia._invocar(NIVEL_RAPIDO, "estres", prompt))
+            except Exception as e:
+                with lock:
+                    errores.append(type(e).__name__)
+                continue
+            with lock:
+                latencias.append(time.perf_counter() - inicio)
+                max_hilos[0] = max(max_hilos[0], threading.active_count())
+                if texto != llm.texto:
+                    distintas.append(texto)
+
+    hilos = [threading.Thread(target=trabajador, args=(i,), name=f"estres-{i}") for i in range(args.hilos)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - inicio
+    estadisticas = pasarela.estadisticas()
+
+    llamadas = args.hilos * args.peticiones
+    resultado = {
+        "modo": "pasarela" if con_pasarela else "directo",
+        "llamadas": llamadas,
+        "peticiones_llm": llm.llamadas,
+        "max_simultaneas_llm": llm.max_en_curso,
+        "errores": len(errores),
+        "p50_ms": _percentil(latencias, 50) * 1000,
+        "p95_ms": _percentil(latencias, 95) * 1000,
+        "p99_ms": _percentil(latencias, 99) * 1000,
+        "por_segundo": llamadas / total,
+        "hilos_max": max_hilos[0],
+    }
+    fallos = []
+    if distintas:
+        fallos.append(f"{len(distintas)} respuestas distintas de la del LLM")
+    if llm.llamadas > llamadas:
+        fallos.append(f"{llm.llamadas} peticiones al LLM para {llamadas} llamadas")
+    if con_pasarela:
+        if llm.max_en_curso > args.max_en_vuelo:
+            fallos.append(f"{llm.max_en_curso} llamadas simultáneas al LLM con límite {args.max_en_vuelo}")
+        time.sleep(0.1)  # Deja que el bucle procese las cancelaciones pendientes
+        if pasarela.estadisticas()["en_vuelo"]:
+            fallos.append(f"{pasarela.estadisticas()['en_vuelo']} llamadas siguen en vuelo al terminar")
+        resultado["coalescidas"] = estadisticas["coalescidas"]
+    return resultado, fallos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hilos", type=int, default=64)
+    parser.add_argument("--peticiones", type=int, default=8, help="llamadas por hilo")
+    parser.add_argument("--prompts-distintos", type=int, default=10)
+    parser.add_argument("--streaming", type=float, default=0.5, help="fracción de llamadas en streaming")
+    parser.add_argument("--latencia", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--tasa-error", type=float, default=0.0)
+    parser.add_argument("--max-en-vuelo", type=int, default=16)
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--solo-pasarela", action="store_true", help="no medir la ruta sin pasarela")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "clave-benchmark")
+    os.environ["CONSULTOR_CACHE"] = "0"
+    sys.path.insert(0, RAIZ)
+
+    modos = (True,) if args.solo_pasarela else (False, True)
+    todos_los_fallos = []
+    print(f"{args.hilos} hilos x {args.peticiones} llamadas, {args.prompts_distintos} prompts distintos, "
+          f"latencia {args.latencia}±{args.jitter} s, límite de la pasarela {args.max_en_vuelo}")
+    print(f"{'modo':<10}{'llamadas':>10}{'al LLM':>9}{'máx. sim.':>11}{'errores':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'llam/s':>9}{'hilos':>7}")
+    for con_pasarela in modos:
+        resultado, fallos = ejecutar(args, con_pasarela)
+        todos_los_fallos += [f"{resultado['modo']}: {fallo}" for fallo in fallos]
+        print(
+            f"{resultado['modo']:<10}{resultado['llamadas']:>10}{resultado['peticiones_llm']:>9}"
+            f"{resultado['max_simultaneas_llm']:>11}{resultado['errores']:>9}{resultado['p50_ms']:>9.0f}"
+            f"{resultado['p95_ms']:>9.0f}{resultado['p99_ms']:>9.0f}{resultado['por_segundo']:>9.1f}{resultado['hilos_max']:>7}"
+        )
+    for fallo in todos_los_fallos:
+        print(f"FALLO {fallo}")
+    sys.exit(1 if todos_los_fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Cuenta los tokens que cada llamada al LLM envía a Gemini, por tipo de llamada.
+
+Recorre las funciones públicas de consultor_ia con un LLM falso que anota los mensajes que recibe, así
+que mide lo que de verdad sale hacia la API y sirve para cualquier versión del código:
+
+    feedback     las 10 preguntas con una respuesta corta, una media y una enorme (~3000 palabras)
+    resumen      resumen y pitch con un único prompt y como dos secciones, con respuestas completas
+                 y con digestos (modo incremental)
+
+Para cada tipo de llamada muestra las llamadas, los tokens medios por llamada (~4 caracteres por token,
+la misma estimación del gobernador), cuántos de ellos son la instrucción de sistema fija (la parte que
+Gemini puede reutilizar) y el máximo por llamada.
+
+Uso:
+    python benchmarks/bench_prompts.py                       # versión actual
+    python benchmarks/bench_prompts.py --raiz /tmp/antes     # otra versión (git worktree add /tmp/antes <commit>)
+"""
+import argparse
+import math
+import os
+import sys
+from collections import defaultdict
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESPUESTAS = {
+    "corta": "Vendemos pan artesanal a domicilio.",
+    "media": (
+        "Vendemos pan artesanal sin gluten a familias del barrio con entrega semanal a domicilio, con suscripción "
+        "mensual y pedidos por WhatsApp; nos diferenciamos por la calidad, la confianza y el precio justo. "
+        "Queremos empezar con 40 familias y llegar a 150 en un año, con un margen del 35% por pedido."
+    ),
+}
+RESPUESTAS["enorme"] = " ".join([RESPUESTAS["media"]] * 60)
+
+
+def _tokens(texto):
+    return math.ceil(len(texto) / 4)
+
+
+def _preparar(raiz):
+    os.environ.setdefault("GOOGLE_API_KEY", "clave-benchmark")
+    os.environ["CONSULTOR_CACHE"] = "0"
+    sys.path.insert(0, raiz)
+
+    from llm_falso import LLMFalso
+
+    class LLMQueAnota(LLMFalso):
+        """LLMFalso que guarda, por llamada, los tokens de sistema y totales de los mensajes recibidos."""
+
+        def __init__(self):
+            super().__init__()
+            self.anotaciones = []
+
+        def _anotar(self, messages):
+            sistema = sum(_tokens(m.content) for m in messages if type(m).__name__ == "SystemMessage")
+            self.anotaciones.append((sistema, sum(_tokens(m.content) for m in messages)))
+
+        def invoke(self, messages, **kwargs):
+            self._anotar(messages)
+            return super().invoke(messages, **kwargs)
+
+        def stream(self, messages, **kwargs):
+            self._anotar(messages)
+            return super().stream(messages, **kwargs)
+
+        async def ainvoke(self, messages, **kwargs):
+            self._anotar(messages)
+            return await super().ainvoke(messages, **kwargs)
+
+        def astream(self, messages, **kwargs):
+            self._anotar(messages)
+            return super().astream(messages, **kwargs)
+
+    import consultor_ia
+    from gobernador_llm import configurar_gobernador
+
+    configurar_gobernador(rpm=0, tpm=0)
+    llm = LLMQueAnota()
+    consultor_ia.fijar_llm(llm)
+    return consultor_ia, llm
+
+
+def medir(raiz):
+    consultor_ia, llm = _preparar(raiz)
+    preguntas = consultor_ia.preguntas_emprendimiento
+    por_tipo = defaultdict(list)
+
+    def registrar(tipo, accion):
+        antes = len(llm.anotaciones)
+        accion()
+        por_tipo[tipo] += llm.anotaciones[antes:]
+
+    for longitud, respuesta in RESPUESTAS.items():
+        for pregunta in preguntas:
+            registrar(f"feedback ({longitud})", lambda: consultor_ia.obtener_feedback_gemini(
+                pregunta["texto"], pregunta["detalle"], f"{respuesta} ({pregunta['id']})", "Pan de Casa", "Ana", 0,
+            ))
+    for longitud in ("media", "enorme"):
+        respuestas = {p["id"]: f"{RESPUESTAS[longitud]} ({p['id']})" for p in preguntas}
+        registrar(f"resumen y pitch, un prompt ({longitud})", lambda: consultor_ia.generar_resumen_y_pitch(
+            respuestas, preguntas, "Pan de Casa", "Ana",
+        ))
+        registrar(f"resumen y pitch, secciones ({longitud})", lambda: list(consultor_ia.transmitir_resumen_y_pitch(
+            respuestas, preguntas, "Pan de Casa", "Ana",
+        )))
+        registrar(f"resumen y pitch, con digestos ({longitud})", lambda: list(consultor_ia.transmitir_resumen_y_pitch(
+            respuestas, preguntas, "Pan de Casa", "Ana", digestos={},
+        )))
+    return por_tipo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--raiz", default=RAIZ, help="carpeta con la versión de consultor_ia a medir")
+    args = parser.parse_args()
+
+    raiz = os.path.abspath(args.raiz)
+    por_tipo = medir(raiz)
+    print(f"raíz: {raiz}")
+    print(f"{'llamada':<44}{'llamadas':>9}{'tokens/llamada':>16}{'de sistema':>12}{'máximo':>9}")
+    total_llamadas = total_tokens = total_sistema = 0
+    for tipo, anotaciones in por_tipo.items():
+        tokens = [total for _, total in anotaciones]
+        sistema = [parte for parte, _ in anotaciones]
+        total_llamadas += len(anotaciones)
+        total_tokens += sum(tokens)
+        total_sistema += sum(sistema)
+        if not anotaciones:
+            print(f"{tipo:<44}{0:>9}{'-':>16}{'-':>12}{'-':>9}")
+            continue
+        print(f"{tipo:<44}{len(anotaciones):>9}{sum(tokens) / len(tokens):>16.0f}"
+              f"{sum(sistema) / len(sistema):>12.0f}{max(tokens):>9}")
+    print(f"Total: {total_llamadas} llamadas, {total_tokens} tokens ({total_sistema} de instrucciones de sistema)")
+
+
+if __name__ == "__main__":
+    main()
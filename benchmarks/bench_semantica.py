@@ -0,0 +1,200 @@
+"""Mide la caché semántica del feedback (cache_semantica) con cohortes simuladas y sin red.
+
+Dos mediciones:
+    cohorte   --emprendedores contestan --preguntas preguntas eligiendo entre --ideas respuestas base, cada una
+              escrita con variaciones ("por Instagram" / "en instagram", tildes, mayúsculas, "a" / "para"...).
+              Se cuentan las llamadas al LLM solo con la caché exacta y con la exacta más la semántica, los
+              aciertos de cada una y los falsos aciertos (feedback servido de una idea base distinta). El LLM
+              falso responde citando la respuesta que recibe, así que cada feedback dice de qué idea salió.
+    búsqueda  latencia p50/p99 de una búsqueda con el índice lleno hasta 100, 1000 y --max-filas respuestas
+              distintas, y desalojos al seguir guardando con el índice lleno.
+
+Uso:
+    python benchmarks/bench_semantica.py
+    python benchmarks/bench_semantica.py --emprendedores 500 --umbral 0.9 --max-filas 5000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRODUCTOS = ["ropa de segunda mano", "pan sin gluten", "comida casera", "clases de robótica", "velas aromáticas",
+             "accesorios para mascotas", "café de especialidad", "muebles reciclados", "joyería artesanal",
+             "plantas de interior", "cosmética natural", "tortas por encargo"]
+CANALES = ["Instagram", "WhatsApp", "una tienda física", "ferias del barrio", "una página web"]
+PUBLICOS = ["jóvenes universitarios", "familias del barrio", "oficinas del centro", "turistas"]
+NOMBRES = ["Ana", "Luis", "Camila", "Jorge", "Valentina", "Mateo", "Sofía", "Diego"]
+
+
+def _idea(indice):
+    producto = PRODUCTOS[indice % len(PRODUCTOS)]
+    canal = CANALES[(indice // len(PRODUCTOS)) % len(CANALES)]
+    publico = PUBLICOS[(indice // (len(PRODUCTOS) * len(CANALES))) % len(PUBLICOS)]
+    return producto, canal, publico
+
+
+def _variante(idea, azar):
+    """La misma idea escrita como la escribiría otro emprendedor."""
+    producto, canal, publico = idea
+    verbo = azar.choice(["Vendemos", "vendemos", "Vender", "Vamos a vender", "Queremos vender"])
+    preposicion = azar.choice(["por", "en", "a través de"])
+    destinatario = azar.choice(["a", "para"])
+    texto = f"{verbo} {producto} {preposicion} {canal} {destinatario} {publico}"
+    if azar.random() < 0.3:
+        texto = texto.lower()
+    if azar.random() < 0.3:
+        texto = texto.replace("á", "a").replace("é", "e").replace("í", "i").replace("ó", "o").replace("ú", "u")
+    return texto + azar.choice(["", ".", "!"])
+
+
+def _preparar():
+    from llm_falso import LLMFalso
+
+    class LLMQueCita(LLMFalso):
+        """LLMFalso cuyo feedback saluda al emprendedor y cita la respuesta que recibe."""
+
+        def _responder(self, messages):
+            usuario = messages[-1].content
+            nombre = re.search(r"^Emprendedor: (.*)$", usuario, re.M).group(1)
+            respuesta = re.search(r'^Respuesta: "(.*)"$', usuario, re.M).group(1)
+            self.texto = f"¡Bien, {nombre}! Sobre «{respuesta}»: concreta un poco más a quién le vendes."
+
+        def invoke(self, messages, **kwargs):
+            self._responder(messages)
+            return super().invoke(messages, **kwargs)
+
+        def stream(self, messages, **kwargs):
+            self._responder(messages)
+            return super().stream(messages, **kwargs)
+
+        async def ainvoke(self, messages, **kwargs):
+            self._responder(messages)
+            return await super().ainvoke(messages, **kwargs)
+
+        def astream(self, messages, **kwargs):
+            self._responder(messages)
+            return super().astream(messages, **kwargs)
+
+    import consultor_ia
+    from gobernador_llm import configurar_gobernador
+
+    configurar_gobernador(rpm=0, tpm=0)
+    llm = LLMQueCita()
+    consultor_ia.fijar_llm(llm)
+    return consultor_ia, llm
+
+
+def medir_cohorte(args, con_semantica, carpeta):
+    import cache_ia
+    import cache_semantica
+
+    consultor_ia, llm = _preparar()
+    cache_ia._cache_global = cache_ia.CacheDosNiveles()  # Caché exacta vacía y solo en memoria para cada modo
+    cache_semantica._semantica_global = None
+    if con_semantica:
+        cache_semantica.configurar_cache_semantica(ruta=carpeta, umbral=args.umbral, max_filas=args.max_filas)
+    llamadas_antes = llm.llamadas
+
+    azar = random.Random(args.semilla)
+    preguntas = consultor_ia.preguntas_emprendimiento[:args.preguntas]
+    modos = {"cache": 0, "semantica": 0}
+    falsos = 0
+    idea_de_texto = {}
+    for emprendedor in range(args.emprendedores):
+        nombre = f"{azar.choice(NOMBRES)} {emprendedor}"
+        for pregunta in preguntas:
+            idea = _idea(azar.randrange(args.ideas))
+            respuesta = _variante(idea, azar)
+            idea_de_texto[respuesta] = idea
+            medicion = {}
+            feedback = consultor_ia.obtener_feedback_gemini(
+                pregunta["texto"], pregunta["detalle"], respuesta, f"Proyecto {emprendedor}", nombre, 0, medicion,
+            )
+            if medicion.get("modo") in modos:
+                modos[medicion["modo"]] += 1
+            # El feedback cita la respuesta que lo generó: si es de otra idea, el acierto semántico es falso.
+            if medicion.get("modo") == "semantica" and idea_de_texto[re.search(r"«(.*)»", feedback).group(1)] != idea:
+                falsos += 1
+    consultas = args.emprendedores * len(preguntas)
+    resultado = {
+        "modo": "exacta + semántica" if con_semantica else "solo exacta",
+        "consultas": consultas,
+        "llamadas_llm": llm.llamadas - llamadas_antes,
+        "aciertos_exacta": modos["cache"],
+        "aciertos_semantica": modos["semantica"],
+        "falsos": falsos,
+    }
+    if con_semantica:
+        resultado.update(cache_semantica.obtener_cache_semantica().estadisticas())
+    return resultado
+
+
+def medir_busqueda(args, carpeta):
+    import numpy as np
+
+    from cache_semantica import CacheSemantica
+
+    azar = random.Random(args.semilla)
+    cache = CacheSemantica(ruta=carpeta, umbral=args.umbral, max_filas=args.max_filas)
+    vocabulario = [f"{p} {c}".split() for p in PRODUCTOS for c in CANALES]
+    vocabulario = sorted({palabra for palabras in vocabulario for palabra in palabras} | {f"palabra{n}" for n in range(400)})
+
+    def respuesta_al_azar():
+        return " ".join(azar.choice(vocabulario) for _ in range(azar.randint(6, 30)))
+
+    filas = []
+    guardadas = 0
+    for objetivo in [n for n in (100, 1000) if n < args.max_filas] + [args.max_filas]:
+        while guardadas < objetivo:
+            cache.guardar(1, "C", "modelo-benchmark", respuesta_al_azar(), "feedback", "", "")
+            guardadas += 1
+        latencias = []
+        for _ in range(args.busquedas):
+            inicio = time.perf_counter()
+            cache.buscar(1, "C", "modelo-benchmark", respuesta_al_azar(), "", "")
+            latencias.append(time.perf_counter() - inicio)
+        filas.append((objetivo, np.percentile(latencias, 50) * 1000, np.percentile(latencias, 99) * 1000))
+    for _ in range(100):
+        cache.guardar(1, "C", "modelo-benchmark", respuesta_al_azar(), "feedback", "", "")
+    return filas, cache.estadisticas()["desalojos"], os.path.getsize(next(
+        os.path.join(carpeta, nombre) for nombre in os.listdir(carpeta) if nombre.endswith(".f32")
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emprendedores", type=int, default=200)
+    parser.add_argument("--preguntas", type=int, default=3)
+    parser.add_argument("--ideas", type=int, default=40, help="respuestas base distintas por pregunta")
+    parser.add_argument("--umbral", type=float, default=0.92)
+    parser.add_argument("--max-filas", type=int, default=2000)
+    parser.add_argument("--busquedas", type=int, default=500, help="búsquedas por tamaño del índice")
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "clave-benchmark")
+    sys.path.insert(0, RAIZ)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        print(f"{args.emprendedores} emprendedores x {args.preguntas} preguntas, {args.ideas} ideas base, umbral {args.umbral}")
+        print(f"{'modo':<20}{'consultas':>10}{'al LLM':>8}{'exacta':>8}{'semántica':>11}{'falsos':>8}{'búsqueda media':>16}")
+        for con_semantica in (False, True):
+            r = medir_cohorte(args, con_semantica, os.path.join(carpeta, "cohorte"))
+            latencia = f"{r['latencia_media_ms']:.2f} ms" if con_semantica else "-"
+            print(f"{r['modo']:<20}{r['consultas']:>10}{r['llamadas_llm']:>8}{r['aciertos_exacta']:>8}"
+                  f"{r['aciertos_semantica']:>11}{r['falsos']:>8}{latencia:>16}")
+
+        filas, desalojos, tamano = medir_busqueda(args, os.path.join(carpeta, "busqueda"))
+        print(f"\n{'filas en el índice':<20}{'p50 ms':>9}{'p99 ms':>9}")
+        for total, p50, p99 in filas:
+            print(f"{total:<20}{p50:>9.3f}{p99:>9.3f}")
+        print(f"100 guardados más con el índice lleno: {desalojos} desalojos; archivo del índice {tamano / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Caché de dos niveles para las respuestas de la IA.
+
+Nivel 1: LRU en memoria con TTL (por proceso).
+Nivel 2: SQLite en disco, compartido por todos los procesos de Streamlit y persistente entre reinicios.
+
+Configuración por variables de entorno:
+    CONSULTOR_CACHE=0                  desactiva la caché
+    CONSULTOR_CACHE_TAMANO             entradas máximas en memoria (por defecto 256)
+    CONSULTOR_CACHE_TTL                segundos de vida de una entrada (por defecto 7 días)
+    CONSULTOR_CACHE_RUTA               archivo SQLite (por defecto .consultor_cache/respuestas_ia.sqlite3)
+    CONSULTOR_CACHE_MAX_DISCO          filas máximas en SQLite (por defecto 5000)
+    CONSULTOR_CACHE_POLITICA           "lru" (último acceso) o "fifo" (fecha de creación) para desalojar
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+CACHE_ACTIVA = os.getenv("CONSULTOR_CACHE", "1") != "0"
+TAMANO_MEMORIA = int(os.getenv("CONSULTOR_CACHE_TAMANO", "256"))
+TTL_SEGUNDOS = float(os.getenv("CONSULTOR_CACHE_TTL", str(7 * 24 * 3600)))
+RUTA_SQLITE = os.getenv(
+    "CONSULTOR_CACHE_RUTA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".consultor_cache", "respuestas_ia.sqlite3"),
+)
+MAX_FILAS_DISCO = int(os.getenv("CONSULTOR_CACHE_MAX_DISCO", "5000"))
+POLITICA_DESALOJO = os.getenv("CONSULTOR_CACHE_POLITICA", "lru").lower()
+
+
+def _normalizar(valor):
+    # Normaliza Unicode y espacios para que respuestas pegadas con distinto formato compartan clave.
+    if isinstance(valor, str):
+        return " ".join(unicodedata.normalize("NFC", valor).split())
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in sorted(valor.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    return valor
+
+
+def clave_cache(tipo, modelo, temperatura, **entradas):
+    """Hash estable de las entradas del prompt más el modelo y la temperatura."""
+    contenido = json.dumps(
+        {"tipo": tipo, "modelo": modelo, "temperatura": temperatura, "entradas": _normalizar(entradas)},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class CacheLRU:
+    """LRU acotado en memoria con caducidad por entrada."""
+
+    def __init__(self, tamano_maximo=TAMANO_MEMORIA, ttl=TTL_SEGUNDOS):
+        self.tamano_maximo = tamano_maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.desalojos = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira < time.time():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor, ttl=None):
+        with self._lock:
+            self._datos[clave] = (valor, time.time() + (self.ttl if ttl is None else ttl))
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano_maximo:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class CacheSQLite:
+    """Nivel en disco. WAL permite lectores concurrentes desde varios procesos."""
+
+    def __init__(self, ruta=RUTA_SQLITE, ttl=TTL_SEGUNDOS, max_filas=MAX_FILAS_DISCO, politica=POLITICA_DESALOJO):
+        if politica not in ("lru", "fifo"):
+            raise ValueError(f"Política de desalojo no soportada: {politica}")
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_filas = max_filas
+        self.politica = politica
+        self.desalojos = 0
+        self._local = threading.local()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._conexion() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas ("
+                " clave TEXT PRIMARY KEY, valor TEXT NOT NULL,"
+                " creado REAL NOT NULL, accedido REAL NOT NULL, expira REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_accedido ON respuestas(accedido)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_creado ON respuestas(creado)")
+
+    def _conexion(self):
+        # Una conexión por hilo: sqlite3 no permite compartirlas entre los hilos de Streamlit.
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=5.0)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def obtener(self, clave):
+        ahora = time.time()
+        with self._conexion() as con:
+            fila = con.execute("SELECT valor, expira FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            valor, expira = fila
+            if expira < ahora:
+                con.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                return None
+            if self.politica == "lru":
+                con.execute("UPDATE respuestas SET accedido = ? WHERE clave = ?", (ahora, clave))
+            return valor, expira - ahora
+
+    def guardar(self, clave, valor, ttl=None):
+        ahora = time.time()
+        with self._conexion() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, valor, creado, accedido, expira) VALUES (?, ?, ?, ?, ?)",
+                (clave, valor, ahora, ahora, ahora + (self.ttl if ttl is None else ttl)),
+            )
+            self._desalojar(con, ahora)
+
+    def _desalojar(self, con, ahora):
+        con.execute("DELETE FROM respuestas WHERE expira < ?", (ahora,))
+        total = con.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+        exceso = total - self.max_filas
+        if exceso > 0:
+            columna = "accedido" if self.politica == "lru" else "creado"
+            con.execute(
+                f"DELETE FROM respuestas WHERE clave IN (SELECT clave FROM respuestas ORDER BY {columna} ASC LIMIT ?)",
+                (exceso,),
+            )
+            self.desalojos += exceso
+
+
+class CacheDosNiveles:
+    """Consulta primero la memoria y después SQLite; los aciertos en disco se promueven a memoria."""
+
+    def __init__(self, memoria=None, disco=None):
+        self.memoria = memoria if memoria is not None else CacheLRU()
+        self.disco = disco
+        self._lock = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        valor = self.memoria.obtener(clave)
+        if valor is not None:
+            self._contar("aciertos_memoria")
+            return valor
+        if self.disco is not None:
+            try:
+                encontrado = self.disco.obtener(clave)
+            except sqlite3.Error as e:
+                print(f"Error leyendo la caché en disco: {e}")
+                encontrado = None
+            if encontrado is not None:
+                valor, ttl_restante = encontrado
+                self.memoria.guardar(clave, valor, ttl=ttl_restante)
+                self._contar("aciertos_disco")
+                return valor
+        self._contar("fallos")
+        return None
+
+    def guardar(self, clave, valor):
+        self.memoria.guardar(clave, valor)
+        if self.disco is not None:
+            try:
+                self.disco.guardar(clave, valor)
+            except sqlite3.Error as e:
+                print(f"Error escribiendo la caché en disco: {e}")
+
+    def _contar(self, contador):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def estadisticas(self):
+        consultas = self.aciertos_memoria + self.aciertos_disco + self.fallos
+        return {
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_disco": self.aciertos_disco,
+            "fallos": self.fallos,
+            "tasa_aciertos": (self.aciertos_memoria + self.aciertos_disco) / consultas if consultas else 0.0,
+            "entradas_memoria": len(self.memoria),
+            "desalojos_memoria": self.memoria.desalojos,
+            "desalojos_disco": self.disco.desalojos if self.disco is not None else 0,
+        }
+
+
+_cache_global = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache():
+    """Instancia única por proceso (sobrevive a los reruns de Streamlit). Devuelve None si está desactivada."""
+    global _cache_global
+    if not CACHE_ACTIVA:
+        return None
+    with _cache_lock:
+        if _cache_global is None:
+            try:
+                disco = CacheSQLite()
+            except (sqlite3.Error, OSError, ValueError) as e:  # ValueError: CONSULTOR_CACHE_POLITICA inválida
+                print(f"No se pudo abrir la caché en disco, se usará solo memoria: {e}")
+                disco = None
+            _cache_global = CacheDosNiveles(disco=disco)
+        return _cache_global
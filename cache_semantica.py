@@ -0,0 +1,290 @@
+"""Caché semántica del feedback: reutiliza el feedback de respuestas casi idénticas a la misma pregunta.
+
+Entre cohortes muchos emprendedores contestan casi lo mismo ("vender ropa por Instagram" / "vender ropa en
+Instagram") y la caché exacta de cache_ia no los une. Aquí cada respuesta se convierte localmente, sin red,
+en un vector de n-gramas de caracteres y palabras con hashing (sin tildes ni stopwords, normalizado a
+norma 1) y se guarda junto con el feedback que produjo. Ante una respuesta nueva se busca por similitud
+coseno (un producto matriz-vector con NumPy) y, si la mejor supera el umbral, se sirve ese feedback con el
+nombre del emprendedor y del emprendimiento actuales.
+
+Hay un índice por pregunta (y por rama del triaje y modelo, que cambian el prompt). Cada índice es una
+matriz float32 de CONSULTOR_CACHE_SEMANTICA_MAX filas mapeada en memoria desde disco (np.memmap), así que
+la comparten los procesos de Streamlit y los trabajadores de cli_cohortes y solo se leen las páginas que
+se usan. El feedback y la fecha de último acceso de cada fila viven en SQLite; con el índice lleno, la
+fila nueva sustituye a la menos usada recientemente.
+
+Configuración por variables de entorno:
+    CONSULTOR_CACHE_SEMANTICA            "1" la activa (por defecto desactivada)
+    CONSULTOR_CACHE_SEMANTICA_UMBRAL     similitud coseno mínima para servir un feedback (por defecto 0.92)
+    CONSULTOR_CACHE_SEMANTICA_MAX        filas máximas por índice (por defecto 2000)
+    CONSULTOR_CACHE_SEMANTICA_DIMENSION  dimensión de los vectores (por defecto 512)
+    CONSULTOR_CACHE_SEMANTICA_RUTA       carpeta de los índices (por defecto .consultor_cache/semantica)
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+
+from triaje_respuestas import STOPWORDS
+
+SEMANTICA_ACTIVA = os.getenv("CONSULTOR_CACHE_SEMANTICA", "0") == "1"
+UMBRAL_SIMILITUD = float(os.getenv("CONSULTOR_CACHE_SEMANTICA_UMBRAL", "0.92"))
+MAX_FILAS_INDICE = int(os.getenv("CONSULTOR_CACHE_SEMANTICA_MAX", "2000"))
+DIMENSION = int(os.getenv("CONSULTOR_CACHE_SEMANTICA_DIMENSION", "512"))
+RUTA_INDICES = os.getenv(
+    "CONSULTOR_CACHE_SEMANTICA_RUTA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".consultor_cache", "semantica"),
+)
+
+# "no" y "sin" cambian el sentido de una respuesta, así que no se descartan como el resto de stopwords.
+_STOPWORDS_SEMANTICAS = STOPWORDS - {"no", "sin"}
+_MARCA_EMPRENDEDOR = "\x00emprendedor\x00"
+_MARCA_EMPRENDIMIENTO = "\x00emprendimiento\x00"
+
+
+def _palabras(texto):
+    sin_tildes = unicodedata.normalize("NFD", texto.lower())
+    sin_tildes = "".join(c for c in sin_tildes if unicodedata.category(c) != "Mn")
+    return [p for p in re.findall(r"[a-zñ0-9]+", sin_tildes) if p not in _STOPWORDS_SEMANTICAS]
+
+
+def _rasgos(texto):
+    palabras = _palabras(texto)
+    rasgos = []
+    for palabra in palabras:
+        rasgos.append("p:" + palabra)
+        # Los números solo cuentan como palabra entera: 30.000 y 50.000 no deben parecerse por sus trigramas.
+        if not palabra.isdigit():
+            con_bordes = f" {palabra} "
+            rasgos += ["c:" + con_bordes[i:i + 3] for i in range(len(con_bordes) - 2)]
+    rasgos += [f"b:{a} {b}" for a, b in zip(palabras, palabras[1:])]
+    return rasgos
+
+
+def vectorizar(texto, dimension=DIMENSION):
+    """Vector float32 de norma 1 (o de ceros si el texto no tiene palabras con contenido)."""
+    rasgos = _rasgos(texto)
+    vector = np.zeros(dimension, dtype=np.float32)
+    if not rasgos:
+        return vector
+    hashes = np.fromiter((zlib.crc32(r.encode("utf-8")) for r in rasgos), dtype=np.uint32, count=len(rasgos))
+    signos = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes % dimension).astype(np.intp), signos)
+    norma = np.linalg.norm(vector)
+    return vector / norma if norma else vector
+
+
+def _sustituir(texto, nombre, marca):
+    if not nombre or len(nombre.strip()) < 2:
+        return texto
+    return re.sub(rf"(?<!\w){re.escape(nombre.strip())}(?!\w)", marca, texto)
+
+
+def _restaurar(texto, marca, nombre, por_defecto):
+    return texto.replace(marca, nombre.strip() if nombre and nombre.strip() else por_defecto)
+
+
+class IndiceSemantico:
+    """Matriz (max_filas, dimension) de un índice, mapeada en memoria desde su archivo .f32."""
+
+    def __init__(self, ruta, max_filas, dimension):
+        tamano = max_filas * dimension * 4
+        # O_CREAT sin truncar: otro proceso puede estar usando ya el mismo archivo.
+        descriptor = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self.recreado = os.fstat(descriptor).st_size != tamano
+            if self.recreado:
+                # Índice nuevo o creado con otra configuración: sus vectores ya no sirven.
+                os.ftruncate(descriptor, 0)
+                os.ftruncate(descriptor, tamano)
+        finally:
+            os.close(descriptor)
+        self.matriz = np.memmap(ruta, dtype=np.float32, mode="r+", shape=(max_filas, dimension))
+
+    def similitudes(self, vector, filas):
+        return self.matriz[:filas] @ vector
+
+
+class CacheSemantica:
+    def __init__(self, ruta=RUTA_INDICES, umbral=UMBRAL_SIMILITUD, max_filas=MAX_FILAS_INDICE, dimension=DIMENSION):
+        self.ruta = ruta
+        self.umbral = umbral
+        self.max_filas = max(1, max_filas)
+        self.dimension = dimension
+        self._indices = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.consultas = 0
+        self.aciertos = 0
+        self.guardados = 0
+        self.desalojos = 0
+        self._latencia_total = 0.0
+        self._latencia_max = 0.0
+        os.makedirs(ruta, exist_ok=True)
+        with self._conexion() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS feedback_semantico ("
+                " indice TEXT NOT NULL, fila INTEGER NOT NULL, respuesta TEXT NOT NULL, feedback TEXT NOT NULL,"
+                " creado REAL NOT NULL, accedido REAL NOT NULL, PRIMARY KEY (indice, fila))"
+            )
+
+    def _conexion(self):
+        # Una conexión por hilo, como en cache_ia.
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(os.path.join(self.ruta, "feedback.sqlite3"), timeout=5.0)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _nombre_indice(self, q_id, rama, modelo):
+        return f"pregunta{q_id}_{rama or 'completo'}_{hashlib.sha256(modelo.encode('utf-8')).hexdigest()[:8]}"
+
+    def _indice(self, nombre):
+        with self._lock:
+            indice = self._indices.get(nombre)
+            if indice is None:
+                indice = IndiceSemantico(os.path.join(self.ruta, nombre + ".f32"), self.max_filas, self.dimension)
+                if indice.recreado:
+                    with self._conexion() as con:
+                        con.execute("DELETE FROM feedback_semantico WHERE indice = ?", (nombre,))
+                self._indices[nombre] = indice
+            return indice
+
+    def buscar(self, q_id, rama, modelo, respuesta, nombre_emprendimiento, nombre_emprendedor):
+        """Feedback guardado para una respuesta suficientemente parecida, o None."""
+        inicio = time.perf_counter()
+        feedback = None
+        try:
+            feedback = self._buscar(q_id, rama, modelo, respuesta, nombre_emprendimiento, nombre_emprendedor)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"Error consultando la caché semántica: {e}")
+        latencia = time.perf_counter() - inicio
+        with self._lock:
+            self.consultas += 1
+            self.aciertos += feedback is not None
+            self._latencia_total += latencia
+            self._latencia_max = max(self._latencia_max, latencia)
+        return feedback
+
+    def _buscar(self, q_id, rama, modelo, respuesta, nombre_emprendimiento, nombre_emprendedor):
+        vector = vectorizar(_sustituir(respuesta, nombre_emprendimiento, " "), self.dimension)
+        if not vector.any():
+            return None
+        nombre = self._nombre_indice(q_id, rama, modelo)
+        indice = self._indice(nombre)
+        con = self._conexion()
+        filas = con.execute("SELECT COUNT(*) FROM feedback_semantico WHERE indice = ?", (nombre,)).fetchone()[0]
+        if not filas:
+            return None
+        similitudes = indice.similitudes(vector, filas)
+        mejor = int(np.argmax(similitudes))
+        if similitudes[mejor] < self.umbral:
+            return None
+        with con:
+            encontrado = con.execute(
+                "SELECT respuesta, feedback FROM feedback_semantico WHERE indice = ? AND fila = ?", (nombre, mejor)
+            ).fetchone()
+            if encontrado is None:
+                return None
+            respuesta_guardada, feedback = encontrado
+            # Otro proceso pudo reutilizar la fila entre la búsqueda y la lectura: se comprueba con su respuesta.
+            if float(vectorizar(respuesta_guardada, self.dimension) @ vector) < self.umbral:
+                return None
+            con.execute(
+                "UPDATE feedback_semantico SET accedido = ? WHERE indice = ? AND fila = ?", (time.time(), nombre, mejor)
+            )
+        feedback = _restaurar(feedback, _MARCA_EMPRENDEDOR, nombre_emprendedor, "Emprendedor/a")
+        return _restaurar(feedback, _MARCA_EMPRENDIMIENTO, nombre_emprendimiento, "tu emprendimiento")
+
+    def guardar(self, q_id, rama, modelo, respuesta, feedback, nombre_emprendimiento, nombre_emprendedor):
+        try:
+            self._guardar(q_id, rama, modelo, respuesta, feedback, nombre_emprendimiento, nombre_emprendedor)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"Error escribiendo la caché semántica: {e}")
+
+    def _guardar(self, q_id, rama, modelo, respuesta, feedback, nombre_emprendimiento, nombre_emprendedor):
+        respuesta = _sustituir(respuesta, nombre_emprendimiento, " ")
+        vector = vectorizar(respuesta, self.dimension)
+        if not vector.any():
+            return
+        # El feedback se guarda sin nombres propios para poder servirlo a otro emprendedor.
+        feedback = _sustituir(feedback, nombre_emprendimiento, _MARCA_EMPRENDIMIENTO)
+        feedback = _sustituir(feedback, nombre_emprendedor, _MARCA_EMPRENDEDOR)
+        nombre = self._nombre_indice(q_id, rama, modelo)
+        indice = self._indice(nombre)
+        ahora = time.time()
+        con = self._conexion()
+        # BEGIN IMMEDIATE: la elección de fila y su escritura no se mezclan con las de otro proceso.
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            filas = con.execute("SELECT COUNT(*) FROM feedback_semantico WHERE indice = ?", (nombre,)).fetchone()[0]
+            desalojo = filas >= self.max_filas
+            if not desalojo:
+                fila = filas
+            else:
+                fila = con.execute(
+                    "SELECT fila FROM feedback_semantico WHERE indice = ? ORDER BY accedido ASC LIMIT 1", (nombre,)
+                ).fetchone()[0]
+            indice.matriz[fila] = vector
+            con.execute(
+                "INSERT OR REPLACE INTO feedback_semantico (indice, fila, respuesta, feedback, creado, accedido)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (nombre, fila, respuesta, feedback, ahora, ahora),
+            )
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self.guardados += 1
+            self.desalojos += desalojo
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.consultas
+            return {
+                "consultas": consultas,
+                "aciertos": self.aciertos,
+                "fallos": consultas - self.aciertos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+                "guardados": self.guardados,
+                "desalojos": self.desalojos,
+                "indices": len(self._indices),
+                "latencia_media_ms": self._latencia_total / consultas * 1000 if consultas else 0.0,
+                "latencia_max_ms": self._latencia_max * 1000,
+            }
+
+
+_semantica_global = None
+_semantica_lock = threading.Lock()
+
+
+def configurar_cache_semantica(**opciones):
+    """Sustituye la caché semántica del proceso (p. ej. con otra ruta o umbral en un benchmark)."""
+    global _semantica_global
+    with _semantica_lock:
+        _semantica_global = CacheSemantica(**opciones)
+        return _semantica_global
+
+
+def obtener_cache_semantica():
+    """Instancia única por proceso. Devuelve None si está desactivada o no se puede abrir."""
+    global _semantica_global
+    if not SEMANTICA_ACTIVA and _semantica_global is None:
+        return None
+    with _semantica_lock:
+        if _semantica_global is None:
+            try:
+                _semantica_global = CacheSemantica()
+            except (sqlite3.Error, OSError) as e:
+                print(f"No se pudo abrir la caché semántica, se desactiva: {e}")
+                return None
+        return _semantica_global
@@ -1,15 +1,51 @@
-import google.generativeai as genai
+"""Consulta los modelos de Gemini disponibles, guarda el catálogo que usa la app y muestra el enrutado.
+
+Uso:
+    python check_models.py            # pide la lista a la API y actualiza .consultor_cache/modelos.json
+    python check_models.py --cache    # solo muestra el catálogo guardado, sin llamar a la API
+"""
+import argparse
 import os
+import time
+
 from dotenv import load_dotenv
 
+from registro_modelos import NIVEL_CALIDAD, NIVEL_RAPIDO, RegistroModelos, cargar_catalogo, descubrir_modelos, guardar_catalogo
+
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-if not GOOGLE_API_KEY:
-    print("API Key de Google no encontrada. Asegúrate de configurar el archivo .env correctamente.")
-else:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    print("Modelos disponibles que soportan 'generateContent':")
-    for m in genai.list_models():
-        if 'generateContent' in m.supported_generation_methods:
-            print(m.name)
\ No newline at end of file
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cache", action="store_true", help="no llamar a la API; mostrar el catálogo guardado")
+    args = parser.parse_args()
+
+    if args.cache:
+        catalogo = cargar_catalogo()
+        if catalogo is None:
+            print("No hay catálogo guardado. Ejecuta check_models.py sin --cache para crearlo.")
+            return
+        antiguedad = (time.time() - catalogo["actualizado"]) / 3600
+        print(f"Catálogo guardado hace {antiguedad:.1f} h:")
+    elif not GOOGLE_API_KEY:
+        print("API Key de Google no encontrada. Asegúrate de configurar el archivo .env correctamente.")
+        return
+    else:
+        catalogo = guardar_catalogo(descubrir_modelos(GOOGLE_API_KEY))
+        print("Modelos disponibles que soportan 'generateContent':")
+    for modelo in catalogo["modelos"]:
+        print(modelo)
+
+    registro = RegistroModelos()
+    print()
+    for nivel in (NIVEL_RAPIDO, NIVEL_CALIDAD):
+        configurados = registro.candidatos_configurados[nivel]
+        faltan = [modelo for modelo in configurados if modelo not in catalogo["modelos"]]
+        print(f"Nivel '{nivel}': {' -> '.join(registro.candidatos(nivel))}")
+        if faltan:
+            print(f"  No disponibles en esta cuenta (se omiten): {', '.join(faltan)}")
+
+
+if __name__ == "__main__":
+    main()
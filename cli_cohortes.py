@@ -0,0 +1,217 @@
+"""Procesa cohortes completas de emprendimientos sin pasar por la interfaz de Streamlit.
+
+Cada emprendimiento recibe el feedback de las 10 preguntas y el resumen con pitch, igual que en la app.
+
+Entrada (JSONL o CSV, por extensión):
+    JSONL: {"id": "...", "nombre_emprendimiento": "...", "nombre_emprendedor": "...", "respuestas": {"1": "...", ..., "10": "..."}}
+           (también se aceptan claves respuesta_1 ... respuesta_10 en lugar de "respuestas")
+    CSV:   columnas id, nombre_emprendimiento, nombre_emprendedor, respuesta_1 ... respuesta_10
+Si falta "id" se usa el número de fila.
+
+Salida: una línea JSONL por emprendimiento, escrita en cuanto termina. El propio archivo de salida es el
+punto de control: al relanzar el comando se saltan los emprendimientos ya completados sin errores.
+
+Uso:
+    python cli_cohortes.py cohorte.csv resultados.jsonl --concurrencia 4
+    python cli_cohortes.py cohorte.jsonl resultados.jsonl --llm-falso --latencia-falsa 0.2
+"""
+import argparse
+import csv
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import consultor_ia
+from consultor_ia import MENSAJES_REINTENTABLES, generar_resumen_y_pitch, obtener_feedback_gemini, preguntas_emprendimiento
+
+PREFIJOS_ERROR = ("Hubo un error", "Error", "Se ha excedido la cuota")
+
+
+def leer_emprendimientos(ruta):
+    """Devuelve una lista de dicts {id, nombre_emprendimiento, nombre_emprendedor, respuestas: {q_id: texto}}."""
+    if ruta.lower().endswith(".csv"):
+        with open(ruta, newline="", encoding="utf-8") as f:
+            filas = list(csv.DictReader(f))
+    else:
+        with open(ruta, encoding="utf-8") as f:
+            filas = [json.loads(linea) for linea in f if linea.strip()]
+
+    emprendimientos = []
+    for numero, fila in enumerate(filas, start=1):
+        respuestas_fila = fila.get("respuestas") or {}
+        respuestas = {}
+        for pregunta in preguntas_emprendimiento:
+            q_id = pregunta["id"]
+            texto = respuestas_fila.get(str(q_id), respuestas_fila.get(q_id)) if respuestas_fila else None
+            if texto is None:
+                texto = fila.get(f"respuesta_{q_id}", "")
+            respuestas[q_id] = (texto or "").strip()
+        emprendimientos.append({
+            "id": str(fila.get("id") or numero),
+            "nombre_emprendimiento": (fila.get("nombre_emprendimiento") or "").strip(),
+            "nombre_emprendedor": (fila.get("nombre_emprendedor") or "").strip(),
+            "respuestas": respuestas,
+        })
+    return emprendimientos
+
+
+def leer_completados(ruta_salida):
+    # La última línea de cada id manda: un reintento con éxito sustituye a un intento con errores.
+    completados = {}
+    if not os.path.exists(ruta_salida):
+        return set()
+    with open(ruta_salida, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                continue  # Línea truncada por una caída a mitad de escritura
+            completados[registro["id"]] = registro.get("estado") == "ok"
+    return {id_emp for id_emp, ok in completados.items() if ok}
+
+
+def _es_error(texto, medicion):
+    # medicion["error"] marca cualquier llamada a la IA fallida (también por plazo o cancelación); los
+    # prefijos cubren los mensajes que se devuelven sin llamar, como la falta de API key.
+    return "error" in medicion or texto in MENSAJES_REINTENTABLES or texto.startswith(PREFIJOS_ERROR)
+
+
+def procesar_emprendimiento(emprendimiento):
+    inicio = time.perf_counter()
+    latencias_feedback = []
+    feedback = {}
+    errores = 0
+    for pregunta in preguntas_emprendimiento:
+        q_id = pregunta["id"]
+        inicio_llamada = time.perf_counter()
+        medicion = {}
+        feedback[q_id] = obtener_feedback_gemini(
+            pregunta["texto"],
+            pregunta["detalle"],
+            emprendimiento["respuestas"][q_id],
+            emprendimiento["nombre_emprendimiento"],
+            emprendimiento["nombre_emprendedor"],
+            0,
+            medicion,
+        )
+        latencias_feedback.append(time.perf_counter() - inicio_llamada)
+        errores += _es_error(feedback[q_id], medicion)
+
+    inicio_pitch = time.perf_counter()
+    resultado_pitch = {}
+    resumen_y_pitch = generar_resumen_y_pitch(
+        emprendimiento["respuestas"],
+        preguntas_emprendimiento,
+        emprendimiento["nombre_emprendimiento"],
+        emprendimiento["nombre_emprendedor"],
+        resultado=resultado_pitch,
+    )
+    latencia_pitch = time.perf_counter() - inicio_pitch
+    errores += _es_error(resumen_y_pitch, resultado_pitch)
+    return {
+        "id": emprendimiento["id"],
+        "nombre_emprendimiento": emprendimiento["nombre_emprendimiento"],
+        "nombre_emprendedor": emprendimiento["nombre_emprendedor"],
+        "estado": "ok" if not errores else "con_errores",
+        "errores": errores,
+        "feedback": {str(q_id): texto for q_id, texto in feedback.items()},
+        "resumen_y_pitch": resumen_y_pitch,
+        "latencias": {
+            "feedback": latencias_feedback,
+            "resumen_y_pitch": latencia_pitch,
+            "total": time.perf_counter() - inicio,
+        },
+    }
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def procesar_cohorte(emprendimientos, ruta_salida, concurrencia=4, progreso=True):
+    """Procesa los emprendimientos pendientes y devuelve el informe de rendimiento."""
+    completados = leer_completados(ruta_salida)
+    pendientes = [e for e in emprendimientos if e["id"] not in completados]
+    if progreso:
+        print(f"{len(emprendimientos)} emprendimientos, {len(completados)} ya completados, {len(pendientes)} pendientes.", file=sys.stderr)
+
+    latencias_total, latencias_feedback, latencias_pitch = [], [], []
+    con_errores = 0
+    inicio = time.perf_counter()
+    with open(ruta_salida, "a", encoding="utf-8") as salida, ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        futuros = {pool.submit(procesar_emprendimiento, e): e["id"] for e in pendientes}
+        for hechos, futuro in enumerate(as_completed(futuros), start=1):
+            try:
+                registro = futuro.result()
+            except Exception as e:
+                registro = {"id": futuros[futuro], "estado": "fallido", "error": str(e)}
+            # Solo escribe el hilo principal; fsync para que el punto de control sobreviva a una caída.
+            salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            salida.flush()
+            os.fsync(salida.fileno())
+            if registro["estado"] != "ok":
+                con_errores += 1
+            if "latencias" in registro:
+                latencias_total.append(registro["latencias"]["total"])
+                latencias_feedback.extend(registro["latencias"]["feedback"])
+                latencias_pitch.append(registro["latencias"]["resumen_y_pitch"])
+            if progreso:
+                print(f"[{hechos}/{len(pendientes)}] {registro['id']}: {registro['estado']}", file=sys.stderr)
+    duracion = time.perf_counter() - inicio
+
+    def _estadisticas(valores):
+        return {
+            "n": len(valores),
+            "media": statistics.mean(valores) if valores else 0.0,
+            "p50": _percentil(valores, 50),
+            "p95": _percentil(valores, 95),
+            "max": max(valores) if valores else 0.0,
+        }
+
+    return {
+        "procesados": len(pendientes),
+        "omitidos_por_punto_de_control": len(emprendimientos) - len(pendientes),
+        "con_errores": con_errores,
+        "duracion_s": duracion,
+        "emprendimientos_por_minuto": len(pendientes) / duracion * 60 if duracion > 0 else 0.0,
+        "latencia_emprendimiento_s": _estadisticas(latencias_total),
+        "latencia_feedback_s": _estadisticas(latencias_feedback),
+        "latencia_resumen_y_pitch_s": _estadisticas(latencias_pitch),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Feedback y pitch por lotes para cohortes de emprendimientos.")
+    parser.add_argument("entrada", help="Archivo .jsonl o .csv con los emprendimientos")
+    parser.add_argument("salida", help="Archivo .jsonl de resultados (también es el punto de control)")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Emprendimientos procesados a la vez (por defecto 4)")
+    parser.add_argument("--reporte", help="Guarda el informe de rendimiento en este archivo JSON")
+    parser.add_argument("--llm-falso", action="store_true", help="Usa un LLM local determinista en lugar de Gemini")
+    parser.add_argument("--latencia-falsa", type=float, default=0.0, help="Segundos de latencia por llamada del LLM falso")
+    args = parser.parse_args(argv)
+
+    if args.llm_falso:
+        from gobernador_llm import configurar_gobernador
+        from llm_falso import LLMFalso
+        consultor_ia.fijar_llm(LLMFalso(latencia=args.latencia_falsa))
+        configurar_gobernador(rpm=0, tpm=0) # El LLM falso no tiene cuota que proteger
+    elif not consultor_ia.ia_configurada():
+        parser.error("GOOGLE_API_KEY no está configurada (usa --llm-falso para pruebas locales).")
+
+    informe = procesar_cohorte(leer_emprendimientos(args.entrada), args.salida, concurrencia=args.concurrencia)
+    texto_informe = json.dumps(informe, ensure_ascii=False, indent=2)
+    print(texto_informe)
+    if args.reporte:
+        with open(args.reporte, "w", encoding="utf-8") as f:
+            f.write(texto_informe + "\n")
+    return 0 if informe["con_errores"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,700 @@
+"""Núcleo del consultor: preguntas, cliente de Gemini y generación de feedback, resumen y pitch.
+
+Todo lo que vive aquí se inicializa una sola vez por proceso: Streamlit re-ejecuta app.py en cada
+interacción, pero los módulos importados (y los recursos de st.cache_resource) se conservan.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from cache_ia import clave_cache, obtener_cache
+from cache_semantica import obtener_cache_semantica
+from gobernador_llm import CircuitoAbierto, EsperaAgotada, contar_tokens, estimar_tokens, obtener_gobernador
+from metricas import medir_llamada
+from pasarela_llm import PASARELA_ACTIVA, obtener_pasarela
+from plazos_llm import LlamadaCancelada, PlazoVencido, plazo_de
+from prompts_consultor import prompt_digesto, prompt_feedback, prompt_resumen_pitch, prompt_seccion, recortar_respuesta
+from registro_modelos import NIVEL_CALIDAD, NIVEL_RAPIDO, obtener_registro
+from triaje_respuestas import TRIAJE_ACTIVO, clasificar_respuesta, estadisticas_triaje, feedback_rama_a
+
+# Los modelos se eligen por nivel en registro_modelos: NIVEL_RAPIDO para el feedback y los digestos,
+# NIVEL_CALIDAD para el resumen y el pitch.
+temperatura_llm = 0.6
+
+IS_STREAMLIT_CLOUD = os.environ.get('STREAMLIT_SHARING_MODE') == 'true' or \
+                     "SHARE_ streamlit_io" in os.environ.get("SERVER_SOFTWARE", "") or \
+                     os.getenv("STREAMLIT_ENVIRONMENT") == "SHARE"
+
+_llm_inyectado = None
+_llm_initialization_error = None
+
+
+# --- Carga de API Key y Inicialización de LLM ---
+@st.cache_resource(show_spinner=False)
+def resolver_api_key():
+    if IS_STREAMLIT_CLOUD and hasattr(st, 'secrets') and "GOOGLE_API_KEY" in st.secrets:
+        return st.secrets["GOOGLE_API_KEY"]
+    try:
+        from dotenv import load_dotenv
+        dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
+        if os.path.exists(dotenv_path):
+            load_dotenv(dotenv_path)
+    except ImportError:
+        pass
+    return os.getenv("GOOGLE_API_KEY")
+
+
+@st.cache_resource(show_spinner=False)
+def _crear_llm(modelo, temperatura):
+    # Import diferido: langchain_google_genai es lo más pesado del arranque y solo hace falta en la primera llamada a la IA.
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model=modelo,
+        google_api_key=resolver_api_key(),
+        temperature=temperatura,
+        max_retries=1, # Los reintentos los gestiona gobernador_llm
+    )
+
+
+def fijar_llm(llm):
+    """Sustituye el cliente de Gemini (p. ej. por un LLM falso en benchmarks). None restaura el cliente real.
+
+    Con un dict {modelo: llm} cada modelo tiene su propio doble y los que no estén se tratan como no
+    disponibles, para probar el enrutado y los respaldos de registro_modelos sin red.
+    """
+    global _llm_inyectado
+    _llm_inyectado = llm
+
+
+def ia_configurada():
+    return _llm_inyectado is not None or bool(resolver_api_key())
+
+
+def obtener_llm(modelo=None):
+    """Cliente para `modelo` (por defecto, el que toca ahora en el nivel rápido); None si no se puede crear."""
+    global _llm_initialization_error
+    modelo = modelo or obtener_registro().elegir(NIVEL_RAPIDO)
+    if _llm_inyectado is not None:
+        return _llm_inyectado.get(modelo) if isinstance(_llm_inyectado, dict) else _llm_inyectado
+    if not resolver_api_key():
+        _llm_initialization_error = Exception("GOOGLE_API_KEY no fue encontrada ni en st.secrets ni en el entorno local (.env).")
+        return None
+    try:
+        llm = _crear_llm(modelo, temperatura_llm)
+    except Exception as e:
+        _llm_initialization_error = e
+        return None
+    _llm_initialization_error = None
+    obtener_registro().actualizar_en_segundo_plano(resolver_api_key())
+    return llm
+
+
+def _llm_de_nivel(nivel):
+    # Para comprobar de antemano si hay IA: basta con que algún modelo del nivel tenga cliente.
+    for modelo in obtener_registro().candidatos(nivel):
+        llm = obtener_llm(modelo)
+        if llm is not None:
+            return llm
+    return None
+
+
+def _sin_respaldo(e):
+    # Con el gobernador saturado o el circuito abierto, otro modelo esperaría en la misma cola; con el
+    # plazo vencido o la llamada cancelada, ya no hay a quién responder.
+    return isinstance(e, (CircuitoAbierto, EsperaAgotada, PlazoVencido, LlamadaCancelada))
+
+
+def _invocar(nivel, funcion, prompt, plazo=None, **atributos):
+    """llm.invoke con enrutado: prueba los modelos del nivel en orden y pasa al siguiente si uno falla.
+
+    `prompt` es un prompts_consultor.Prompt: la instrucción fija va como system_instruction y la
+    parte de usuario como mensaje. `plazo` (plazos_llm.Plazo) acota
+    la espera y cancela la petición si vence o si quien la pidió ya no la necesita.
+    """
+    error = None
+    for modelo in obtener_registro().candidatos(nivel):
+        llm = obtener_llm(modelo)
+        if llm is None:
+            continue
+        try:
+            if plazo is not None:
+                plazo.comprobar()
+            with medir_llamada(funcion, modelo, **atributos) as span:
+                messages = _preparar_mensajes(prompt)
+                span.anotar_prompt(prompt.tokens())
+                if PASARELA_ACTIVA:
+                    clave = clave_cache("invoke", modelo, temperatura_llm, prompt=prompt.texto)
+                    respuesta, compartida = obtener_pasarela().invocar(clave, llm, messages, estimar_tokens(prompt.texto), plazo=plazo)
+                else:
+                    respuesta = obtener_gobernador().ejecutar(lambda: llm.invoke(messages), estimar_tokens(prompt.texto), plazo)
+                    compartida = False
+                span.atributos["coalescida"] = compartida
+                if not compartida:  # Los tokens de una respuesta compartida ya los cuenta quien la pidió
+                    span.anotar_uso(respuesta)
+            return respuesta
+        except Exception as e:
+            if _sin_respaldo(e):
+                raise
+            print(f"Error con el modelo {modelo} en {funcion}; se prueba el siguiente del nivel '{nivel}': {e}")
+            error = e
+    raise error or RuntimeError(f"Ningún modelo del nivel '{nivel}' está disponible.")
+
+
+def _transmitir(nivel, funcion, prompt, plazo=None, **atributos):
+    """Versión en streaming de _invocar: solo se cambia de modelo si el error llega antes del primer fragmento."""
+    error = None
+    for modelo in obtener_registro().candidatos(nivel):
+        llm = obtener_llm(modelo)
+        if llm is None:
+            continue
+        emitido = False
+        try:
+            if plazo is not None:
+                plazo.comprobar()
+            with medir_llamada(funcion, modelo, **atributos) as span:
+                messages = _preparar_mensajes(prompt)
+                span.anotar_prompt(prompt.tokens())
+                if PASARELA_ACTIVA:
+                    clave = clave_cache("stream", modelo, temperatura_llm, prompt=prompt.texto)
+                    flujo = obtener_pasarela().transmitir(clave, llm, messages, estimar_tokens(prompt.texto), plazo=plazo)
+                    compartida = flujo.compartida
+                else:
+                    flujo = obtener_gobernador().transmitir(lambda: llm.stream(messages), estimar_tokens(prompt.texto), plazo)
+                    compartida = False
+                span.atributos["coalescida"] = compartida
+                for chunk in flujo:
+                    if not compartida:
+                        span.anotar_uso(chunk)
+                    emitido = True
+                    yield chunk
+            return
+        except Exception as e:
+            if emitido or _sin_respaldo(e):
+                raise
+            print(f"Error con el modelo {modelo} en {funcion}; se prueba el siguiente del nivel '{nivel}': {e}")
+            error = e
+    raise error or RuntimeError(f"Ningún modelo del nivel '{nivel}' está disponible.")
+
+
+def _preparar_mensajes(prompt):
+    """La instrucción fija va como SystemMessage (system_instruction de Gemini) y la parte de usuario como mensaje."""
+    from langchain.schema import HumanMessage, SystemMessage
+    return [SystemMessage(content=prompt.sistema), HumanMessage(content=prompt.usuario)]
+
+
+# --- Definiciones de Preguntas ---
+preguntas_emprendimiento = [
+    {"id": 1, "texto": "Cuál es la idea de negocio?", "detalle": "(Define claramente el producto o servicio que se ofrecerá y cómo se diferencia de la competencia?)"},
+    {"id": 2, "texto": "Quién o cuál es el público objetivo?", "detalle": "(identificar el perfil demográfico de tus clientes potenciales, sus necesidades y preferencias)"},
+    {"id": 3, "texto": "Cuál es la propuesta de valor?", "detalle": "(Qué valor agregado se ofrecerá a los clientes? Por qué deberían elegir tu producto o servicio por encima de los otros?)"},
+    {"id": 4, "texto": "Cuál es el modelo de negocio?", "detalle": "(Define cómo generarás ingresos ya sea a través de la venta de productos, servicios, publicidad, suscripciones, etc?)"},
+    {"id": 5, "texto": "Cómo se piensa promocionar el negocio?", "detalle": "(Cuál es el plan de Marketing? cómo se llegará al público objetivo. Estrategias de marketing digital, redes sociales, publicidad local, relaciones públicas, etc )"},
+    {"id": 6, "texto": "Quiénes serían los competidores?", "detalle": "(Identificar negocios similares, evaluar y analizar sus debilidades y fortalezas. Cómo podrías diferenciarte?)"},
+    {"id": 7, "texto": "Hay regulaciones especiales para este negocio?", "detalle": "(Qué requisitos legales se necesitan? Permisos especiales. Cumplimientos tributarios.)"},
+    {"id": 8, "texto": "Cómo se gestionará el negocio?", "detalle": "(Qué sistemas se implementarán? Sistemas o Departamentos de Marketing, Talento o Recurso Humano, Finanzas, Producto, Administración y operaciones, Inversiones)"},
+    {"id": 9, "texto": "A dónde se quiere llegar?", "detalle": "(Visión, misión, metas, objetivos, propósito, planes a largo plazo)"},
+    {"id": 10, "texto": "Cuál es la inversión o capital inicial?", "detalle": "(locales, equipos, inventario, tecnología, personal, etc)"}
+]
+
+def _texto_chunk(chunk):
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(parte if isinstance(parte, str) else parte.get("text", "") for parte in chunk.content)
+
+
+def _feedback_sin_llamada(llm, nombre_emprendedor, edit_count):
+    # Respuestas que no requieren llamar a Gemini (modelo no disponible o pregunta ya editada).
+    if not llm:
+        if _llm_initialization_error:
+            return f"Error al inicializar el modelo de IA: {_llm_initialization_error}"
+        elif not resolver_api_key():
+            return "Error: API Key de Google no configurada."
+        else:
+            return "Error: El modelo de lenguaje no está inicializado por una razón desconocida."
+
+    # AJUSTE: Si edit_count es 1 o más, agradecer y no hacer más preguntas.
+    if edit_count >= 1:
+        return f"¡Gracias por tu esfuerzo y dedicación en esta pregunta, {nombre_emprendedor if nombre_emprendedor else 'Emprendedor/a'}! Has trabajado mucho en refinar tu respuesta. Podemos continuar."
+    return None
+
+
+MENSAJE_IA_SATURADA = "Hubo un error: el servicio de IA está saturado en este momento. Por favor, inténtalo de nuevo en unos minutos."
+MENSAJE_IA_LENTA = "La IA está tardando más de lo normal y se dejó de esperar su respuesta. Puedes volver a intentarlo ahora."
+MENSAJE_IA_CANCELADA = "La respuesta de la IA se interrumpió antes de terminar. Puedes volver a intentarlo ahora."
+# Mensajes tras los que la app ofrece reintentar: el problema no depende de lo que escribió el emprendedor.
+MENSAJES_REINTENTABLES = (MENSAJE_IA_SATURADA, MENSAJE_IA_LENTA, MENSAJE_IA_CANCELADA)
+
+
+def _mensaje_plazo(e):
+    # None si el error no es de plazo ni de cancelación.
+    if isinstance(e, PlazoVencido):
+        return MENSAJE_IA_LENTA
+    if isinstance(e, LlamadaCancelada):
+        return MENSAJE_IA_CANCELADA
+    return None
+
+
+def _mensaje_error_feedback(e):
+    print(f"Error en llamada a Gemini API: {e}")
+    if _mensaje_plazo(e) is not None:
+        return _mensaje_plazo(e)
+    if isinstance(e, (CircuitoAbierto, EsperaAgotada)):
+        return MENSAJE_IA_SATURADA
+    if "quota" in str(e).lower():
+        return "Se ha excedido la cuota de uso gratuito de la IA. Por favor, inténtalo más tarde."
+    return f"Hubo un error al procesar tu respuesta con la IA. El equipo técnico ha sido notificado."
+
+
+def _clave_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama=None):
+    return clave_cache(
+        "feedback", obtener_registro().modelo_cache(NIVEL_RAPIDO), temperatura_llm,
+        pregunta=texto_pregunta, detalle=detalle_pregunta, respuesta=respuesta_usuario,
+        emprendimiento=nombre_emprendimiento, emprendedor=nombre_emprendedor, rama=rama,
+    )
+
+
+def _id_pregunta(texto_pregunta):
+    return next((p["id"] for p in preguntas_emprendimiento if p["texto"] == texto_pregunta), None)
+
+
+def _feedback_semantico(texto_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama, feedback=None):
+    """Sin `feedback`, busca uno guardado para una respuesta parecida; con él, lo guarda. Solo con la caché semántica activa."""
+    semantica = obtener_cache_semantica()
+    q_id = _id_pregunta(texto_pregunta)
+    if semantica is None or q_id is None:
+        return None
+    modelo = obtener_registro().modelo_cache(NIVEL_RAPIDO)
+    if feedback is None:
+        return semantica.buscar(q_id, rama, modelo, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor)
+    semantica.guardar(q_id, rama, modelo, respuesta_usuario, feedback, nombre_emprendimiento, nombre_emprendedor)
+    return None
+
+
+def _triaje_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor):
+    """Devuelve (rama, feedback_precalculado). Sin triaje la rama es None y se usa el prompt completo."""
+    if not TRIAJE_ACTIVO:
+        return None, None
+    rama = clasificar_respuesta(respuesta_usuario, detalle_pregunta)
+    if rama == "A":
+        feedback = feedback_rama_a(_id_pregunta(texto_pregunta), nombre_emprendedor)
+        if feedback is not None:
+            prompt_completo = prompt_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor)
+            estadisticas_triaje.registrar(rama, estimar_tokens(prompt_completo.texto), llamada_evitada=True)
+            return rama, feedback
+    return rama, None
+
+
+def _registrar_prompt_corto(rama, prompt_corto, texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor):
+    if rama is None:
+        return
+    prompt_completo = prompt_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor)
+    estadisticas_triaje.registrar(rama, contar_tokens(prompt_completo.texto) - contar_tokens(prompt_corto.texto))
+
+
+def obtener_feedback_gemini(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, edit_count, medicion=None, plazo=None):
+    """Feedback de una respuesta. `plazo` (plazos_llm.Plazo) es el del llamador, p. ej. una tarea de fondo
+    cancelable; la llamada añade su propio límite de CONSULTOR_PLAZO_FEEDBACK. Si la llamada a la IA falla,
+    el texto devuelto es el mensaje de error y también queda en medicion["error"]."""
+    llm = _llm_de_nivel(NIVEL_RAPIDO)
+    feedback_directo = _feedback_sin_llamada(llm, nombre_emprendedor, edit_count)
+    if feedback_directo is not None:
+        return feedback_directo
+
+    inicio = time.perf_counter()
+    rama, feedback_precalculado = _triaje_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor)
+    if feedback_precalculado is not None:
+        if medicion is not None:
+            medicion["modo"] = "triaje"
+            medicion["ttft"] = medicion["total"] = time.perf_counter() - inicio
+        return feedback_precalculado
+
+    cache = obtener_cache()
+    clave = _clave_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama)
+    if cache is not None:
+        feedback_en_cache = cache.obtener(clave)
+        if feedback_en_cache is not None:
+            if medicion is not None:
+                medicion["modo"] = "cache"
+                medicion["ttft"] = medicion["total"] = time.perf_counter() - inicio
+            return feedback_en_cache
+    feedback_parecido = _feedback_semantico(texto_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama)
+    if feedback_parecido is not None:
+        if cache is not None:
+            cache.guardar(clave, feedback_parecido)
+        if medicion is not None:
+            medicion["modo"] = "semantica"
+            medicion["ttft"] = medicion["total"] = time.perf_counter() - inicio
+        return feedback_parecido
+
+    prompt_consultor = prompt_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama)
+    _registrar_prompt_corto(rama, prompt_consultor, texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor)
+    try:
+        ai_response = _invocar(NIVEL_RAPIDO, "obtener_feedback_gemini", prompt_consultor, plazo_de("feedback", plazo), rama=rama)
+        # En el modo bloqueante el primer texto visible llega junto con la respuesta completa.
+        if medicion is not None:
+            medicion["modo"] = "bloqueante"
+            medicion["ttft"] = medicion["total"] = time.perf_counter() - inicio
+        if ai_response.content:
+            if cache is not None:
+                cache.guardar(clave, ai_response.content)
+            _feedback_semantico(texto_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama, ai_response.content)
+        return ai_response.content
+    except Exception as e:
+        mensaje = _mensaje_error_feedback(e)
+        if medicion is not None:
+            medicion["error"] = mensaje
+        return mensaje
+
+
+def transmitir_feedback_gemini(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, edit_count, medicion=None, plazo=None):
+    """Versión en streaming de obtener_feedback_gemini: produce el texto por fragmentos según llega.
+
+    Si la llamada falla a mitad del stream, el mensaje de error queda en medicion["error"]
+    para que quien consume el generador guarde ese mensaje en lugar del texto parcial.
+    """
+    if medicion is None:
+        medicion = {}
+    llm = _llm_de_nivel(NIVEL_RAPIDO)
+    feedback_directo = _feedback_sin_llamada(llm, nombre_emprendedor, edit_count)
+    if feedback_directo is not None:
+        yield feedback_directo
+        return
+
+    inicio = time.perf_counter()
+    rama, feedback_precalculado = _triaje_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor)
+    if feedback_precalculado is not None:
+        medicion["modo"] = "triaje"
+        medicion["ttft"] = medicion["total"] = time.perf_counter() - inicio
+        yield feedback_precalculado
+        return
+
+    cache = obtener_cache()
+    clave = _clave_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama)
+    if cache is not None:
+        feedback_en_cache = cache.obtener(clave)
+        if feedback_en_cache is not None:
+            medicion["modo"] = "cache"
+            medicion["ttft"] = medicion["total"] = time.perf_counter() - inicio
+            yield feedback_en_cache
+            return
+    feedback_parecido = _feedback_semantico(texto_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama)
+    if feedback_parecido is not None:
+        if cache is not None:
+            cache.guardar(clave, feedback_parecido)
+        medicion["modo"] = "semantica"
+        medicion["ttft"] = medicion["total"] = time.perf_counter() - inicio
+        yield feedback_parecido
+        return
+
+    prompt_consultor = prompt_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama)
+    _registrar_prompt_corto(rama, prompt_consultor, texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor)
+    medicion["modo"] = "streaming"
+    partes = []
+    try:
+        for chunk in _transmitir(NIVEL_RAPIDO, "transmitir_feedback_gemini", prompt_consultor, plazo_de("feedback", plazo), rama=rama):
+            texto_chunk = _texto_chunk(chunk)
+            if not texto_chunk:
+                continue
+            if "ttft" not in medicion:
+                medicion["ttft"] = time.perf_counter() - inicio
+            partes.append(texto_chunk)
+            yield texto_chunk
+    except Exception as e:
+        medicion["error"] = _mensaje_error_feedback(e)
+    else:
+        if partes:
+            if cache is not None:
+                cache.guardar(clave, "".join(partes))
+            _feedback_semantico(texto_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama, "".join(partes))
+    finally:
+        medicion["total"] = time.perf_counter() - inicio
+
+
+def _formatear_respuestas(respuestas_dict, preguntas_lista):
+    """(texto, tokens_recortados): las respuestas para el resumen, cada una recortada al presupuesto."""
+    texto_respuestas_formateado = "Información clave del emprendimiento:\n"
+    recortados = 0
+    for pregunta_obj in preguntas_lista:
+        q_id = pregunta_obj["id"]
+        q_texto = pregunta_obj["texto"]
+        respuesta_usuario = respuestas_dict.get(q_id, "").strip()
+        if respuesta_usuario and respuesta_usuario.lower() != "no respondida.":
+            respuesta_usuario, recortados_respuesta = recortar_respuesta(respuesta_usuario)
+            recortados += recortados_respuesta
+            texto_respuestas_formateado += f"- Para la pregunta '{q_texto}', la respuesta fue: {respuesta_usuario}\n"
+    return texto_respuestas_formateado, recortados
+
+
+# --- Resumen incremental: digesto por respuesta (map) + resumen y pitch a partir de los digestos (reduce) ---
+# Respuestas de hasta esta longitud se usan tal cual como digesto: resumirlas no ahorraría tokens.
+LONGITUD_DIGESTO_DIRECTO = 280
+
+
+def _respuesta_valida(respuesta_usuario):
+    return bool(respuesta_usuario) and respuesta_usuario.lower() != "no respondida."
+
+
+def _digerir_respuesta(q_id, texto_pregunta, respuesta_usuario, nombre_emprendimiento, plazo=None):
+    # Corre en un hilo del map; ante cualquier error (también un plazo vencido) se usa la respuesta original.
+    prompt = prompt_digesto(texto_pregunta, respuesta_usuario, nombre_emprendimiento)
+    try:
+        ai_response = _invocar(NIVEL_RAPIDO, "digerir_respuesta", prompt, plazo, q_id=q_id)
+        return ai_response.content or None
+    except Exception as e:
+        print(f"Error en llamada a Gemini API para el digesto de la pregunta {q_id}: {e}")
+        return None
+
+
+def calcular_digestos(respuestas_dict, preguntas_lista, nombre_emprendimiento, digestos, plazo=None):
+    """Map: asegura un digesto por respuesta respondida y devuelve cuántos se calcularon, reutilizaron o usaron tal cual.
+
+    `digestos` es {q_id: (clave, texto)}, normalmente en st.session_state; la clave es el hash de la
+    pregunta y la respuesta, así que solo se recalculan las respuestas editadas. Los que faltan se
+    piden a la vez (el gobernador limita la concurrencia real) y también se guardan en la caché global.
+    Cada digesto tiene el límite de CONSULTOR_PLAZO_DIGESTO, dentro del `plazo` del resumen si lo hay.
+    """
+    cache = obtener_cache()
+    faltantes = {}
+    reutilizados = 0
+    directos = 0
+    for pregunta_obj in preguntas_lista:
+        q_id = pregunta_obj["id"]
+        respuesta_usuario = respuestas_dict.get(q_id, "").strip()
+        if not _respuesta_valida(respuesta_usuario):
+            digestos.pop(q_id, None)
+            continue
+        clave = clave_cache(
+            "digesto", obtener_registro().modelo_cache(NIVEL_RAPIDO), temperatura_llm,
+            q_id=q_id, pregunta=pregunta_obj["texto"], respuesta=respuesta_usuario, emprendimiento=nombre_emprendimiento,
+        )
+        guardado = digestos.get(q_id)
+        if guardado is not None and guardado[0] == clave:
+            reutilizados += 1
+            continue
+        if len(respuesta_usuario) <= LONGITUD_DIGESTO_DIRECTO:
+            digestos[q_id] = (clave, respuesta_usuario)
+            directos += 1
+            continue
+        en_cache = cache.obtener(clave) if cache is not None else None
+        if en_cache is not None:
+            digestos[q_id] = (clave, en_cache)
+            reutilizados += 1
+            continue
+        faltantes[q_id] = (clave, pregunta_obj["texto"], respuesta_usuario)
+
+    if faltantes:
+        plazo_digestos = plazo_de("digesto", plazo)
+        with ThreadPoolExecutor(max_workers=len(faltantes), thread_name_prefix="digesto") as pool:
+            futuros = {
+                q_id: pool.submit(_digerir_respuesta, q_id, texto_pregunta, respuesta_usuario, nombre_emprendimiento, plazo_digestos)
+                for q_id, (_, texto_pregunta, respuesta_usuario) in faltantes.items()
+            }
+        for q_id, futuro in futuros.items():
+            clave, _, respuesta_usuario = faltantes[q_id]
+            texto = futuro.result()
+            if texto is None:
+                # Sin digesto se usa la respuesta completa; no se guarda para reintentarlo la próxima vez.
+                digestos.pop(q_id, None)
+                continue
+            digestos[q_id] = (clave, texto)
+            if cache is not None:
+                cache.guardar(clave, texto)
+    return {"calculados": len(faltantes), "reutilizados": reutilizados, "directos": directos}
+
+
+def _formatear_digestos(respuestas_dict, preguntas_lista, digestos):
+    # Mismo formato que _formatear_respuestas, con el digesto en lugar de la respuesta cuando existe.
+    texto_respuestas_formateado = "Información clave del emprendimiento (resumida por pregunta):\n"
+    recortados = 0
+    for pregunta_obj in preguntas_lista:
+        q_id = pregunta_obj["id"]
+        respuesta_usuario = respuestas_dict.get(q_id, "").strip()
+        if not _respuesta_valida(respuesta_usuario):
+            continue
+        digesto = digestos.get(q_id)
+        if digesto is not None:
+            contenido = digesto[1].strip()
+        else:
+            contenido, recortados_respuesta = recortar_respuesta(respuesta_usuario)
+            recortados += recortados_respuesta
+        texto_respuestas_formateado += f"- Para la pregunta '{pregunta_obj['texto']}':\n{contenido}\n"
+    return texto_respuestas_formateado, recortados
+
+
+def _texto_para_resumen(respuestas_dict, preguntas_lista, nombre_emprendimiento, digestos, resultado, plazo=None):
+    # Con digestos (modo incremental) hace el map y devuelve el texto reducido; sin ellos, las respuestas
+    # completas. En los dos casos devuelve también los tokens recortados por el presupuesto.
+    if digestos is None:
+        return _formatear_respuestas(respuestas_dict, preguntas_lista)
+    resultado["digestos"] = calcular_digestos(respuestas_dict, preguntas_lista, nombre_emprendimiento, digestos, plazo)
+    return _formatear_digestos(respuestas_dict, preguntas_lista, digestos)
+
+
+def _resumen_sin_llamada(llm, texto_respuestas_formateado):
+    # Mensajes que se devuelven sin llamar a Gemini (modelo no disponible o información insuficiente).
+    if not llm:
+        if _llm_initialization_error: return f"Error al inicializar el modelo de IA: {_llm_initialization_error}"
+        elif not resolver_api_key(): return "Error: API Key de Google no configurada para resumen/pitch."
+        return "Error: El modelo de lenguaje no está disponible para generar el resumen y pitch."
+
+    if len(texto_respuestas_formateado) < 100: # Aumentar un poco el umbral
+        return "No hay suficiente información en tus respuestas para generar un resumen detallado y un pitch. Por favor, completa más preguntas de forma detallada."
+    return None
+
+
+def generar_resumen_y_pitch(respuestas_dict, preguntas_lista, nombre_emprendimiento, nombre_emprendedor, digestos=None, resultado=None, plazo=None):
+    """Resumen y pitch con un único prompt. Con `digestos` (ver calcular_digestos) el prompt usa los digestos.
+    Todo, digestos incluidos, cabe en el límite de CONSULTOR_PLAZO_RESUMEN. Si la llamada a la IA falla, el
+    texto devuelto es el mensaje de error y también queda en resultado["error"]."""
+    if resultado is None:
+        resultado = {}
+    llm = _llm_de_nivel(NIVEL_CALIDAD)
+    mensaje_directo = _resumen_sin_llamada(llm, _formatear_respuestas(respuestas_dict, preguntas_lista)[0])
+    if mensaje_directo is not None:
+        return mensaje_directo
+    plazo = plazo_de("resumen", plazo)
+    texto_respuestas_formateado, tokens_recortados = _texto_para_resumen(
+        respuestas_dict, preguntas_lista, nombre_emprendimiento, digestos, resultado, plazo
+    )
+
+    cache = obtener_cache()
+    clave = clave_cache(
+        "resumen_pitch", obtener_registro().modelo_cache(NIVEL_CALIDAD), temperatura_llm,
+        respuestas=texto_respuestas_formateado,
+        emprendimiento=nombre_emprendimiento, emprendedor=nombre_emprendedor,
+    )
+    if cache is not None:
+        resumen_en_cache = cache.obtener(clave)
+        if resumen_en_cache is not None:
+            return resumen_en_cache
+
+    prompt = prompt_resumen_pitch(
+        texto_respuestas_formateado, nombre_emprendimiento, nombre_emprendedor,
+        [encabezado_seccion(seccion, nombre_emprendimiento) for seccion in SECCIONES_RESUMEN_PITCH], tokens_recortados,
+    )
+    try:
+        ai_response = _invocar(NIVEL_CALIDAD, "generar_resumen_y_pitch", prompt, plazo)
+        if cache is not None and ai_response.content:
+            cache.guardar(clave, ai_response.content)
+        return ai_response.content
+    except Exception as e:
+        resultado["error"] = _mensaje_error_resumen(e)
+        return resultado["error"]
+
+
+def _mensaje_error_resumen(e):
+    print(f"Error en llamada a Gemini API para resumen/pitch: {e}")
+    if _mensaje_plazo(e) is not None:
+        return _mensaje_plazo(e)
+    if isinstance(e, (CircuitoAbierto, EsperaAgotada)):
+        return MENSAJE_IA_SATURADA
+    return "Hubo un error al generar el resumen y pitch. El equipo técnico ha sido notificado."
+
+
+# --- Resumen y pitch como dos llamadas concurrentes ---
+SECCIONES_RESUMEN_PITCH = ("resumen", "pitch")
+
+
+def encabezado_seccion(seccion, nombre_emprendimiento):
+    nombre = nombre_emprendimiento.upper() if nombre_emprendimiento else 'EL PROYECTO'
+    if seccion == "resumen":
+        return f"## Resumen Ejecutivo Detallado: {nombre}"
+    return f"## Borrador de Pitch de Elevador (3 Minutos): {nombre}"
+
+
+def combinar_resumen_y_pitch(textos, nombre_emprendimiento):
+    # Mismo formato Markdown que devuelve generar_resumen_y_pitch con un único prompt.
+    partes = ["---"]
+    for seccion in SECCIONES_RESUMEN_PITCH:
+        partes.append(f"{encabezado_seccion(seccion, nombre_emprendimiento)}\n\n{textos[seccion].strip()}\n\n---")
+    return "\n".join(partes)
+
+
+def transmitir_resumen_y_pitch(respuestas_dict, preguntas_lista, nombre_emprendimiento, nombre_emprendedor, resultado=None, digestos=None, plazo=None):
+    """Genera el resumen ejecutivo y el pitch como dos llamadas concurrentes en streaming.
+
+    Produce tuplas (seccion, fragmento) en el hilo que consume el generador, en el orden en que llegan.
+    Al terminar, resultado["texto"] contiene el Markdown combinado (o el mensaje de error) y
+    resultado["latencias"] el primer fragmento y el total de cada sección, más el tiempo de reloj.
+    Con `digestos` se hace antes el map de calcular_digestos (resultado["digestos"] y latencias["digestos"]).
+    Digestos y secciones comparten el límite de CONSULTOR_PLAZO_RESUMEN; si quien consume el generador lo
+    abandona (p. ej. un rerun de Streamlit), las secciones se cancelan.
+    """
+    if resultado is None:
+        resultado = {}
+    llm = _llm_de_nivel(NIVEL_CALIDAD)
+    mensaje_directo = _resumen_sin_llamada(llm, _formatear_respuestas(respuestas_dict, preguntas_lista)[0])
+    if mensaje_directo is not None:
+        resultado["texto"] = mensaje_directo
+        return
+
+    plazo = plazo_de("resumen", plazo)
+    cache = obtener_cache()
+    cola = queue.Queue()
+    latencias = {seccion: {} for seccion in SECCIONES_RESUMEN_PITCH}
+    inicio = time.perf_counter()
+    texto_respuestas_formateado, tokens_recortados = _texto_para_resumen(respuestas_dict, preguntas_lista, nombre_emprendimiento, digestos, resultado, plazo)
+    if digestos is not None:
+        latencias["digestos"] = time.perf_counter() - inicio
+
+    def generar_seccion(seccion):
+        # Corre en un hilo propio: solo escribe en la cola, nunca en Streamlit.
+        clave = clave_cache(
+            f"seccion_{seccion}", obtener_registro().modelo_cache(NIVEL_CALIDAD), temperatura_llm,
+            respuestas=texto_respuestas_formateado,
+            emprendimiento=nombre_emprendimiento, emprendedor=nombre_emprendedor,
+        )
+        try:
+            texto = cache.obtener(clave) if cache is not None else None
+            if texto is not None:
+                cola.put((seccion, texto, None))
+                latencias[seccion]["ttft"] = time.perf_counter() - inicio
+            else:
+                prompt = prompt_seccion(seccion, texto_respuestas_formateado, nombre_emprendimiento, nombre_emprendedor, tokens_recortados)
+                partes = []
+                for chunk in _transmitir(NIVEL_CALIDAD, "transmitir_resumen_y_pitch", prompt, plazo, seccion=seccion):
+                    texto_chunk = _texto_chunk(chunk)
+                    if not texto_chunk:
+                        continue
+                    latencias[seccion].setdefault("ttft", time.perf_counter() - inicio)
+                    partes.append(texto_chunk)
+                    cola.put((seccion, texto_chunk, None))
+                if cache is not None and partes:
+                    cache.guardar(clave, "".join(partes))
+        except Exception as e:
+            cola.put((seccion, None, e))
+        finally:
+            latencias[seccion]["total"] = time.perf_counter() - inicio
+            cola.put((seccion, None, None))
+
+    hilos = [threading.Thread(target=generar_seccion, args=(seccion,), daemon=True) for seccion in SECCIONES_RESUMEN_PITCH]
+    for hilo in hilos:
+        hilo.start()
+
+    textos = {seccion: "" for seccion in SECCIONES_RESUMEN_PITCH}
+    error = None
+    terminadas = 0
+    try:
+        while terminadas < len(hilos):
+            seccion, fragmento, excepcion = cola.get()
+            if excepcion is not None:
+                error = error or excepcion
+            elif fragmento is None:
+                terminadas += 1
+            else:
+                textos[seccion] += fragmento
+                yield seccion, fragmento
+    finally:
+        if terminadas < len(hilos):
+            plazo.cancelar("abandonada")
+
+    latencias["reloj"] = time.perf_counter() - inicio
+    resultado["latencias"] = latencias
+    if error is not None:
+        resultado["texto"] = _mensaje_error_resumen(error)
+    else:
+        resultado["texto"] = combinar_resumen_y_pitch(textos, nombre_emprendimiento)
@@ -0,0 +1,397 @@
+"""Gobernador de llamadas a Gemini, compartido por todas las sesiones del proceso.
+
+Toda llamada al LLM pasa por aquí y atraviesa, en orden:
+1. El cortacircuitos: si el servicio viene fallando, se rechaza al instante con CircuitoAbierto.
+2. La concurrencia adaptativa: un máximo de llamadas simultáneas que se reduce a la mitad con cada
+   error de cuota/429 y vuelve a crecer de uno en uno con las llamadas correctas.
+3. Los cubos de tokens de peticiones por minuto (RPM) y tokens por minuto (TPM).
+4. Reintentos con backoff exponencial y jitter para los errores transitorios.
+
+Las llamadas síncronas aceptan un plazos_llm.Plazo: la espera de turno, los reintentos y cada fragmento
+de un stream respetan su hora límite y su cancelación. Las asíncronas se cancelan con la tarea. Una llamada
+cancelada libera su hueco sin contar ni como éxito ni como fallo; una que agotó su plazo cuenta como fallo
+transitorio (un servicio colgado debe acabar abriendo el circuito).
+
+Configuración por variables de entorno:
+    CONSULTOR_RPM / CONSULTOR_TPM               límites por minuto (por defecto 15 y 1.000.000; 0 = sin límite)
+    CONSULTOR_CONCURRENCIA_MAX                  llamadas simultáneas máximas (por defecto 8)
+    CONSULTOR_REINTENTOS                        reintentos por llamada (por defecto 3)
+    CONSULTOR_BACKOFF_BASE / CONSULTOR_BACKOFF_MAX   segundos del backoff (por defecto 1 y 30)
+    CONSULTOR_CIRCUITO_FALLOS                   fallos seguidos que abren el circuito (por defecto 5)
+    CONSULTOR_CIRCUITO_ESPERA                   segundos con el circuito abierto (por defecto 60)
+    CONSULTOR_ESPERA_MAX                        espera máxima en cola antes de rendirse (por defecto 120)
+"""
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from plazos_llm import CANCELACION_POR_PLAZO, LlamadaCancelada, PlazoVencido
+
+RPM = float(os.getenv("CONSULTOR_RPM", "15"))
+TPM = float(os.getenv("CONSULTOR_TPM", "1000000"))
+CONCURRENCIA_MAX = int(os.getenv("CONSULTOR_CONCURRENCIA_MAX", "8"))
+REINTENTOS = int(os.getenv("CONSULTOR_REINTENTOS", "3"))
+BACKOFF_BASE = float(os.getenv("CONSULTOR_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.getenv("CONSULTOR_BACKOFF_MAX", "30"))
+CIRCUITO_FALLOS = int(os.getenv("CONSULTOR_CIRCUITO_FALLOS", "5"))
+CIRCUITO_ESPERA = float(os.getenv("CONSULTOR_CIRCUITO_ESPERA", "60"))
+ESPERA_MAX = float(os.getenv("CONSULTOR_ESPERA_MAX", "120"))
+
+# Tokens de salida que se reservan por llamada además del prompt (se corrige con el uso real si llega).
+RESERVA_TOKENS_SALIDA = 800
+# Cada cuánto vuelve a intentar entrar una llamada asíncrona que espera un hueco de concurrencia.
+INTERVALO_SONDEO_ASYNC = 0.05
+
+
+class CircuitoAbierto(Exception):
+    """El servicio de IA viene fallando y las llamadas se rechazan sin intentarlas."""
+
+
+class EsperaAgotada(Exception):
+    """La llamada esperó en cola más de lo permitido."""
+
+
+CARACTERES_POR_TOKEN = 4
+
+
+def contar_tokens(texto):
+    # Aproximación barata (~4 caracteres por token) para no depender del tokenizador de Gemini.
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def estimar_tokens(texto):
+    return contar_tokens(texto) + RESERVA_TOKENS_SALIDA
+
+
+def es_error_de_cuota(e):
+    texto = str(e).lower()
+    return "quota" in texto or "429" in texto or "resource exhausted" in texto or "resourceexhausted" in type(e).__name__.lower()
+
+
+def es_error_transitorio(e):
+    if es_error_de_cuota(e) or isinstance(e, PlazoVencido):
+        return True
+    texto = f"{type(e).__name__} {e}".lower()
+    return any(marca in texto for marca in ("500", "502", "503", "504", "unavailable", "deadline", "timeout", "timed out", "connection", "internal"))
+
+
+class CuboDeTokens:
+    """Cubo que se rellena de forma continua: capacidad por minuto, repuesta a capacidad/60 por segundo.
+
+    Una capacidad de 0 o menos desactiva el límite.
+    """
+
+    def __init__(self, capacidad_por_minuto):
+        self.capacidad = capacidad_por_minuto
+        self.disponible = capacidad_por_minuto
+        self.ultimo = time.monotonic()
+
+    def _rellenar(self, ahora):
+        self.disponible = min(self.capacidad, self.disponible + (ahora - self.ultimo) * self.capacidad / 60.0)
+        self.ultimo = ahora
+
+    def espera_necesaria(self, cantidad, ahora):
+        if self.capacidad <= 0:
+            return 0.0
+        self._rellenar(ahora)
+        cantidad = min(cantidad, self.capacidad)
+        if self.disponible >= cantidad:
+            return 0.0
+        return (cantidad - self.disponible) * 60.0 / self.capacidad
+
+    def consumir(self, cantidad):
+        # Puede quedar en negativo al corregir con el uso real; las siguientes llamadas esperan más.
+        if self.capacidad > 0:
+            self.disponible -= min(cantidad, self.capacidad)
+
+
+class GobernadorLLM:
+    def __init__(self, rpm=RPM, tpm=TPM, concurrencia_max=CONCURRENCIA_MAX, reintentos=REINTENTOS,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, circuito_fallos=CIRCUITO_FALLOS,
+                 circuito_espera=CIRCUITO_ESPERA, espera_max=ESPERA_MAX, dormir=time.sleep):
+        self.cubo_peticiones = CuboDeTokens(rpm)
+        self.cubo_tokens = CuboDeTokens(tpm)
+        self.concurrencia_max = concurrencia_max
+        self.limite_concurrencia = concurrencia_max
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.circuito_fallos = circuito_fallos
+        self.circuito_espera = circuito_espera
+        self.espera_max = espera_max
+        self._dormir = dormir
+        self._condicion = threading.Condition()
+        self._en_vuelo = 0
+        self._en_cola = 0
+        self._exitos_seguidos = 0
+        self._fallos_seguidos = 0
+        self._circuito_abierto_hasta = 0.0
+        self._prueba_en_curso = False
+        self._prueba_entrante = False
+        self._esperas = deque(maxlen=500)
+        self.contadores = {"llamadas": 0, "reintentos": 0, "errores_cuota": 0, "errores": 0, "rechazadas_circuito": 0}
+
+    # --- Cortacircuitos ---
+    def estado_circuito(self):
+        with self._condicion:
+            return self._estado_circuito(time.monotonic())
+
+    def _estado_circuito(self, ahora):
+        if self._fallos_seguidos < self.circuito_fallos:
+            return "cerrado"
+        return "abierto" if ahora < self._circuito_abierto_hasta else "semiabierto"
+
+    # --- Admisión ---
+    def _intentar_adquirir(self, tokens, ahora):
+        """Un intento de admisión, con el lock tomado. Devuelve 0.0 si la llamada entra (y la cuenta),
+        None si espera un hueco de concurrencia o los segundos que faltan en los cubos. Si la llamada entra
+        como prueba del circuito semiabierto, queda anotada en self._prueba_entrante."""
+        estado = self._estado_circuito(ahora)
+        if estado == "abierto" or (estado == "semiabierto" and self._prueba_en_curso):
+            self.contadores["rechazadas_circuito"] += 1
+            raise CircuitoAbierto("El servicio de IA está en pausa tras varios fallos seguidos.")
+        if self._en_vuelo >= self.limite_concurrencia:
+            return None
+        espera = max(self.cubo_peticiones.espera_necesaria(1, ahora), self.cubo_tokens.espera_necesaria(tokens, ahora))
+        if espera > 0:
+            return espera
+        self._prueba_entrante = estado == "semiabierto"
+        if self._prueba_entrante:
+            self._prueba_en_curso = True
+        self.cubo_peticiones.consumir(1)
+        self.cubo_tokens.consumir(tokens)
+        self._en_vuelo += 1
+        self.contadores["llamadas"] += 1
+        return 0.0
+
+    def _adquirir(self, tokens, plazo=None):
+        """Espera turno. Devuelve True si la llamada es la prueba del circuito semiabierto."""
+        inicio = time.monotonic()
+        with self._condicion:
+            self._en_cola += 1
+            try:
+                while True:
+                    if plazo is not None:
+                        plazo.comprobar()
+                    ahora = time.monotonic()
+                    espera = self._intentar_adquirir(tokens, ahora)
+                    if espera == 0.0:
+                        return self._prueba_entrante
+                    restante = self.espera_max - (ahora - inicio)
+                    if restante <= 0:
+                        raise EsperaAgotada(f"La llamada a la IA esperó más de {self.espera_max:.0f} s en cola.")
+                    if plazo is not None:
+                        # Se despierta a tiempo de ver la hora límite o la cancelación.
+                        restante = min(restante, max(plazo.intervalo(), 0.001))
+                    self._condicion.wait(restante if espera is None else min(espera, restante))
+            finally:
+                self._en_cola -= 1
+                self._esperas.append(time.monotonic() - inicio)
+
+    async def _adquirir_async(self, tokens):
+        # Misma admisión sin bloquear el bucle de eventos: en lugar de esperar en la condición, se duerme
+        # con asyncio y se vuelve a intentar.
+        inicio = time.monotonic()
+        with self._condicion:
+            self._en_cola += 1
+        try:
+            while True:
+                ahora = time.monotonic()
+                with self._condicion:
+                    espera = self._intentar_adquirir(tokens, ahora)
+                    prueba = self._prueba_entrante
+                if espera == 0.0:
+                    return prueba
+                restante = self.espera_max - (ahora - inicio)
+                if restante <= 0:
+                    raise EsperaAgotada(f"La llamada a la IA esperó más de {self.espera_max:.0f} s en cola.")
+                await asyncio.sleep(min(restante, INTERVALO_SONDEO_ASYNC if espera is None else espera))
+        finally:
+            with self._condicion:
+                self._en_cola -= 1
+                self._esperas.append(time.monotonic() - inicio)
+
+    def _liberar(self, error=None, tokens_estimados=0, tokens_reales=None, prueba=False, neutral=False):
+        """Devuelve el hueco de una llamada. `neutral` (llamada cancelada por quien la esperaba) no toca
+        los contadores del circuito ni de la concurrencia adaptativa; `prueba` marca la llamada de prueba
+        del circuito semiabierto, la única que al terminar deja pasar otra prueba."""
+        with self._condicion:
+            self._en_vuelo -= 1
+            if prueba:
+                self._prueba_en_curso = False
+            if tokens_reales is not None:
+                self.cubo_tokens.consumir(tokens_reales - tokens_estimados)
+            if neutral:
+                pass
+            elif error is None:
+                self._fallos_seguidos = 0
+                self._exitos_seguidos += 1
+                # Aumento aditivo: recupera un hueco por cada "límite" llamadas correctas seguidas.
+                if self.limite_concurrencia < self.concurrencia_max and self._exitos_seguidos >= self.limite_concurrencia:
+                    self.limite_concurrencia += 1
+                    self._exitos_seguidos = 0
+            else:
+                self._exitos_seguidos = 0
+                if es_error_de_cuota(error):
+                    self.contadores["errores_cuota"] += 1
+                    # Reducción multiplicativa ante 429/cuota.
+                    self.limite_concurrencia = max(1, self.limite_concurrencia // 2)
+                else:
+                    self.contadores["errores"] += 1
+                if es_error_transitorio(error):
+                    self._fallos_seguidos += 1
+                    if self._fallos_seguidos >= self.circuito_fallos:
+                        self._circuito_abierto_hasta = time.monotonic() + self.circuito_espera
+            self._condicion.notify_all()
+
+    def _espera_reintento(self, intento):
+        # Backoff exponencial con jitter completo.
+        self.contadores["reintentos"] += 1
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** intento)))
+
+    def _pausa_reintento(self, intento, plazo=None):
+        espera = self._espera_reintento(intento)
+        if plazo is not None and plazo.restante() is not None:
+            # No tiene sentido dormir más allá del plazo: el siguiente intento ya no entraría.
+            espera = min(espera, plazo.restante())
+        self._dormir(espera)
+
+    # --- API pública ---
+    def ejecutar(self, llamada, tokens_estimados, plazo=None):
+        """Ejecuta llamada() respetando los límites; reintenta los errores transitorios."""
+        for intento in range(self.reintentos + 1):
+            prueba = self._adquirir(tokens_estimados, plazo)
+            try:
+                resultado = llamada()
+            except Exception as e:
+                self._liberar(error=e, tokens_estimados=tokens_estimados, prueba=prueba)
+                if intento >= self.reintentos or not es_error_transitorio(e):
+                    raise
+                self._pausa_reintento(intento, plazo)
+                continue
+            self._liberar(tokens_estimados=tokens_estimados, tokens_reales=_tokens_reales(resultado), prueba=prueba)
+            return resultado
+
+    def transmitir(self, iniciar_stream, tokens_estimados, plazo=None):
+        """Versión en streaming: solo se reintenta si el error llega antes del primer fragmento."""
+        for intento in range(self.reintentos + 1):
+            prueba = self._adquirir(tokens_estimados, plazo)
+            emitido = False
+            try:
+                for chunk in iniciar_stream():
+                    if plazo is not None:
+                        plazo.comprobar()
+                    emitido = True
+                    yield chunk
+            except (GeneratorExit, LlamadaCancelada):
+                # Quien esperaba el stream lo dejó: no dice nada del servicio.
+                self._liberar(tokens_estimados=tokens_estimados, prueba=prueba, neutral=True)
+                raise
+            except PlazoVencido as e:
+                # Fallo transitorio, pero sin reintento: el plazo ya no deja tiempo.
+                self._liberar(error=e, tokens_estimados=tokens_estimados, prueba=prueba)
+                raise
+            except Exception as e:
+                self._liberar(error=e, tokens_estimados=tokens_estimados, prueba=prueba)
+                if emitido or intento >= self.reintentos or not es_error_transitorio(e):
+                    raise
+                self._pausa_reintento(intento, plazo)
+                continue
+            self._liberar(tokens_estimados=tokens_estimados, prueba=prueba)
+            return
+
+    async def ejecutar_async(self, llamada, tokens_estimados):
+        """Como ejecutar(), para corrutinas: await llamada() con los mismos límites y reintentos."""
+        for intento in range(self.reintentos + 1):
+            prueba = await self._adquirir_async(tokens_estimados)
+            try:
+                resultado = await llamada()
+            except asyncio.CancelledError as e:
+                self._liberar_cancelada(e, tokens_estimados, prueba)
+                raise
+            except Exception as e:
+                self._liberar(error=e, tokens_estimados=tokens_estimados, prueba=prueba)
+                if intento >= self.reintentos or not es_error_transitorio(e):
+                    raise
+                await asyncio.sleep(self._espera_reintento(intento))
+                continue
+            self._liberar(tokens_estimados=tokens_estimados, tokens_reales=_tokens_reales(resultado), prueba=prueba)
+            return resultado
+
+    async def transmitir_async(self, iniciar_stream, tokens_estimados):
+        """Como transmitir(), para iteradores asíncronos (llm.astream)."""
+        for intento in range(self.reintentos + 1):
+            prueba = await self._adquirir_async(tokens_estimados)
+            emitido = False
+            try:
+                async for chunk in iniciar_stream():
+                    emitido = True
+                    yield chunk
+            except GeneratorExit:
+                self._liberar(tokens_estimados=tokens_estimados, prueba=prueba, neutral=True)
+                raise
+            except asyncio.CancelledError as e:
+                self._liberar_cancelada(e, tokens_estimados, prueba)
+                raise
+            except Exception as e:
+                self._liberar(error=e, tokens_estimados=tokens_estimados, prueba=prueba)
+                if emitido or intento >= self.reintentos or not es_error_transitorio(e):
+                    raise
+                await asyncio.sleep(self._espera_reintento(intento))
+                continue
+            self._liberar(tokens_estimados=tokens_estimados, prueba=prueba)
+            return
+
+    def _liberar_cancelada(self, cancelacion, tokens_estimados, prueba):
+        # La pasarela cancela con CANCELACION_POR_PLAZO cuando su último interesado agotó el plazo.
+        if cancelacion.args and cancelacion.args[0] == CANCELACION_POR_PLAZO:
+            error = PlazoVencido("La llamada a la IA superó su plazo.")
+            self._liberar(error=error, tokens_estimados=tokens_estimados, prueba=prueba)
+        else:
+            self._liberar(tokens_estimados=tokens_estimados, prueba=prueba, neutral=True)
+
+    def estadisticas(self):
+        with self._condicion:
+            esperas = sorted(self._esperas)
+            return {
+                "en_cola": self._en_cola,
+                "en_vuelo": self._en_vuelo,
+                "limite_concurrencia": self.limite_concurrencia,
+                "concurrencia_max": self.concurrencia_max,
+                "circuito": self._estado_circuito(time.monotonic()),
+                "espera_media_s": sum(esperas) / len(esperas) if esperas else 0.0,
+                "espera_p95_s": esperas[min(len(esperas) - 1, int(len(esperas) * 0.95))] if esperas else 0.0,
+                **self.contadores,
+            }
+
+
+def _tokens_reales(respuesta):
+    uso = getattr(respuesta, "usage_metadata", None)
+    if isinstance(uso, dict) and uso.get("total_tokens"):
+        return uso["total_tokens"]
+    return None
+
+
+_gobernador_global = None
+_gobernador_lock = threading.Lock()
+
+
+def configurar_gobernador(**opciones):
+    """Sustituye el gobernador del proceso (p. ej. sin límites de cuota al usar un LLM falso)."""
+    global _gobernador_global
+    with _gobernador_lock:
+        _gobernador_global = GobernadorLLM(**opciones)
+        return _gobernador_global
+
+
+def obtener_gobernador():
+    """Instancia única por proceso, compartida por la app, los hilos de fondo y la CLI."""
+    global _gobernador_global
+    with _gobernador_lock:
+        if _gobernador_global is None:
+            _gobernador_global = GobernadorLLM()
+        return _gobernador_global
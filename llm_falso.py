@@ -0,0 +1,119 @@
+"""LLM local y determinista que imita la interfaz de ChatGoogleGenerativeAI (invoke / stream y sus
+versiones asíncronas ainvoke / astream, que usa pasarela_llm).
+
+Sirve para benchmarks y pruebas sin red ni cuota. Se conecta con consultor_ia.fijar_llm(LLMFalso()).
+La latencia, su variación (jitter) y los errores inyectados salen de un generador con semilla, así que
+dos ejecuciones con la misma semilla y el mismo orden de llamadas se comportan igual.
+"""
+import asyncio
+import contextlib
+import math
+import random
+import threading
+import time
+
+
+class RespuestaFalsa:
+    def __init__(self, content, usage_metadata=None):
+        self.content = content
+        self.response_metadata = {}
+        self.usage_metadata = usage_metadata
+
+
+class ErrorFalso(Exception):
+    """Error inyectado por LLMFalso; el texto imita los errores transitorios de Gemini."""
+
+
+def _uso(messages, texto):
+    entrada = math.ceil(sum(len(getattr(m, "content", str(m))) for m in messages) / 4)
+    salida = math.ceil(len(texto) / 4)
+    return {"input_tokens": entrada, "output_tokens": salida, "total_tokens": entrada + salida}
+
+
+class LLMFalso:
+    def __init__(self, latencia=0.0, texto="Respuesta simulada del consultor IA.", trozos=8,
+                 jitter=0.0, tasa_error=0.0, error="503 Service Unavailable (error simulado)", semilla=None):
+        self.latencia = latencia
+        self.texto = texto
+        self.trozos = max(1, trozos)
+        self.jitter = jitter
+        self.tasa_error = tasa_error
+        self.error = error
+        self._azar = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.errores_inyectados = 0
+        self.en_curso = 0
+        self.max_en_curso = 0
+
+    def _preparar_llamada(self):
+        # Un solo sorteo por llamada, bajo lock, para que el reparto no dependa de qué hilo llega antes al azar.
+        with self._lock:
+            self.llamadas += 1
+            latencia = max(0.0, self.latencia + self._azar.uniform(-self.jitter, self.jitter)) if self.jitter else self.latencia
+            falla = self.tasa_error > 0 and self._azar.random() < self.tasa_error
+            if falla:
+                self.errores_inyectados += 1
+        return latencia, falla
+
+    @contextlib.contextmanager
+    def _en_curso(self):
+        # Llamadas simultáneas, para comprobar los límites de concurrencia desde los benchmarks.
+        with self._lock:
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+
+    def _trozos(self, messages):
+        paso = max(1, len(self.texto) // self.trozos)
+        for inicio in range(0, len(self.texto), paso):
+            final = inicio + paso >= len(self.texto)
+            # El uso de tokens viaja solo en el último fragmento, como en la API real.
+            yield RespuestaFalsa(self.texto[inicio:inicio + paso], _uso(messages, self.texto) if final else None)
+
+    def invoke(self, messages, **kwargs):
+        latencia, falla = self._preparar_llamada()
+        with self._en_curso():
+            if latencia:
+                time.sleep(latencia)
+            if falla:
+                raise ErrorFalso(self.error)
+            return RespuestaFalsa(self.texto, _uso(messages, self.texto))
+
+    def stream(self, messages, **kwargs):
+        latencia, falla = self._preparar_llamada()
+        with self._en_curso():
+            if falla:
+                # Como Gemini, el error llega antes del primer fragmento.
+                if latencia:
+                    time.sleep(latencia / self.trozos)
+                raise ErrorFalso(self.error)
+            for trozo in self._trozos(messages):
+                if latencia:
+                    time.sleep(latencia / self.trozos)
+                yield trozo
+
+    async def ainvoke(self, messages, **kwargs):
+        latencia, falla = self._preparar_llamada()
+        with self._en_curso():
+            if latencia:
+                await asyncio.sleep(latencia)
+            if falla:
+                raise ErrorFalso(self.error)
+            return RespuestaFalsa(self.texto, _uso(messages, self.texto))
+
+    async def astream(self, messages, **kwargs):
+        latencia, falla = self._preparar_llamada()
+        with self._en_curso():
+            if falla:
+                if latencia:
+                    await asyncio.sleep(latencia / self.trozos)
+                raise ErrorFalso(self.error)
+            for trozo in self._trozos(messages):
+                if latencia:
+                    await asyncio.sleep(latencia / self.trozos)
+                yield trozo
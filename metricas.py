@@ -0,0 +1,340 @@
+"""Instrumentación del consultor: latencias, tokens, errores y duración de los reruns.
+
+Las métricas son de proceso (compartidas por todas las sesiones) y se exportan en formato de texto de
+Prometheus con exportar_prometheus(). Si CONSULTOR_METRICAS_PUERTO está definido, app.py levanta además
+un servidor HTTP mínimo que las sirve en /metrics.
+
+Para enviar los spans a un sistema de trazas propio basta con registrar un hook:
+
+    import metricas
+    metricas.registrar_hook(lambda span: mi_tracer.enviar(span.nombre, span.inicio, span.duracion, span.atributos))
+"""
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from gobernador_llm import es_error_de_cuota
+from plazos_llm import LlamadaCancelada, PlazoVencido
+
+BUCKETS_LLM = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+BUCKETS_RERUN = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+_lock = threading.Lock()
+_hooks = []
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * len(buckets)
+        self.suma = 0.0
+        self.total = 0
+        self.recientes = deque(maxlen=1000)  # Para percentiles exactos en el panel
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.conteos[i] += 1
+        self.suma += valor
+        self.total += 1
+        self.recientes.append(valor)
+
+    def percentil(self, p):
+        if not self.recientes:
+            return 0.0
+        ordenados = sorted(self.recientes)
+        return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+# Series indexadas por una tupla de etiquetas ordenadas.
+_latencias_llm = defaultdict(lambda: Histograma(BUCKETS_LLM))   # (funcion, modelo)
+_duracion_reruns = Histograma(BUCKETS_RERUN)
+_llamadas = defaultdict(int)    # (funcion, modelo, resultado)
+_tokens = defaultdict(int)      # (funcion, modelo, tipo)
+_tokens_estimados = defaultdict(int)   # (funcion, modelo, parte): estimación local del prompt enviado
+
+
+def registrar_hook(hook):
+    """hook(span) se llama al cerrar cada span; sus excepciones se ignoran para no romper la app."""
+    with _lock:
+        _hooks.append(hook)
+
+
+def quitar_hook(hook):
+    with _lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def clasificar_error(e):
+    if e is None:
+        return "ok"
+    if isinstance(e, LlamadaCancelada):
+        return "cancelada"
+    if isinstance(e, PlazoVencido):
+        return "plazo"
+    return "cuota" if es_error_de_cuota(e) else "error"
+
+
+class Span:
+    def __init__(self, nombre, atributos):
+        self.nombre = nombre
+        self.atributos = atributos
+        self.inicio = time.time()
+        self._inicio_monotonico = time.perf_counter()
+        self.duracion = None
+        self.error = None
+        self.tokens_prompt = 0
+        self.tokens_respuesta = 0
+        self.tokens_cacheados = 0
+        self.tokens_estimados = None
+
+    def anotar_uso(self, respuesta):
+        """Suma los tokens de usage_metadata (respuesta completa o cada fragmento de un stream)."""
+        uso = getattr(respuesta, "usage_metadata", None)
+        if isinstance(uso, dict):
+            self.tokens_prompt += uso.get("input_tokens", 0) or 0
+            self.tokens_respuesta += uso.get("output_tokens", 0) or 0
+            # Parte del prompt que Gemini sirvió desde su caché implícita de prefijos.
+            self.tokens_cacheados += (uso.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+    def anotar_prompt(self, tokens):
+        """Tokens estimados del prompt (ver prompts_consultor.Prompt.tokens): antes y después del
+        presupuesto, y cuántos son de la instrucción fija. Quedan también en los atributos para los hooks."""
+        self.tokens_estimados = tokens
+        self.atributos["tokens_antes"] = tokens["antes"]
+        self.atributos["tokens_despues"] = tokens["despues"]
+        self.atributos["tokens_sistema"] = tokens["sistema"]
+
+
+def _emitir(span):
+    with _lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(span)
+        except Exception as e:
+            print(f"Error en hook de métricas: {e}")
+
+
+@contextmanager
+def medir_llamada(funcion, modelo, **atributos):
+    """Mide una llamada al LLM. Las excepciones se registran y se vuelven a lanzar."""
+    span = Span(funcion, {"modelo": modelo, **atributos})
+    try:
+        yield span
+    except Exception as e:
+        span.error = e
+        raise
+    except GeneratorExit:
+        # Un stream que su consumidor dejó a medias cuenta como cancelado, no como correcto.
+        span.error = LlamadaCancelada("stream abandonado")
+        raise
+    finally:
+        span.duracion = time.perf_counter() - span._inicio_monotonico
+        resultado = clasificar_error(span.error)
+        span.atributos["resultado"] = resultado
+        with _lock:
+            _latencias_llm[(funcion, modelo)].observar(span.duracion)
+            _llamadas[(funcion, modelo, resultado)] += 1
+            _tokens[(funcion, modelo, "prompt")] += span.tokens_prompt
+            _tokens[(funcion, modelo, "respuesta")] += span.tokens_respuesta
+            _tokens[(funcion, modelo, "cacheados")] += span.tokens_cacheados
+            if span.tokens_estimados is not None:
+                for parte in ("antes", "despues", "sistema", "recortados"):
+                    _tokens_estimados[(funcion, modelo, parte)] += span.tokens_estimados[parte]
+        _emitir(span)
+
+
+@contextmanager
+def medir_rerun():
+    """Mide un rerun completo de app.py, incluidos los que terminan con st.rerun()."""
+    span = Span("rerun", {})
+    try:
+        yield span
+    finally:
+        span.duracion = time.perf_counter() - span._inicio_monotonico
+        with _lock:
+            _duracion_reruns.observar(span.duracion)
+        _emitir(span)
+
+
+def resumen():
+    """Vista compacta para el panel de administración."""
+    with _lock:
+        llamadas = {}
+        for (funcion, modelo), histograma in _latencias_llm.items():
+            llamadas[(funcion, modelo)] = {
+                "llamadas": histograma.total,
+                "p50_s": histograma.percentil(50),
+                "p95_s": histograma.percentil(95),
+                "errores": _llamadas[(funcion, modelo, "error")],
+                "errores_cuota": _llamadas[(funcion, modelo, "cuota")],
+                "canceladas": _llamadas[(funcion, modelo, "cancelada")],
+                "plazos_vencidos": _llamadas[(funcion, modelo, "plazo")],
+                "tokens_prompt": _tokens[(funcion, modelo, "prompt")],
+                "tokens_respuesta": _tokens[(funcion, modelo, "respuesta")],
+                "tokens_prompt_antes": _tokens_estimados[(funcion, modelo, "antes")],
+                "tokens_prompt_despues": _tokens_estimados[(funcion, modelo, "despues")],
+            }
+        return {
+            "llamadas": llamadas,
+            "reruns": {
+                "total": _duracion_reruns.total,
+                "p50_s": _duracion_reruns.percentil(50),
+                "p95_s": _duracion_reruns.percentil(95),
+            },
+        }
+
+
+def _etiquetas(**etiquetas):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in etiquetas.items()) + "}" if etiquetas else ""
+
+
+def _lineas_histograma(nombre, histograma, **etiquetas):
+    lineas = []
+    for limite, conteo in zip(histograma.buckets, histograma.conteos):
+        lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {conteo}")
+    lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le='+Inf')} {histograma.total}")
+    lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {histograma.suma}")
+    lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {histograma.total}")
+    return lineas
+
+
+def _familia(nombre, tipo, ayuda):
+    return [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+
+
+def _lineas_estadisticas(prefijo, componente, estadisticas):
+    """Un gauge por clave de estadisticas(), cada uno con sus líneas HELP y TYPE."""
+    lineas = []
+    for clave, valor in estadisticas.items():
+        nombre = f"{prefijo}_{clave}"
+        lineas += _familia(nombre, "gauge", f"{componente}: {clave.replace('_', ' ')}.")
+        lineas.append(f"{nombre} {valor}")
+    return lineas
+
+
+def exportar_prometheus():
+    """Todas las métricas en formato de exposición de texto de Prometheus."""
+    lineas = [
+        "# HELP consultor_llm_latencia_segundos Latencia de las llamadas al LLM.",
+        "# TYPE consultor_llm_latencia_segundos histogram",
+    ]
+    with _lock:
+        for (funcion, modelo), histograma in sorted(_latencias_llm.items()):
+            lineas += _lineas_histograma("consultor_llm_latencia_segundos", histograma, funcion=funcion, modelo=modelo)
+        lineas += ["# HELP consultor_llm_llamadas_total Llamadas al LLM por resultado (ok, error, cuota, cancelada, plazo).",
+                   "# TYPE consultor_llm_llamadas_total counter"]
+        for (funcion, modelo, resultado), valor in sorted(_llamadas.items()):
+            lineas.append(f"consultor_llm_llamadas_total{_etiquetas(funcion=funcion, modelo=modelo, resultado=resultado)} {valor}")
+        lineas += ["# HELP consultor_llm_tokens_total Tokens informados por el proveedor.",
+                   "# TYPE consultor_llm_tokens_total counter"]
+        for (funcion, modelo, tipo), valor in sorted(_tokens.items()):
+            lineas.append(f"consultor_llm_tokens_total{_etiquetas(funcion=funcion, modelo=modelo, tipo=tipo)} {valor}")
+        lineas += ["# HELP consultor_llm_prompt_tokens_estimados_total Tokens estimados de los prompts: antes y después del "
+                   "presupuesto, de la instrucción de sistema fija y recortados.",
+                   "# TYPE consultor_llm_prompt_tokens_estimados_total counter"]
+        for (funcion, modelo, parte), valor in sorted(_tokens_estimados.items()):
+            lineas.append(f"consultor_llm_prompt_tokens_estimados_total{_etiquetas(funcion=funcion, modelo=modelo, parte=parte)} {valor}")
+        lineas += ["# HELP consultor_rerun_segundos Duración de cada rerun de app.py.",
+                   "# TYPE consultor_rerun_segundos histogram"]
+        lineas += _lineas_histograma("consultor_rerun_segundos", _duracion_reruns)
+
+    # Estado de los demás componentes del proceso. Se leen las instancias ya creadas, sin obtener_*(): un
+    # scrape no debe abrir bases de datos ni arrancar el hilo de la pasarela o del almacén de sesiones.
+    import cache_ia
+    import cache_semantica
+    import gobernador_llm
+    import pasarela_llm
+    import registro_modelos
+    import sesiones_persistentes
+    from plazos_llm import estadisticas_plazos
+    from triaje_respuestas import estadisticas_triaje
+
+    if cache_ia._cache_global is not None:
+        lineas += _lineas_estadisticas("consultor_cache", "Caché de respuestas", cache_ia._cache_global.estadisticas())
+    if cache_semantica._semantica_global is not None:
+        lineas += _lineas_estadisticas("consultor_semantica", "Caché semántica",
+                                       cache_semantica._semantica_global.estadisticas())
+    if gobernador_llm._gobernador_global is not None:
+        estadisticas = gobernador_llm._gobernador_global.estadisticas()
+        circuito = estadisticas.pop("circuito")
+        lineas += _familia("consultor_gobernador_circuito", "gauge", "Estado del circuito del gobernador (1 el vigente).")
+        for estado in ("cerrado", "abierto", "semiabierto"):
+            lineas.append(f"consultor_gobernador_circuito{_etiquetas(estado=estado)} {int(circuito == estado)}")
+        lineas += _lineas_estadisticas("consultor_gobernador", "Gobernador", estadisticas)
+    triaje = estadisticas_triaje.resumen()
+    lineas += _familia("consultor_triaje_respuestas_total", "counter", "Respuestas clasificadas por rama del triaje.")
+    for rama, valor in triaje["por_rama"].items():
+        lineas.append(f"consultor_triaje_respuestas_total{_etiquetas(rama=rama)} {valor}")
+    lineas += _familia("consultor_triaje_llamadas_evitadas_total", "counter", "Llamadas al LLM evitadas por el triaje.")
+    lineas.append(f"consultor_triaje_llamadas_evitadas_total {triaje['llamadas_evitadas']}")
+    lineas += _familia("consultor_triaje_tokens_ahorrados_total", "counter", "Tokens estimados ahorrados por el triaje.")
+    lineas.append(f"consultor_triaje_tokens_ahorrados_total {triaje['tokens_ahorrados']}")
+    if registro_modelos._registro_global is not None:
+        registro = registro_modelos._registro_global.estadisticas()
+        lineas += _familia("consultor_modelo_ruta", "gauge", "Modelo elegido para cada nivel (siempre 1).")
+        for nivel, modelo in registro["rutas"].items():
+            lineas.append(f"consultor_modelo_ruta{_etiquetas(nivel=nivel, modelo=modelo)} 1")
+        lineas += _familia("consultor_modelo_latencia_ewma_segundos", "gauge", "Latencia media móvil de cada modelo.")
+        lineas += [f"consultor_modelo_latencia_ewma_segundos{_etiquetas(modelo=modelo)} {estado['latencia_ewma_s']}"
+                   for modelo, estado in registro["modelos"].items()]
+        lineas += _familia("consultor_modelo_degradado", "gauge", "1 si el modelo está degradado en algún nivel.")
+        lineas += [f"consultor_modelo_degradado{_etiquetas(modelo=modelo)} {int(bool(estado['degradado_en']))}"
+                   for modelo, estado in registro["modelos"].items()]
+    plazos = estadisticas_plazos.resumen()
+    lineas += _familia("consultor_plazos_canceladas_total", "counter", "Llamadas canceladas por tipo.")
+    for tipo, valor in sorted(plazos["canceladas"].items()):
+        lineas.append(f"consultor_plazos_canceladas_total{_etiquetas(tipo=tipo)} {valor}")
+    lineas += _familia("consultor_plazos_vencidas_total", "counter", "Llamadas con el plazo vencido por tipo.")
+    for tipo, valor in sorted(plazos["vencidas"].items()):
+        lineas.append(f"consultor_plazos_vencidas_total{_etiquetas(tipo=tipo)} {valor}")
+    if pasarela_llm._pasarela_global is not None:
+        lineas += _lineas_estadisticas("consultor_pasarela", "Pasarela", pasarela_llm._pasarela_global.estadisticas())
+    # _almacen_global vale False si no se pudo abrir.
+    if sesiones_persistentes._almacen_global:
+        lineas += _lineas_estadisticas("consultor_sesiones", "Almacén de sesiones",
+                                       sesiones_persistentes._almacen_global.estadisticas())
+    return "\n".join(lineas) + "\n"
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        cuerpo = exportar_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+_servidor = None
+
+
+def iniciar_servidor_metricas(puerto=None):
+    """Sirve /metrics en un hilo en segundo plano; una sola vez por proceso."""
+    global _servidor
+    puerto = puerto if puerto is not None else os.getenv("CONSULTOR_METRICAS_PUERTO")
+    if not puerto:
+        return None
+    with _lock:
+        if _servidor is None:
+            try:
+                _servidor = ThreadingHTTPServer(("0.0.0.0", int(puerto)), _ManejadorMetricas)
+            except OSError as e:
+                # Otro proceso de Streamlit ya usa el puerto.
+                print(f"No se pudo iniciar el servidor de métricas en el puerto {puerto}: {e}")
+                _servidor = False
+                return None
+            threading.Thread(target=_servidor.serve_forever, name="metricas-http", daemon=True).start()
+        return _servidor or None
@@ -0,0 +1,233 @@
+"""Pasarela asíncrona única por proceso para todas las llamadas al LLM.
+
+Las llamadas de consultor_ia (invoke y stream) se envían a un bucle de eventos de asyncio que vive en un
+hilo propio y se hacen con llm.ainvoke / llm.astream, así que una llamada en curso no ocupa un hilo del
+sistema: el hilo que la pidió solo espera el resultado. Sobre ese bucle:
+
+- Como mucho CONSULTOR_PASARELA_MAX llamadas salen a la vez hacia la API; las demás esperan su turno en el
+  bucle (el gobernador sigue aplicando RPM/TPM, concurrencia y circuito a cada llamada que sale).
+- Coalescencia (singleflight): si llega una llamada idéntica (mismo tipo, modelo y prompt) mientras otra
+  está en vuelo, no se hace una segunda petición; ambas reciben la misma respuesta o el mismo error. En
+  streaming, quien se une tarde recibe primero los fragmentos ya emitidos y después los siguientes.
+- Cancelación: cada llamada puede traer un plazos_llm.Plazo. Si vence o se cancela, quien esperaba deja de
+  hacerlo (PlazoVencido o LlamadaCancelada); si era el último que esperaba esa petición (invoke o stream),
+  la petición se cancela y libera su hueco y su turno en el gobernador.
+
+Configuración por variables de entorno:
+    CONSULTOR_PASARELA       "0" para llamar al LLM directamente desde cada hilo, sin pasarela
+    CONSULTOR_PASARELA_MAX   llamadas simultáneas máximas hacia la API (por defecto 32)
+"""
+import asyncio
+import os
+import queue
+import threading
+
+from gobernador_llm import obtener_gobernador
+from plazos_llm import CANCELACION_POR_PLAZO, esperar_cola, esperar_futuro
+
+PASARELA_ACTIVA = os.getenv("CONSULTOR_PASARELA", "1") != "0"
+MAX_EN_VUELO = int(os.getenv("CONSULTOR_PASARELA_MAX", "32"))
+
+_FIN = object()
+
+
+class _Invocacion:
+    """Un invoke en vuelo y cuántas llamadas esperan su respuesta."""
+
+    def __init__(self, tarea):
+        self.tarea = tarea
+        self.esperando = 0
+        self.cancelada = False
+
+
+class _Difusion:
+    """Un stream en vuelo y los suscriptores (colas de hilos) que reciben sus fragmentos."""
+
+    def __init__(self):
+        self.trozos = []
+        self.suscriptores = []
+        self.tarea = None
+        self.cancelada = False
+
+
+class Suscripcion:
+    """Iterador síncrono sobre un stream de la pasarela. `compartida` es True si se unió a un stream que
+    ya había pedido otra llamada (su uso de tokens no es una petición nueva)."""
+
+    def __init__(self, pasarela, difusion, cola, compartida, plazo=None):
+        self._pasarela = pasarela
+        self._difusion = difusion
+        self._cola = cola
+        self._plazo = plazo
+        self.compartida = compartida
+
+    def __iter__(self):
+        terminado = False
+        try:
+            while True:
+                tipo, valor = esperar_cola(self._cola, self._plazo)
+                if tipo == "trozo":
+                    yield valor
+                elif tipo == "error":
+                    terminado = True
+                    raise valor
+                else:
+                    terminado = True
+                    return
+        finally:
+            if not terminado:
+                self._pasarela._abandonar(self._difusion, self._cola, _motivo_cancelacion(self._plazo))
+
+
+class PasarelaLLM:
+    def __init__(self, max_en_vuelo=MAX_EN_VUELO, gobernador=None):
+        self.max_en_vuelo = max(1, max_en_vuelo)
+        self._gobernador = gobernador
+        self._bucle = asyncio.new_event_loop()
+        self._semaforo = asyncio.Semaphore(self.max_en_vuelo)
+        # Solo se tocan desde el hilo del bucle, así que no necesitan lock.
+        self._vuelos = {}
+        self._en_vuelo = 0
+        self.contadores = {"peticiones": 0, "llamadas": 0, "coalescidas": 0, "canceladas": 0, "max_en_vuelo": 0}
+        self._hilo = threading.Thread(target=self._bucle.run_forever, name="pasarela-llm", daemon=True)
+        self._hilo.start()
+
+    @property
+    def gobernador(self):
+        return self._gobernador or obtener_gobernador()
+
+    # --- API síncrona (la usan los hilos de Streamlit, del pool de feedback y de cli_cohortes) ---
+    def invocar(self, clave, llm, messages, tokens_estimados, opciones=None, plazo=None):
+        """llm.ainvoke(messages, **opciones) a través de la pasarela. Devuelve (respuesta, compartida)."""
+        return esperar_futuro(asyncio.run_coroutine_threadsafe(
+            self._invocar(clave, llm, messages, tokens_estimados, opciones or {}, plazo), self._bucle
+        ), plazo)
+
+    def transmitir(self, clave, llm, messages, tokens_estimados, opciones=None, plazo=None):
+        """llm.astream(messages, **opciones) a través de la pasarela, como Suscripcion iterable desde cualquier hilo."""
+        cola = queue.Queue()
+        difusion, compartida = asyncio.run_coroutine_threadsafe(
+            self._suscribir(clave, llm, messages, tokens_estimados, opciones or {}, cola), self._bucle
+        ).result()
+        return Suscripcion(self, difusion, cola, compartida, plazo)
+
+    def estadisticas(self):
+        return {**self.contadores, "en_vuelo": self._en_vuelo, "limite": self.max_en_vuelo}
+
+    # --- Dentro del bucle ---
+    async def _invocar(self, clave, llm, messages, tokens_estimados, opciones, plazo=None):
+        self.contadores["peticiones"] += 1
+        vuelo = self._vuelos.get(clave)
+        compartida = vuelo is not None and not vuelo.cancelada
+        if compartida:
+            self.contadores["coalescidas"] += 1
+        else:
+            vuelo = _Invocacion(self._bucle.create_task(self._llamar(llm, messages, tokens_estimados, opciones)))
+            self._vuelos[clave] = vuelo
+            vuelo.tarea.add_done_callback(lambda _: self._olvidar(clave, vuelo))
+        vuelo.esperando += 1
+        try:
+            # shield: si se cancela una espera, la petición sigue para los demás que la comparten.
+            return await asyncio.shield(vuelo.tarea), compartida
+        except asyncio.CancelledError:
+            # Era la última espera: nadie verá la respuesta, así que se cancela la petición.
+            if vuelo.esperando == 1 and not vuelo.tarea.done():
+                vuelo.cancelada = True
+                vuelo.tarea.cancel(_motivo_cancelacion(plazo))
+                self.contadores["canceladas"] += 1
+            raise
+        finally:
+            vuelo.esperando -= 1
+
+    async def _llamar(self, llm, messages, tokens_estimados, opciones):
+        async with self._semaforo:
+            self._entrar()
+            try:
+                return await self.gobernador.ejecutar_async(lambda: llm.ainvoke(messages, **opciones), tokens_estimados)
+            finally:
+                self._en_vuelo -= 1
+
+    async def _suscribir(self, clave, llm, messages, tokens_estimados, opciones, cola):
+        self.contadores["peticiones"] += 1
+        difusion = self._vuelos.get(clave)
+        compartida = difusion is not None and not difusion.cancelada
+        if compartida:
+            self.contadores["coalescidas"] += 1
+            for trozo in difusion.trozos:
+                cola.put(("trozo", trozo))
+        else:
+            difusion = _Difusion()
+            difusion.tarea = self._bucle.create_task(self._difundir(clave, difusion, llm, messages, tokens_estimados, opciones))
+            self._vuelos[clave] = difusion
+        difusion.suscriptores.append(cola)
+        return difusion, compartida
+
+    async def _difundir(self, clave, difusion, llm, messages, tokens_estimados, opciones):
+        try:
+            async with self._semaforo:
+                self._entrar()
+                try:
+                    async for chunk in self.gobernador.transmitir_async(lambda: llm.astream(messages, **opciones), tokens_estimados):
+                        difusion.trozos.append(chunk)
+                        for cola in difusion.suscriptores:
+                            cola.put(("trozo", chunk))
+                finally:
+                    self._en_vuelo -= 1
+            final = ("fin", _FIN)
+        except asyncio.CancelledError:
+            self.contadores["canceladas"] += 1
+            final = ("error", RuntimeError("El stream se canceló porque nadie lo estaba leyendo."))
+        except Exception as e:
+            final = ("error", e)
+        finally:
+            self._olvidar(clave, difusion)
+        for cola in difusion.suscriptores:
+            cola.put(final)
+
+    def _entrar(self):
+        self._en_vuelo += 1
+        self.contadores["llamadas"] += 1
+        self.contadores["max_en_vuelo"] = max(self.contadores["max_en_vuelo"], self._en_vuelo)
+
+    def _olvidar(self, clave, vuelo):
+        # Una llamada idéntica posterior a que esta termine ya es una petición nueva.
+        if self._vuelos.get(clave) is vuelo:
+            del self._vuelos[clave]
+
+    def _abandonar(self, difusion, cola, motivo=None):
+        """Un lector dejó el stream a medias (p. ej. la sesión se cerró); sin lectores, se cancela."""
+        def quitar():
+            if cola in difusion.suscriptores:
+                difusion.suscriptores.remove(cola)
+            if not difusion.suscriptores and difusion.tarea is not None and not difusion.tarea.done():
+                difusion.cancelada = True
+                difusion.tarea.cancel(motivo)
+        self._bucle.call_soon_threadsafe(quitar)
+
+
+def _motivo_cancelacion(plazo):
+    # El último que deja una petición decide por qué se cancela: por su plazo o porque ya no la necesita.
+    return CANCELACION_POR_PLAZO if plazo is not None and plazo.vencido else None
+
+
+_pasarela_global = None
+_pasarela_lock = threading.Lock()
+
+
+def configurar_pasarela(**opciones):
+    """Sustituye la pasarela del proceso (p. ej. con otro límite en un benchmark). La anterior se detiene."""
+    global _pasarela_global
+    with _pasarela_lock:
+        if _pasarela_global is not None:
+            _pasarela_global._bucle.call_soon_threadsafe(_pasarela_global._bucle.stop)
+        _pasarela_global = PasarelaLLM(**opciones)
+        return _pasarela_global
+
+
+def obtener_pasarela():
+    """Instancia única por proceso; el hilo del bucle se arranca con la primera llamada."""
+    global _pasarela_global
+    with _pasarela_lock:
+        if _pasarela_global is None:
+            _pasarela_global = PasarelaLLM()
+        return _pasarela_global
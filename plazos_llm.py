@@ -0,0 +1,227 @@
+"""Plazos y cancelación cooperativa de las llamadas al LLM.
+
+Cada función pública de consultor_ia (feedback, digestos, resumen y pitch) trabaja con un Plazo: una hora
+límite según el tipo de llamada y una condición de cancelación. El plazo se propaga hacia abajo: el resumen
+se lo pasa a sus digestos y a sus dos secciones, y cada una vence con su propio límite o con el del resumen,
+lo que llegue antes. Se comprueba en todos los puntos donde una llamada espera:
+
+- en la pasarela, mientras se espera la respuesta o el siguiente fragmento; al vencer o cancelarse, la
+  petición se cancela también hacia Gemini si nadie más la está esperando;
+- en el gobernador, mientras se espera turno, entre reintentos y entre fragmentos.
+
+Sin pasarela (CONSULTOR_PASARELA=0) una petición síncrona ya enviada no se puede interrumpir: el plazo solo
+corta la espera de turno, los reintentos y los streams entre fragmentos.
+
+En la app, la condición de cancelación es el script de Streamlit: un rerun que lo interrumpe (otro botón,
+navegar), su parada o la desconexión de la sesión. Los reruns de fragmentos no lo interrumpen. Las tareas
+en segundo plano se cancelan al cerrarse la sesión o al sustituirlas una petición nueva (ver tareas_ia).
+
+Configuración por variables de entorno (segundos; 0 = sin plazo):
+    CONSULTOR_PLAZO_FEEDBACK   feedback de una respuesta (por defecto 60)
+    CONSULTOR_PLAZO_DIGESTO    digesto de una respuesta (por defecto 45)
+    CONSULTOR_PLAZO_RESUMEN    resumen y pitch, digestos incluidos (por defecto 180)
+"""
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+
+PLAZOS = {
+    "feedback": float(os.getenv("CONSULTOR_PLAZO_FEEDBACK", "60")),
+    "digesto": float(os.getenv("CONSULTOR_PLAZO_DIGESTO", "45")),
+    "resumen": float(os.getenv("CONSULTOR_PLAZO_RESUMEN", "180")),
+}
+
+# Cada cuánto se vuelve a mirar la condición de cancelación mientras se espera.
+INTERVALO_COMPROBACION = 0.25
+# Mensaje con el que la pasarela cancela una tarea asyncio cuyo último interesado agotó su plazo: así el
+# gobernador lo cuenta como fallo del servicio y no como una llamada abandonada.
+CANCELACION_POR_PLAZO = "plazo_vencido"
+
+
+class PlazoVencido(Exception):
+    """La llamada superó su plazo."""
+
+
+class LlamadaCancelada(Exception):
+    """Quien esperaba la llamada ya no la necesita (rerun, sesión cerrada, petición sustituida)."""
+
+
+class Plazo:
+    """Hora límite (monotónica) más una condición de cancelación, compartible entre hilos.
+
+    `cancelada` es una función sin argumentos que devuelve True cuando la llamada ya no hace falta. Un plazo
+    hijo (ver hijo()) vence como muy tarde con su padre y se cancela con él.
+    """
+
+    def __init__(self, segundos=0, tipo="", cancelada=None, padre=None):
+        self.tipo = tipo
+        self.segundos = segundos
+        self.vence = time.monotonic() + segundos if segundos else None
+        if padre is not None and padre.vence is not None and (self.vence is None or padre.vence < self.vence):
+            self.vence = padre.vence
+        self._cancelada = cancelada
+        self._padre = padre
+        self._evento = threading.Event()
+        self._registrado = False
+        self.motivo = None
+        self.vencido = False
+
+    def hijo(self, tipo):
+        return Plazo(PLAZOS.get(tipo, 0), tipo, padre=self)
+
+    def cancelar(self, motivo="cancelada"):
+        if not self._evento.is_set():
+            self.motivo = motivo
+            self._evento.set()
+
+    def cancelado(self):
+        if self._evento.is_set():
+            return True
+        if self._padre is not None and self._padre.cancelado():
+            self.cancelar(self._padre.motivo)
+            return True
+        if self._cancelada is not None and self._cancelada():
+            self.cancelar("sesion")
+            return True
+        return False
+
+    def restante(self):
+        """Segundos hasta la hora límite, o None si no tiene."""
+        return None if self.vence is None else max(0.0, self.vence - time.monotonic())
+
+    def intervalo(self):
+        # Cuánto esperar antes de volver a comprobar: nunca más allá de la hora límite.
+        restante = self.restante()
+        return INTERVALO_COMPROBACION if restante is None else min(INTERVALO_COMPROBACION, restante)
+
+    def comprobar(self):
+        """Lanza LlamadaCancelada o PlazoVencido si la llamada ya no debe seguir."""
+        if self.cancelado():
+            self._registrar("canceladas")
+            raise LlamadaCancelada(f"La llamada a la IA se canceló ({self.motivo}).")
+        if self.vence is not None and time.monotonic() >= self.vence:
+            self.vencido = True
+            self._registrar("vencidas")
+            raise PlazoVencido(f"La llamada a la IA ({self.tipo or 'sin tipo'}) superó su plazo.")
+
+    def _registrar(self, contador):
+        # Un plazo compartido por varias esperas (p. ej. las dos secciones del pitch) cuenta una sola vez.
+        if not self._registrado:
+            self._registrado = True
+            estadisticas_plazos.registrar(self.tipo, contador)
+
+
+def plazo_de(tipo, padre=None):
+    """Plazo para una llamada de `tipo`. Con `padre` es un hijo suyo; sin él, si se crea en el hilo de un
+    script de Streamlit, se cancela cuando ese script se interrumpe."""
+    if padre is not None:
+        return padre.hijo(tipo)
+    return Plazo(PLAZOS.get(tipo, 0), tipo, cancelada=cancelacion_del_script())
+
+
+def esperar_futuro(futuro, plazo):
+    """futuro.result() comprobando el plazo; si vence o se cancela, cancela el futuro y lanza la excepción."""
+    if plazo is None:
+        return futuro.result()
+    while True:
+        hechos, _ = concurrent.futures.wait([futuro], timeout=plazo.intervalo())
+        if hechos:
+            return futuro.result()
+        try:
+            plazo.comprobar()
+        except (PlazoVencido, LlamadaCancelada):
+            futuro.cancel()
+            raise
+
+
+def esperar_cola(cola, plazo):
+    """cola.get() comprobando el plazo, también entre elementos: un stream que no para nunca deja la cola vacía."""
+    if plazo is None:
+        return cola.get()
+    while True:
+        plazo.comprobar()
+        try:
+            return cola.get(timeout=plazo.intervalo())
+        except queue.Empty:
+            pass
+
+
+# --- Condiciones de cancelación de Streamlit ---
+def cancelacion_del_script():
+    """Condición que se cumple cuando el script de Streamlit del hilo actual se va a interrumpir (rerun que
+    no es de un fragmento, parada o desconexión). None fuera de un script de Streamlit."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequestType
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    peticiones = getattr(ctx, "script_requests", None)
+    if peticiones is None:
+        return None
+    # Streamlit no ofrece una API pública para esto: se leen los campos privados de ScriptRequests
+    # (comprobado con la versión fijada en requirements.txt). Si cambian, se avisa en vez de no cancelar nunca.
+    if not all(hasattr(peticiones, campo) for campo in ("_lock", "_state", "_rerun_data")):
+        _avisar_streamlit_incompatible()
+        return None
+
+    def interrumpido():
+        # Se mira el estado sin consumir la petición: el propio Streamlit la atenderá al volver el script.
+        with peticiones._lock:
+            estado = peticiones._state
+            datos = peticiones._rerun_data
+        if estado == ScriptRequestType.STOP:
+            return True
+        if estado == ScriptRequestType.RERUN:
+            # Igual que Streamlit: un rerun de otro fragmento (p. ej. run_every) no interrumpe el script.
+            return not (datos.fragment_id_queue and not datos.is_fragment_scoped_rerun)
+        return False
+
+    return interrumpido
+
+
+_aviso_streamlit_dado = False
+
+
+def _avisar_streamlit_incompatible():
+    global _aviso_streamlit_dado
+    if not _aviso_streamlit_dado:
+        _aviso_streamlit_dado = True
+        print("Esta versión de Streamlit no expone el estado de ScriptRequests: las llamadas a la IA no se "
+              "cancelarán al interrumpirse el script (solo vencerán por plazo).")
+
+
+def cancelacion_de_sesion():
+    """Condición que se cumple cuando la sesión de Streamlit del hilo actual se cierra o se desconecta.
+    Sirve para el trabajo que sigue fuera del script (hilos de fondo). None fuera de Streamlit."""
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    id_sesion = ctx.session_id
+    return lambda: Runtime.exists() and not Runtime.instance().is_active_session(id_sesion)
+
+
+class EstadisticasPlazos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.canceladas = {}
+        self.vencidas = {}
+
+    def registrar(self, tipo, contador):
+        with self._lock:
+            por_tipo = getattr(self, contador)
+            por_tipo[tipo] = por_tipo.get(tipo, 0) + 1
+
+    def resumen(self):
+        with self._lock:
+            return {"canceladas": dict(self.canceladas), "vencidas": dict(self.vencidas)}
+
+
+estadisticas_plazos = EstadisticasPlazos()
@@ -0,0 +1,244 @@
+"""Prompts del consultor: una instrucción de sistema fija y una parte de usuario pequeña.
+
+Las instrucciones (persona, ramas A/B/C, tareas del resumen y del pitch, formato) no dependen de la
+sesión: se construyen una vez al importar el módulo y viajan como system_instruction de Gemini. Solo la
+parte de usuario (nombres, pregunta, detalle y respuesta) cambia en cada llamada, y cada dato aparece una
+sola vez. La única excepción es la felicitación de la rama C, que lleva el nombre del emprendedor; está casi
+al final de la instrucción, así que todo lo anterior sigue siendo idéntico byte a byte entre llamadas.
+
+No se usa context caching de Gemini: la instrucción más larga ronda los 800 tokens y ningún modelo admite
+cachear contenidos tan pequeños (el mínimo es de 1024 tokens o más según el modelo).
+
+Antes de enviarse, las respuestas demasiado largas se recortan al presupuesto de tokens: se conserva el
+principio y el final y se indica cuántas palabras se omitieron. En el resumen incremental el digesto de
+cada respuesta ya es un resumen; el recorte se aplica a lo que entra en el digesto (con más margen) y a las
+respuestas que se envían completas.
+
+Configuración por variables de entorno:
+    CONSULTOR_PRESUPUESTO_RESPUESTA_TOKENS  tokens máximos de una respuesta en un prompt (por defecto 800, 0 = sin límite)
+"""
+import os
+
+from gobernador_llm import CARACTERES_POR_TOKEN, contar_tokens
+
+PRESUPUESTO_RESPUESTA = int(os.getenv("CONSULTOR_PRESUPUESTO_RESPUESTA_TOKENS", "800"))
+# Lo que entra en un digesto se puede alargar más: el propio digesto lo resume a ~60 palabras.
+PRESUPUESTO_DIGESTO = PRESUPUESTO_RESPUESTA * 4
+
+
+class Prompt:
+    """Instrucción de sistema fija más la parte de usuario de una llamada."""
+
+    def __init__(self, sistema, usuario, tokens_recortados=0):
+        self.sistema = sistema
+        self.usuario = usuario
+        self.tokens_recortados = tokens_recortados
+
+    @property
+    def texto(self):
+        # Prompt completo en un solo texto, para estimar tokens y firmar claves.
+        return f"{self.sistema}\n\n{self.usuario}"
+
+    def tokens(self):
+        """Tokens estimados de la llamada: "antes" es lo que se habría enviado sin el presupuesto."""
+        sistema = contar_tokens(self.sistema)
+        usuario = contar_tokens(self.usuario)
+        return {
+            "sistema": sistema,
+            "usuario": usuario,
+            "recortados": self.tokens_recortados,
+            "antes": sistema + usuario + self.tokens_recortados,
+            "despues": sistema + usuario,
+        }
+
+
+# --- Presupuesto de tokens ---
+def recortar_respuesta(respuesta, presupuesto=PRESUPUESTO_RESPUESTA):
+    """(texto, tokens_recortados). Si la respuesta supera el presupuesto se conservan sus primeros tres
+    cuartos y el último cuarto del presupuesto, cortando entre palabras."""
+    if presupuesto <= 0 or contar_tokens(respuesta) <= presupuesto:
+        return respuesta, 0
+    limite = presupuesto * CARACTERES_POR_TOKEN
+    corte = respuesta.rfind(" ", 0, limite * 3 // 4)
+    corte = corte if corte > 0 else limite * 3 // 4
+    inicio_final = respuesta.find(" ", len(respuesta) - limite // 4)
+    inicio_final = inicio_final if inicio_final > corte else len(respuesta) - limite // 4
+    omitidas = len(respuesta[corte:inicio_final].split())
+    texto = (
+        f"{respuesta[:corte].rstrip()} [… se omiten {omitidas} palabras de una respuesta muy larga …] "
+        f"{respuesta[inicio_final:].lstrip()}"
+    )
+    return texto, contar_tokens(respuesta) - contar_tokens(texto)
+
+
+# --- Feedback por pregunta ---
+_PERSONA_CONSULTOR = """Eres un consultor de emprendimientos muy amigable, paciente y extremadamente claro, como si estuvieras explicando conceptos de negocios a un amigo adolescente que está empezando. Tu objetivo principal es ayudarle a pensar con claridad y profundidad sobre cada aspecto de su idea.
+El principio de "Empezar con el Porqué" de Simon Sinek (entender la razón fundamental, la causa o creencia detrás del negocio) es importante y debe estar de fondo, pero **tu prioridad es abordar la pregunta específica que se le hizo al emprendedor.**
+
+En cada mensaje recibirás el nombre del emprendedor, el de su proyecto, la pregunta que está respondiendo, el detalle de esa pregunta y su respuesta.
+"""
+
+_INSTRUCCIONES_RAMA = {
+    "A": """A. **SI LA RESPUESTA DEL USUARIO ES NULA O MUY CORTA (ej. "no sé", "vender cosas", menos de 2-3 palabras con sentido):**
+    1.  **Explica la Pregunta de Forma Sencilla:** Reformula la pregunta en palabras muy simples. Explica qué tipo de información se busca con ella, usando su detalle como guía.
+    2.  **DA 2-3 EJEMPLOS CONCRETOS Y SENCILLOS** relevantes para la pregunta. Estos ejemplos deben ilustrar respuestas claras y bien pensadas a ESA PREGUNTA.
+    3.  **Pregunta Guía:** Termina con una pregunta amable que invite al usuario a pensar en su propia situación basándose en la explicación y los ejemplos.
+
+""",
+    "B": """B. **SI LA RESPUESTA DEL USUARIO ES SUPERFICIAL O GENERAL (ej. tiene algunas palabras pero no profundiza, no es específica):**
+    1.  **Reconocimiento Positivo:** Empieza con algo como: "¡Entendido! Mencionas que [resume brevemente su respuesta]. Es un buen punto de partida."
+    2.  **Explicación de por qué se necesita más detalle PARA ESA PREGUNTA:** "Para que esta parte de tu plan sea realmente fuerte, ayuda mucho si somos un poco más específicos."
+    3.  **DA UN EJEMPLO CONCRETO de una respuesta más detallada o específica PARA LA PREGUNTA**, usando su detalle.
+    4.  **Pregunta Guía Específica:** Haz una pregunta que le ayude a añadir ese nivel de detalle o especificidad a SU respuesta actual.
+    5.  **(Opcional, si aplica y la pregunta lo permite) Conexión Sutil al "Porqué":** "A veces, pensar en tu 'Porqué' principal te puede ayudar a encontrar esos detalles." (Usa esto con moderación).
+
+""",
+    "C": """C. **SI LA RESPUESTA DEL USUARIO ES BUENA, DETALLADA O BIEN ENCAMINADA:**
+    1.  **Felicitación Específica:** "¡Muy bien, {nombre_emprendedor}! Me gusta mucho cómo has explicado [menciona algo específico y positivo de su respuesta]."
+    2.  **1 o 2 Preguntas de Profundización RELEVANTES A LA PREGUNTA ACTUAL:**
+        *   Estas preguntas deben buscar más claridad, implicaciones o los siguientes pasos relacionados con lo que acaba de responder.
+        *   **Solo si es natural y relevante para la pregunta actual**, una de estas preguntas podría explorar cómo su respuesta se alinea con su "Porqué" general.
+
+""",
+}
+
+_ESTILO_CONSULTOR = """**Estilo General Constante:** Amigable, paciente, claro, positivo, alentador, evita jerga, enfócate en la pregunta actual.
+
+"""
+
+# Sin rama (triaje desactivado) van las tres ramas y Gemini decide; con rama, solo las instrucciones de esa rama.
+SISTEMA_CONSULTOR = (
+    _PERSONA_CONSULTOR + "\n**Instrucciones para tu respuesta:**\n\n" + "".join(_INSTRUCCIONES_RAMA.values())
+    + _ESTILO_CONSULTOR
+    + "Ahora, analiza la respuesta del usuario, la pregunta que se le hizo, y sigue las instrucciones (A, B, o C) para generar tu feedback y pregunta(s)."
+)
+SISTEMA_CONSULTOR_RAMA = {
+    rama: _PERSONA_CONSULTOR + "\n**Instrucciones para tu respuesta:**\n\n" + instrucciones + _ESTILO_CONSULTOR
+    + "Ahora, analiza la respuesta del usuario y sigue estas instrucciones para generar tu feedback y pregunta(s)."
+    for rama, instrucciones in _INSTRUCCIONES_RAMA.items()
+}
+
+
+def prompt_feedback(texto_pregunta, detalle_pregunta, respuesta_usuario, nombre_emprendimiento, nombre_emprendedor, rama=None):
+    respuesta, recortados = recortar_respuesta(respuesta_usuario.strip())
+    usuario = f"""Emprendedor: {nombre_emprendedor if nombre_emprendedor else 'tú'}
+Proyecto: "{nombre_emprendimiento if nombre_emprendimiento else 'tu idea'}"
+Pregunta: "{texto_pregunta}"
+Detalle de la pregunta: "{detalle_pregunta}"
+Respuesta: "{respuesta if respuesta else 'Parece que aún no has respondido o tu respuesta es muy breve.'}"
+"""
+    sistema = SISTEMA_CONSULTOR if rama is None else SISTEMA_CONSULTOR_RAMA[rama]
+    sistema = sistema.replace("{nombre_emprendedor}", nombre_emprendedor if nombre_emprendedor else "crack")
+    return Prompt(sistema, usuario, recortados)
+
+
+# --- Digesto de una respuesta ---
+SISTEMA_DIGESTO = """Eres un analista de negocios. Resume la respuesta de un emprendedor a una pregunta del cuestionario sobre su emprendimiento; el mensaje indica el emprendimiento, la pregunta y la respuesta.
+
+Escribe un digesto de como máximo 60 palabras, en viñetas Markdown:
+- Idea principal.
+- Datos concretos (cifras, clientes, canales, nombres), si los hay.
+- Lo que falta o queda ambiguo, solo si es relevante.
+No inventes información ni añadas recomendaciones."""
+
+
+def prompt_digesto(texto_pregunta, respuesta_usuario, nombre_emprendimiento):
+    respuesta, recortados = recortar_respuesta(respuesta_usuario, PRESUPUESTO_DIGESTO)
+    usuario = f"""Emprendimiento: "{nombre_emprendimiento if nombre_emprendimiento else 'su emprendimiento'}"
+Pregunta: {texto_pregunta}
+Respuesta: {respuesta}
+"""
+    return Prompt(SISTEMA_DIGESTO, usuario, recortados)
+
+
+# --- Resumen ejecutivo y pitch ---
+_PERSONA_REDACTOR = """Eres un consultor de negocios y redactor experto, especializado en crear narrativas convincentes para emprendimientos. Tu tono es claro, profesional pero amigable, y muy persuasivo.
+Estás ayudando a un emprendedor a articular la esencia de su proyecto. En cada mensaje recibirás su nombre, el nombre del proyecto y la información clave recopilada a través de un cuestionario.
+"""
+
+_REQUISITOS_RESUMEN = """1.  Ser un texto narrativo fluido y coherente, no solo una lista de puntos.
+2.  Tener una extensión de aproximadamente 300-500 palabras.
+3.  Presentar una visión clara y completa de la empresa, como si se lo estuvieras explicando a un posible inversionista o socio estratégico.
+4.  Ser amigable, profesional y fácil de entender, evitando jerga innecesaria.
+5.  Integrar la información más relevante de TODAS las respuestas proporcionadas, creando una historia convincente sobre el negocio.
+6.  Cubrir aspectos clave como: El Problema u Oportunidad, La Solución/Idea de Negocio, Propuesta de Valor Única (su "Porqué" o diferenciador clave), Público Objetivo, Modelo de Negocio, Estrategia de Marketing/Promoción (ideas principales), y Visión a Futuro (si se infiere).
+7.  El "Porqué" o propósito fundamental del negocio (basado en Simon Sinek) debe ser un hilo conductor si la información lo permite, pero sin forzarlo si no es evidente.
+"""
+
+_REQUISITOS_PITCH = """1.  Ser más conversacional y directo.
+2.  Diseñado para ser entregado verbalmente en aproximadamente 3 minutos (alrededor de 400-450 palabras).
+3.  Seguir una estructura clara: Problema, Solución, Mercado, Modelo de Negocio, Equipo (si se infiere o asumir emprendedor apasionado), "Porqué" (si es fuerte), y una llamada a la acción o visión concisa.
+4.  Ser enérgico y memorable.
+"""
+
+_CIERRE_REDACTOR = """Asegúrate de basarte SÓLO en la información proporcionada. Si falta información crítica para algún aspecto, puedes omitirlo elegantemente o construir la narrativa con lo que sí tienes. Prioriza la claridad y la persuasión."""
+
+SISTEMA_RESUMEN_PITCH = f"""{_PERSONA_REDACTOR}
+**TAREA PRINCIPAL: RESUMEN EJECUTIVO DETALLADO**
+
+Tu primera y más importante tarea es redactar un **Resumen Ejecutivo Detallado** del proyecto.
+Este resumen debe:
+{_REQUISITOS_RESUMEN}
+**TAREA SECUNDARIA: BORRADOR DE PITCH DE ELEVADOR (3 MINUTOS)**
+
+Después del Resumen Ejecutivo, crea un **Borrador de Pitch de Elevador**.
+Este pitch debe:
+{_REQUISITOS_PITCH}
+**Formato de tu respuesta:**
+Utiliza Markdown para formatear tu respuesta. Separa claramente el Resumen Ejecutivo del Borrador del Pitch con los dos encabezados de segundo nivel (##) que se indican en el mensaje, tal cual:
+
+---
+[Encabezado del resumen]
+
+[Aquí va tu texto narrativo detallado, integrando la información de las respuestas en una explicación clara y amigable para un inversionista.]
+
+---
+[Encabezado del pitch]
+
+[Aquí va tu borrador de pitch, más conversacional y directo.]
+
+---
+
+{_CIERRE_REDACTOR}"""
+
+_FORMATO_SECCION = f"""
+**Formato de tu respuesta:**
+Utiliza Markdown. Escribe únicamente el texto de esta sección, sin título ni encabezados de segundo nivel (##): el encabezado se añade aparte.
+
+{_CIERRE_REDACTOR}"""
+
+SISTEMA_SECCION = {
+    "resumen": f"""{_PERSONA_REDACTOR}
+**TAREA: RESUMEN EJECUTIVO DETALLADO**
+
+Redacta un **Resumen Ejecutivo Detallado** del proyecto.
+Este resumen debe:
+{_REQUISITOS_RESUMEN}{_FORMATO_SECCION}""",
+    "pitch": f"""{_PERSONA_REDACTOR}
+**TAREA: BORRADOR DE PITCH DE ELEVADOR (3 MINUTOS)**
+
+Crea un **Borrador de Pitch de Elevador**.
+Este pitch debe:
+{_REQUISITOS_PITCH}{_FORMATO_SECCION}""",
+}
+
+
+def _usuario_redactor(texto_respuestas_formateado, nombre_emprendimiento, nombre_emprendedor):
+    return f"""Emprendedor: {nombre_emprendedor if nombre_emprendedor else 'un emprendedor'}
+Proyecto: "{nombre_emprendimiento if nombre_emprendimiento else 'su emprendimiento'}"
+
+{texto_respuestas_formateado}"""
+
+
+def prompt_resumen_pitch(texto_respuestas_formateado, nombre_emprendimiento, nombre_emprendedor, encabezados, tokens_recortados=0):
+    """`encabezados` son los dos títulos ## (resumen y pitch) que debe llevar la respuesta."""
+    usuario = (
+        _usuario_redactor(texto_respuestas_formateado, nombre_emprendimiento, nombre_emprendedor)
+        + "\nEncabezados:\n" + "\n".join(encabezados) + "\n"
+    )
+    return Prompt(SISTEMA_RESUMEN_PITCH, usuario, tokens_recortados)
+
+
+def prompt_seccion(seccion, texto_respuestas_formateado, nombre_emprendimiento, nombre_emprendedor, tokens_recortados=0):
+    usuario = _usuario_redactor(texto_respuestas_formateado, nombre_emprendimiento, nombre_emprendedor)
+    return Prompt(SISTEMA_SECCION[seccion], usuario, tokens_recortados)
@@ -0,0 +1,253 @@
+"""Registro de modelos de Gemini y enrutado por nivel de calidad.
+
+Cada tipo de llamada usa un nivel:
+    "rapido":  feedback por pregunta y digestos (barato y de baja latencia)
+    "calidad": resumen ejecutivo y pitch
+
+Cada nivel tiene una lista ordenada de modelos candidatos. Se usa el primero que esté sano; un modelo
+deja de estarlo durante CONSULTOR_MODELOS_PAUSA segundos si su última llamada falló o si su latencia
+media (EWMA) supera el presupuesto del nivel. Pasado ese tiempo vuelve a recibir llamadas y sus
+estadísticas se actualizan con ellas. Las estadísticas salen de los spans de metricas.py (el registro se
+suscribe como hook), así que cuentan todas las llamadas del proceso, salvo las canceladas por quien las
+esperaba. Un plazo vencido cuenta como muestra de latencia, no como fallo.
+
+La lista de modelos disponibles (la que imprime check_models.py) se guarda en disco y no se pide al
+arrancar: si falta o ha caducado, se refresca en segundo plano con la primera llamada real a Gemini.
+Sin catálogo se asume que todos los candidatos existen.
+
+Configuración por variables de entorno:
+    CONSULTOR_MODELOS_RAPIDO           candidatos del nivel rápido, separados por comas
+    CONSULTOR_MODELOS_CALIDAD          candidatos del nivel de calidad, separados por comas
+    CONSULTOR_PRESUPUESTO_RAPIDO       segundos de latencia media tolerados en el nivel rápido (por defecto 10)
+    CONSULTOR_PRESUPUESTO_CALIDAD      segundos de latencia media tolerados en el nivel de calidad (por defecto 60)
+    CONSULTOR_MODELOS_PAUSA            segundos que un modelo degradado deja de usarse (por defecto 120)
+    CONSULTOR_MODELOS_RUTA             catálogo en disco (por defecto .consultor_cache/modelos.json)
+    CONSULTOR_MODELOS_TTL_HORAS        horas tras las que se refresca el catálogo (por defecto 24)
+"""
+import json
+import os
+import threading
+import time
+
+import metricas
+
+NIVEL_RAPIDO = "rapido"
+NIVEL_CALIDAD = "calidad"
+
+
+def _lista(variable, por_defecto):
+    return [modelo.strip() for modelo in os.getenv(variable, por_defecto).split(",") if modelo.strip()]
+
+
+CANDIDATOS = {
+    NIVEL_RAPIDO: _lista("CONSULTOR_MODELOS_RAPIDO", "gemini-1.5-flash-latest,gemini-1.5-flash-8b-latest"),
+    NIVEL_CALIDAD: _lista("CONSULTOR_MODELOS_CALIDAD", "gemini-1.5-pro-latest,gemini-1.5-flash-latest"),
+}
+PRESUPUESTOS = {
+    NIVEL_RAPIDO: float(os.getenv("CONSULTOR_PRESUPUESTO_RAPIDO", "10")),
+    NIVEL_CALIDAD: float(os.getenv("CONSULTOR_PRESUPUESTO_CALIDAD", "60")),
+}
+PAUSA_SEGUNDOS = float(os.getenv("CONSULTOR_MODELOS_PAUSA", "120"))
+RUTA_CATALOGO = os.getenv(
+    "CONSULTOR_MODELOS_RUTA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".consultor_cache", "modelos.json"),
+)
+TTL_CATALOGO = float(os.getenv("CONSULTOR_MODELOS_TTL_HORAS", "24")) * 3600
+PESO_EWMA = 0.3
+# Espera tras un refresco fallido del catálogo; se duplica con cada fallo seguido, hasta el TTL.
+ESPERA_REFRESCO_FALLIDO = 60.0
+
+
+# --- Catálogo de modelos disponibles ---
+def descubrir_modelos(api_key):
+    """Modelos de la cuenta que admiten generateContent, sin el prefijo "models/". Llama a la API."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return sorted(
+        m.name.removeprefix("models/")
+        for m in genai.list_models()
+        if "generateContent" in m.supported_generation_methods
+    )
+
+
+def cargar_catalogo(ruta=RUTA_CATALOGO):
+    """{"actualizado": epoch, "modelos": [...]} o None si no hay catálogo legible."""
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            catalogo = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(catalogo.get("modelos"), list):
+        return None
+    return catalogo
+
+
+def guardar_catalogo(modelos, ruta=RUTA_CATALOGO):
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    catalogo = {"actualizado": time.time(), "modelos": sorted(modelos)}
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(catalogo, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)  # Atómico: otros procesos nunca leen un archivo a medias
+    return catalogo
+
+
+class EstadoModelo:
+    def __init__(self):
+        self.latencia_ewma = None
+        self.llamadas = 0
+        self.errores = 0
+        self.ultimo_fallo = False
+        self.ultimo_uso = 0.0
+
+    def observar(self, duracion, fallo, ahora):
+        self.llamadas += 1
+        self.ultimo_uso = ahora
+        self.ultimo_fallo = fallo
+        if fallo:
+            self.errores += 1
+        elif self.latencia_ewma is None:
+            self.latencia_ewma = duracion
+        else:
+            self.latencia_ewma = PESO_EWMA * duracion + (1 - PESO_EWMA) * self.latencia_ewma
+
+
+class RegistroModelos:
+    def __init__(self, candidatos=None, presupuestos=None, pausa=PAUSA_SEGUNDOS, ruta_catalogo=RUTA_CATALOGO,
+                 ttl_catalogo=TTL_CATALOGO, reloj=time.monotonic):
+        self.candidatos_configurados = {nivel: list(modelos) for nivel, modelos in (candidatos or CANDIDATOS).items()}
+        self.presupuestos = dict(presupuestos or PRESUPUESTOS)
+        self.pausa = pausa
+        self.ruta_catalogo = ruta_catalogo
+        self.ttl_catalogo = ttl_catalogo
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._estados = {}
+        self._refresco_lanzado = False
+        self._fallos_refresco = 0
+        self._refresco_no_antes_de = 0.0
+        catalogo = cargar_catalogo(ruta_catalogo) if ruta_catalogo else None
+        self.catalogo = set(catalogo["modelos"]) if catalogo else None
+        self.catalogo_actualizado = catalogo["actualizado"] if catalogo else None
+
+    def modelo_cache(self, nivel):
+        """Modelo con el que se firman las claves de caché del nivel: las respuestas de los respaldos del
+        mismo nivel se consideran equivalentes, así que un cambio de ruta no invalida la caché."""
+        return self.candidatos_configurados[nivel][0]
+
+    def _disponibles(self, nivel):
+        configurados = self.candidatos_configurados[nivel]
+        if self.catalogo is None:
+            return configurados
+        # Si ninguno figura en el catálogo (nombres nuevos o catálogo viejo), mejor intentarlo que no llamar.
+        return [modelo for modelo in configurados if modelo in self.catalogo] or configurados
+
+    def _degradado(self, modelo, nivel, ahora):
+        estado = self._estados.get(modelo)
+        if estado is None or ahora - estado.ultimo_uso >= self.pausa:
+            return False
+        if estado.ultimo_fallo:
+            return True
+        return estado.latencia_ewma is not None and estado.latencia_ewma > self.presupuestos[nivel]
+
+    def candidatos(self, nivel):
+        """Modelos del nivel en el orden en que se deben probar: los sanos primero, los degradados al final."""
+        ahora = self._reloj()
+        with self._lock:
+            disponibles = self._disponibles(nivel)
+            sanos = [modelo for modelo in disponibles if not self._degradado(modelo, nivel, ahora)]
+            return sanos + [modelo for modelo in disponibles if modelo not in sanos]
+
+    def elegir(self, nivel):
+        return self.candidatos(nivel)[0]
+
+    def observar(self, modelo, duracion, fallo):
+        with self._lock:
+            self._estados.setdefault(modelo, EstadoModelo()).observar(duracion, fallo, self._reloj())
+
+    def observar_span(self, span):
+        """Hook de metricas: cada llamada al LLM actualiza las estadísticas de su modelo."""
+        modelo = span.atributos.get("modelo")
+        resultado = span.atributos.get("resultado")
+        if modelo is None or resultado is None:
+            return  # No es una llamada al LLM (p. ej. el span de un rerun)
+        if resultado == "cancelada":
+            return  # La abandonó quien la esperaba (rerun, sesión cerrada): no dice nada del modelo
+        # Un plazo vencido no es un fallo del modelo (el plazo puede ser el que le quedaba al resumen), pero
+        # su duración es una cota inferior de su latencia: si el modelo es lento, la EWMA lo degradará.
+        self.observar(modelo, span.duracion, resultado not in ("ok", "plazo"))
+
+    def actualizar_en_segundo_plano(self, api_key):
+        """Refresca el catálogo en un hilo si falta o caducó; nunca dos refrescos a la vez y, tras un fallo,
+        no antes de la espera de reintento."""
+        with self._lock:
+            if self._refresco_lanzado or not api_key or not self.ruta_catalogo:
+                return
+            if time.time() < self._refresco_no_antes_de:
+                return
+            if self.catalogo_actualizado is not None and time.time() - self.catalogo_actualizado < self.ttl_catalogo:
+                return
+            self._refresco_lanzado = True
+        threading.Thread(target=self._refrescar, args=(api_key,), name="catalogo-modelos", daemon=True).start()
+
+    def _refrescar(self, api_key):
+        try:
+            catalogo = guardar_catalogo(descubrir_modelos(api_key), self.ruta_catalogo)
+        except Exception as e:
+            print(f"No se pudo actualizar el catálogo de modelos: {e}")
+            with self._lock:
+                self._fallos_refresco += 1
+                espera = min(ESPERA_REFRESCO_FALLIDO * 2 ** (self._fallos_refresco - 1), self.ttl_catalogo)
+                self._refresco_no_antes_de = time.time() + espera
+                self._refresco_lanzado = False
+            return
+        with self._lock:
+            self.catalogo = set(catalogo["modelos"])
+            self.catalogo_actualizado = catalogo["actualizado"]
+            self._fallos_refresco = 0
+            self._refresco_lanzado = False
+
+    def estadisticas(self):
+        ahora = self._reloj()
+        with self._lock:
+            modelos = {}
+            for modelo, estado in sorted(self._estados.items()):
+                modelos[modelo] = {
+                    "llamadas": estado.llamadas,
+                    "errores": estado.errores,
+                    "latencia_ewma_s": estado.latencia_ewma or 0.0,
+                    "degradado_en": [nivel for nivel in self.candidatos_configurados if self._degradado(modelo, nivel, ahora)],
+                }
+        return {
+            "rutas": {nivel: self.candidatos(nivel)[0] for nivel in self.candidatos_configurados},
+            "modelos": modelos,
+            "catalogo": len(self.catalogo) if self.catalogo is not None else None,
+        }
+
+
+_registro_global = None
+_registro_lock = threading.Lock()
+
+
+def configurar_registro(**opciones):
+    """Sustituye el registro del proceso (p. ej. con candidatos de prueba y sin catálogo en disco)."""
+    global _registro_global
+    with _registro_lock:
+        if _registro_global is not None:
+            metricas.quitar_hook(_registro_global.observar_span)
+        _registro_global = RegistroModelos(**opciones)
+        metricas.registrar_hook(_registro_global.observar_span)
+        return _registro_global
+
+
+def obtener_registro():
+    """Instancia única por proceso; se suscribe a los spans de metricas al crearse."""
+    global _registro_global
+    with _registro_lock:
+        if _registro_global is None:
+            _registro_global = RegistroModelos()
+            metricas.registrar_hook(_registro_global.observar_span)
+        return _registro_global
@@ -0,0 +1,250 @@
+"""Persistencia de las sesiones de los emprendedores entre recargas, desconexiones y reinicios.
+
+El estado de cada sesión (respuestas, feedback, ediciones, resumen y pitch y la posición en el flujo) se
+guarda bajo un token aleatorio que viaja en la URL (?sesion=...). Al volver con ese token, la sesión se
+restaura tal cual, sin llamar a la IA.
+
+Las escrituras son diferidas: la app solo deja la instantánea en memoria y un hilo las vuelca a SQLite
+por lotes cada CONSULTOR_SESIONES_INTERVALO segundos (y al salir del proceso). El mismo hilo compacta el
+almacén: borra las sesiones caducadas, recorta las más antiguas por encima del máximo y devuelve el
+espacio libre al sistema.
+
+Configuración por variables de entorno:
+    CONSULTOR_SESIONES=0               desactiva la persistencia
+    CONSULTOR_SESIONES_RUTA            archivo SQLite (por defecto .consultor_cache/sesiones.sqlite3)
+    CONSULTOR_SESIONES_TTL_DIAS        días sin actividad tras los que se borra una sesión (por defecto 30)
+    CONSULTOR_SESIONES_MAX             sesiones máximas guardadas (por defecto 10000)
+    CONSULTOR_SESIONES_INTERVALO       segundos entre volcados a disco (por defecto 1)
+"""
+import atexit
+import copy
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+
+SESIONES_ACTIVAS = os.getenv("CONSULTOR_SESIONES", "1") != "0"
+RUTA_SQLITE = os.getenv(
+    "CONSULTOR_SESIONES_RUTA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".consultor_cache", "sesiones.sqlite3"),
+)
+TTL_SEGUNDOS = float(os.getenv("CONSULTOR_SESIONES_TTL_DIAS", "30")) * 24 * 3600
+MAX_SESIONES = int(os.getenv("CONSULTOR_SESIONES_MAX", "10000"))
+INTERVALO_VOLCADO = float(os.getenv("CONSULTOR_SESIONES_INTERVALO", "1"))
+INTERVALO_COMPACTACION = 3600
+MAX_LOTE = 200
+
+# Claves de st.session_state que se guardan. Las de CLAVES_POR_PREGUNTA son dicts indexados por el id
+# (entero) de la pregunta; JSON los convierte en texto y se deshace al cargar.
+CLAVES_SESION = (
+    "nombre_emprendimiento", "nombre_emprendedor", "info_inicial_guardada", "pregunta_actual_idx",
+    "respuestas", "feedback_consultor", "edit_counts", "editando_pregunta_id",
+    "volver_a_resumen_despues_de_editar", "resumen_y_pitch", "digestos_respuestas",
+)
+CLAVES_POR_PREGUNTA = {"respuestas", "feedback_consultor", "edit_counts", "digestos_respuestas"}
+
+_PATRON_TOKEN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def nuevo_token():
+    return secrets.token_urlsafe(16)
+
+
+def token_valido(token):
+    return isinstance(token, str) and bool(_PATRON_TOKEN.match(token))
+
+
+def instantanea(session_state):
+    """Copia profunda de las claves persistentes, para que los reruns no muten lo encolado ni lo comparado."""
+    return {clave: copy.deepcopy(session_state[clave]) for clave in CLAVES_SESION if clave in session_state}
+
+
+def serializar(estado):
+    return zlib.compress(json.dumps(estado, ensure_ascii=False).encode("utf-8"))
+
+
+def deserializar(datos):
+    estado = json.loads(zlib.decompress(datos).decode("utf-8"))
+    for clave in CLAVES_POR_PREGUNTA & estado.keys():
+        estado[clave] = {int(q_id): valor for q_id, valor in estado[clave].items()}
+    return estado
+
+
+class AlmacenSesiones(ABC):
+    """Interfaz mínima de un almacén de sesiones. escribir_lote recibe {token: estado, o None para borrar}."""
+
+    @abstractmethod
+    def cargar(self, token):
+        """Estado guardado del token, o None si no existe o caducó."""
+
+    @abstractmethod
+    def escribir_lote(self, cambios):
+        """Aplica {token: estado, o None para borrar} de una vez."""
+
+    @abstractmethod
+    def compactar(self):
+        """Borra lo caducado y lo que sobra; devuelve cuántas sesiones borró."""
+
+
+class AlmacenSQLite(AlmacenSesiones):
+    def __init__(self, ruta=RUTA_SQLITE, ttl=TTL_SEGUNDOS, max_sesiones=MAX_SESIONES):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_sesiones = max_sesiones
+        self._local = threading.local()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._conexion() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS sesiones ("
+                " token TEXT PRIMARY KEY, estado BLOB NOT NULL,"
+                " creado REAL NOT NULL, actualizado REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_sesiones_actualizado ON sesiones(actualizado)")
+
+    def _conexion(self):
+        # Una conexión por hilo, como en cache_ia.CacheSQLite.
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=5.0)
+            # Solo surte efecto en una base nueva; permite devolver páginas libres con incremental_vacuum.
+            con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def cargar(self, token):
+        with self._conexion() as con:
+            fila = con.execute("SELECT estado, actualizado FROM sesiones WHERE token = ?", (token,)).fetchone()
+        if fila is None or fila[1] < time.time() - self.ttl:
+            return None
+        return deserializar(fila[0])
+
+    def escribir_lote(self, cambios):
+        ahora = time.time()
+        guardar = [(token, serializar(estado), ahora, ahora) for token, estado in cambios.items() if estado is not None]
+        borrar = [(token,) for token, estado in cambios.items() if estado is None]
+        with self._conexion() as con:
+            con.executemany(
+                "INSERT INTO sesiones (token, estado, creado, actualizado) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(token) DO UPDATE SET estado = excluded.estado, actualizado = excluded.actualizado",
+                guardar,
+            )
+            con.executemany("DELETE FROM sesiones WHERE token = ?", borrar)
+
+    def compactar(self):
+        """Borra caducadas y sobrantes, y libera el espacio del archivo. Devuelve cuántas sesiones borró."""
+        with self._conexion() as con:
+            borradas = con.execute("DELETE FROM sesiones WHERE actualizado < ?", (time.time() - self.ttl,)).rowcount
+            exceso = con.execute("SELECT COUNT(*) FROM sesiones").fetchone()[0] - self.max_sesiones
+            if exceso > 0:
+                borradas += con.execute(
+                    "DELETE FROM sesiones WHERE token IN (SELECT token FROM sesiones ORDER BY actualizado ASC LIMIT ?)",
+                    (exceso,),
+                ).rowcount
+        con.execute("PRAGMA incremental_vacuum").fetchall()
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return borradas
+
+
+class EscrituraDiferida:
+    """Delante de un almacén: las escrituras se acumulan en memoria y un hilo las vuelca por lotes.
+
+    Solo se guarda el último estado de cada token, así que varios reruns seguidos de una misma sesión
+    cuestan una sola escritura. cargar() consulta primero lo pendiente para leer lo que se acaba de escribir
+    (y devuelve una copia: quien la reciba puede modificarla sin tocar lo encolado).
+    """
+
+    def __init__(self, almacen, intervalo=INTERVALO_VOLCADO, max_lote=MAX_LOTE, intervalo_compactacion=INTERVALO_COMPACTACION):
+        self.almacen = almacen
+        self.intervalo = intervalo
+        self.max_lote = max_lote
+        self.intervalo_compactacion = intervalo_compactacion
+        self._condicion = threading.Condition()
+        self._pendientes = {}
+        self._volcando = {}
+        self._ultima_compactacion = time.monotonic() - intervalo_compactacion  # Compacta al arrancar
+        self.contadores = {"escrituras": 0, "lotes": 0, "errores": 0, "compactadas": 0}
+        self._hilo = threading.Thread(target=self._bucle, name="sesiones-escritura", daemon=True)
+        self._hilo.start()
+        atexit.register(self.vaciar)
+
+    def guardar(self, token, estado):
+        with self._condicion:
+            self._pendientes[token] = estado
+            if len(self._pendientes) >= self.max_lote:
+                self._condicion.notify()
+
+    def borrar(self, token):
+        self.guardar(token, None)
+
+    def cargar(self, token):
+        with self._condicion:
+            for cola in (self._pendientes, self._volcando):
+                if token in cola:
+                    return copy.deepcopy(cola[token])
+        return self.almacen.cargar(token)
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(lambda: len(self._pendientes) >= self.max_lote, timeout=self.intervalo)
+            self.vaciar()
+            if time.monotonic() - self._ultima_compactacion >= self.intervalo_compactacion:
+                self._ultima_compactacion = time.monotonic()
+                try:
+                    self.contadores["compactadas"] += self.almacen.compactar()
+                except sqlite3.Error as e:
+                    print(f"Error compactando el almacén de sesiones: {e}")
+
+    def vaciar(self):
+        """Vuelca lo pendiente de forma síncrona (lo usa el hilo y atexit)."""
+        with self._condicion:
+            if not self._pendientes:
+                return
+            lote, self._pendientes = self._pendientes, {}
+            self._volcando = lote
+        try:
+            self.almacen.escribir_lote(lote)
+            self.contadores["escrituras"] += len(lote)
+            self.contadores["lotes"] += 1
+        except sqlite3.Error as e:
+            print(f"Error guardando sesiones: {e}")
+            self.contadores["errores"] += 1
+            with self._condicion:
+                # Se reintenta en el siguiente volcado, salvo que ya haya un estado más reciente.
+                for token, estado in lote.items():
+                    self._pendientes.setdefault(token, estado)
+        finally:
+            with self._condicion:
+                self._volcando = {}
+
+    def estadisticas(self):
+        with self._condicion:
+            return {"pendientes": len(self._pendientes), **self.contadores}
+
+
+_almacen_global = None
+_almacen_lock = threading.Lock()
+
+
+def obtener_almacen_sesiones():
+    """Instancia única por proceso. Devuelve None si la persistencia está desactivada o no se pudo abrir."""
+    global _almacen_global
+    if not SESIONES_ACTIVAS:
+        return None
+    with _almacen_lock:
+        if _almacen_global is None:
+            try:
+                _almacen_global = EscrituraDiferida(AlmacenSQLite())
+            except (sqlite3.Error, OSError) as e:
+                print(f"No se pudo abrir el almacén de sesiones; no se guardarán: {e}")
+                _almacen_global = False
+        return _almacen_global or None
@@ -0,0 +1,110 @@
+"""Generación de feedback en segundo plano.
+
+El pool de hilos es uno por proceso y está acotado (CONSULTOR_HILOS_FEEDBACK, por defecto 4).
+Cada sesión tiene su propio FeedbackEnSegundoPlano, guardado en st.session_state. Los hilos del
+pool nunca tocan st.session_state: dejan el texto en el gestor y el script lo recoge en el siguiente rerun.
+
+Cada tarea recibe un plazos_llm.Plazo (argumento `plazo`) que se cancela si la sesión se cierra, si el
+gestor se cierra (cerrar()) o si una petición nueva para la misma pregunta la sustituye.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from plazos_llm import Plazo
+
+HILOS_FEEDBACK = int(os.getenv("CONSULTOR_HILOS_FEEDBACK", "4"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HILOS_FEEDBACK, thread_name_prefix="feedback-ia")
+        return _pool
+
+
+class FeedbackEnSegundoPlano:
+    """Tareas de feedback de una sesión, con como mucho una generación en curso por pregunta.
+
+    Si se encola una pregunta que ya se está generando, la nueva petición espera a que termine la
+    actual y el resultado de esta se descarta por obsoleto.
+    """
+
+    def __init__(self, pool=None, sesion_cerrada=None):
+        self._pool = pool if pool is not None else obtener_pool()
+        # Función sin argumentos que devuelve True cuando la sesión dueña ya no existe (ver plazos_llm).
+        self._sesion_cerrada = sesion_cerrada
+        # Reentrante: cancel() y add_done_callback() pueden ejecutar el callback en el hilo que llama.
+        self._lock = threading.RLock()
+        self._en_curso = {}
+        self._plazos = {}
+        self._siguiente = {}
+        self._listos = {}
+        self._cerrado = False
+
+    def encolar(self, q_id, funcion, *args):
+        with self._lock:
+            if self._cerrado:
+                return
+            self._listos.pop(q_id, None)
+            futuro = self._en_curso.get(q_id)
+            if futuro is not None and not futuro.cancel() and not futuro.done():
+                # La generación en curso ya es obsoleta: se le pide que pare para que la nueva empiece antes.
+                self._plazos[q_id].cancelar("sustituida")
+                self._siguiente[q_id] = (funcion, args)
+                return
+            self._lanzar(q_id, funcion, args)
+
+    def _cancelada(self):
+        return self._cerrado or (self._sesion_cerrada is not None and self._sesion_cerrada())
+
+    def _lanzar(self, q_id, funcion, args):
+        plazo = Plazo(cancelada=self._cancelada)
+        futuro = self._pool.submit(funcion, *args, plazo=plazo)
+        self._en_curso[q_id] = futuro
+        self._plazos[q_id] = plazo
+        futuro.add_done_callback(lambda f: self._terminado(q_id, f))
+
+    def _terminado(self, q_id, futuro):
+        if futuro.cancelled():
+            return
+        with self._lock:
+            if self._cerrado or self._en_curso.get(q_id) is not futuro:
+                return
+            del self._en_curso[q_id]
+            del self._plazos[q_id]
+            siguiente = self._siguiente.pop(q_id, None)
+            if siguiente is not None:
+                self._lanzar(q_id, *siguiente)
+                return
+            try:
+                self._listos[q_id] = futuro.result()
+            except Exception as e:
+                print(f"Error generando feedback en segundo plano: {e}")
+                self._listos[q_id] = "Hubo un error al procesar tu respuesta con la IA. El equipo técnico ha sido notificado."
+
+    def recoger(self):
+        """Devuelve (y olvida) los feedbacks terminados desde la última llamada: {q_id: texto}."""
+        with self._lock:
+            listos, self._listos = self._listos, {}
+            return listos
+
+    def pendientes(self):
+        with self._lock:
+            return set(self._en_curso) | set(self._siguiente)
+
+    def cerrar(self):
+        """Cancela todas las tareas (las que ya llaman a la IA, cooperativamente) y descarta sus resultados."""
+        with self._lock:
+            self._cerrado = True
+            for q_id, futuro in self._en_curso.items():
+                self._plazos[q_id].cancelar("cerrada")
+                futuro.cancel()
+            self._en_curso.clear()
+            self._plazos.clear()
+            self._siguiente.clear()
+            self._listos.clear()
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+# consultor_ia lee la clave al importarse; las pruebas nunca llaman a Gemini.
+os.environ.setdefault("GOOGLE_API_KEY", "clave-pruebas")
+
+
+@pytest.fixture
+def gobernador():
+    from gobernador_llm import GobernadorLLM
+
+    return GobernadorLLM(rpm=0, tpm=0, concurrencia_max=4, reintentos=0, circuito_fallos=3,
+                         circuito_espera=60, espera_max=5, dormir=lambda _: None)
+
+
+@pytest.fixture
+def pasarela(gobernador):
+    from pasarela_llm import PasarelaLLM
+
+    pasarela = PasarelaLLM(gobernador=gobernador)
+    yield pasarela
+    pasarela._bucle.call_soon_threadsafe(pasarela._bucle.stop)
+
+
+@pytest.fixture
+def consultor(monkeypatch, gobernador, pasarela):
+    """consultor_ia sin red, cachés ni triaje, con el gobernador y la pasarela de la prueba. El LLM se fija
+    con consultor.fijar_llm(...)."""
+    import consultor_ia
+    import gobernador_llm
+    import pasarela_llm
+
+    monkeypatch.setattr(gobernador_llm, "_gobernador_global", gobernador)
+    monkeypatch.setattr(pasarela_llm, "_pasarela_global", pasarela)
+    monkeypatch.setattr(consultor_ia, "_llm_inyectado", None)
+    monkeypatch.setattr(consultor_ia, "TRIAJE_ACTIVO", False)
+    monkeypatch.setattr(consultor_ia, "obtener_cache", lambda: None)
+    monkeypatch.setattr(consultor_ia, "obtener_cache_semantica", lambda: None)
+    return consultor_ia
@@ -0,0 +1,15 @@
+import functools
+
+import cache_ia
+
+
+def test_politica_invalida_usa_solo_memoria(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(cache_ia, "CACHE_ACTIVA", True)
+    monkeypatch.setattr(cache_ia, "_cache_global", None)
+    monkeypatch.setattr(cache_ia, "CacheSQLite", functools.partial(
+        cache_ia.CacheSQLite, ruta=str(tmp_path / "cache.sqlite3"), politica="aleatoria"))
+
+    cache = cache_ia.obtener_cache()
+
+    assert cache is not None and cache.disco is None
+    assert "aleatoria" in capsys.readouterr().out
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+import types
+
+import consultor_ia
+import registro_modelos
+
+
+def test_importar_consultor_ia_no_carga_langchain():
+    codigo = "import sys, consultor_ia; print('langchain_google_genai' in sys.modules)"
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+    assert salida.stdout.strip() == "False"
+
+
+def test_el_cliente_se_crea_una_vez_por_modelo(monkeypatch):
+    creados = []
+
+    class ClienteFalso:
+        def __init__(self, **opciones):
+            creados.append(opciones["model"])
+
+    monkeypatch.setitem(sys.modules, "langchain_google_genai", types.SimpleNamespace(ChatGoogleGenerativeAI=ClienteFalso))
+    monkeypatch.setattr(registro_modelos.RegistroModelos, "actualizar_en_segundo_plano", lambda self, api_key: None)
+    monkeypatch.setattr(consultor_ia, "_llm_inyectado", None)
+    consultor_ia._crear_llm.clear()
+    try:
+        primero = consultor_ia.obtener_llm("modelo-a")
+        assert consultor_ia.obtener_llm("modelo-a") is primero
+        assert consultor_ia.obtener_llm("modelo-b") is not primero
+    finally:
+        consultor_ia._crear_llm.clear()
+    assert creados == ["modelo-a", "modelo-b"]
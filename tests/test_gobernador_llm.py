@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from gobernador_llm import CircuitoAbierto
+from llm_falso import ErrorFalso, LLMFalso
+from plazos_llm import LlamadaCancelada, Plazo, PlazoVencido
+
+
+def _fallar(gobernador, veces):
+    llm = LLMFalso(tasa_error=1.0)
+    for _ in range(veces):
+        with pytest.raises(ErrorFalso):
+            gobernador.ejecutar(lambda: llm.invoke([]), 10)
+
+
+def _esperar_libre(gobernador):
+    # La tarea de la pasarela libera su hueco en el hilo del bucle, justo después de cancelarse.
+    limite = time.monotonic() + 2
+    while gobernador.estadisticas()["en_vuelo"] and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert gobernador.estadisticas()["en_vuelo"] == 0
+
+
+def test_errores_transitorios_abren_el_circuito(gobernador):
+    _fallar(gobernador, 3)
+    assert gobernador.estado_circuito() == "abierto"
+    with pytest.raises(CircuitoAbierto):
+        gobernador.ejecutar(lambda: LLMFalso().invoke([]), 10)
+
+
+def test_error_de_cuota_reduce_la_concurrencia_y_los_exitos_la_recuperan(gobernador):
+    llm = LLMFalso(tasa_error=1.0, error="429 Resource exhausted")
+    with pytest.raises(ErrorFalso):
+        gobernador.ejecutar(lambda: llm.invoke([]), 10)
+    assert gobernador.limite_concurrencia == 2
+    for _ in range(2):
+        gobernador.ejecutar(lambda: LLMFalso().invoke([]), 10)
+    assert gobernador.limite_concurrencia == 3
+
+
+def test_stream_abandonado_no_cuenta_como_exito_ni_fallo(gobernador):
+    _fallar(gobernador, 2)
+    flujo = gobernador.transmitir(lambda: LLMFalso(trozos=4).stream([]), 10)
+    next(flujo)
+    flujo.close()
+    assert gobernador._fallos_seguidos == 2
+    assert gobernador._exitos_seguidos == 0
+    assert gobernador.estadisticas()["en_vuelo"] == 0
+
+
+def test_llamada_cancelada_en_la_pasarela_no_reinicia_el_circuito(gobernador, pasarela):
+    _fallar(gobernador, 2)
+    plazo = Plazo()
+    plazo.cancelar("sustituida")
+    with pytest.raises(LlamadaCancelada):
+        pasarela.invocar("clave", LLMFalso(latencia=1.0), [], 10, plazo=plazo)
+    _esperar_libre(gobernador)
+    assert gobernador._fallos_seguidos == 2
+    assert gobernador.estado_circuito() == "cerrado"
+
+
+def test_plazos_vencidos_en_la_pasarela_abren_el_circuito(gobernador, pasarela):
+    # Un servicio colgado: todas las llamadas agotan su plazo.
+    llm = LLMFalso(latencia=5.0)
+    for numero in range(3):
+        with pytest.raises(PlazoVencido):
+            pasarela.invocar(f"clave-{numero}", llm, [], 10, plazo=Plazo(0.05, "feedback"))
+        _esperar_libre(gobernador)
+    assert gobernador.estado_circuito() == "abierto"
+    assert gobernador.limite_concurrencia == 4
+
+
+def test_stream_con_plazo_vencido_en_la_pasarela_cuenta_como_fallo(gobernador, pasarela):
+    flujo = pasarela.transmitir("clave", LLMFalso(latencia=5.0), [], 10, plazo=Plazo(0.05, "resumen"))
+    with pytest.raises(PlazoVencido):
+        list(flujo)
+    _esperar_libre(gobernador)
+    assert gobernador._fallos_seguidos == 1
+
+
+def test_prueba_cancelada_no_cierra_el_circuito(gobernador, pasarela):
+    _fallar(gobernador, 3)
+    gobernador._circuito_abierto_hasta = 0  # Pasa la espera: el circuito queda semiabierto
+    plazo = Plazo()
+    plazo.cancelar("sesion")
+    with pytest.raises(LlamadaCancelada):
+        pasarela.invocar("prueba", LLMFalso(latencia=1.0), [], 10, plazo=plazo)
+    _esperar_libre(gobernador)
+    assert gobernador.estado_circuito() == "semiabierto"
+    # La prueba cancelada deja sitio a otra prueba, que sí decide.
+    gobernador.ejecutar(lambda: LLMFalso().invoke([]), 10)
+    assert gobernador.estado_circuito() == "cerrado"
+
+
+def test_solo_la_prueba_libera_el_turno_de_prueba(gobernador):
+    _fallar(gobernador, 2)
+    gobernador._adquirir(10)  # Una llamada que entró con el circuito aún cerrado
+    _fallar(gobernador, 1)
+    gobernador._circuito_abierto_hasta = 0
+    assert gobernador._adquirir(10) is True
+    gobernador._liberar(tokens_estimados=10, error=ErrorFalso("503"))  # Termina la llamada antigua
+    with pytest.raises(CircuitoAbierto):
+        gobernador._adquirir(10)  # La prueba sigue en curso
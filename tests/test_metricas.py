@@ -0,0 +1,45 @@
+import re
+
+import cache_ia
+import cache_semantica
+import gobernador_llm
+import metricas
+import pasarela_llm
+import registro_modelos
+import sesiones_persistentes
+
+
+def _familias(texto):
+    declaradas = set(re.findall(r"^# TYPE (\S+) ", texto, re.M))
+    usadas = {re.sub(r"_(bucket|sum|count)$", "", linea.split("{")[0].split(" ")[0])
+              for linea in texto.splitlines() if linea and not linea.startswith("#")}
+    return declaradas, usadas
+
+
+def test_exportar_no_crea_componentes(monkeypatch):
+    for modulo, nombre in ((cache_ia, "_cache_global"), (cache_semantica, "_semantica_global"),
+                           (gobernador_llm, "_gobernador_global"), (pasarela_llm, "_pasarela_global"),
+                           (registro_modelos, "_registro_global"),
+                           (sesiones_persistentes, "_almacen_global")):
+        monkeypatch.setattr(modulo, nombre, None)
+
+    metricas.exportar_prometheus()
+
+    assert pasarela_llm._pasarela_global is None
+    assert sesiones_persistentes._almacen_global is None
+    assert cache_ia._cache_global is None
+    assert registro_modelos._registro_global is None
+
+
+def test_cada_serie_tiene_help_y_type(monkeypatch, gobernador, pasarela):
+    monkeypatch.setattr(gobernador_llm, "_gobernador_global", gobernador)
+    monkeypatch.setattr(pasarela_llm, "_pasarela_global", pasarela)
+    monkeypatch.setattr(sesiones_persistentes, "_almacen_global", False)
+
+    texto = metricas.exportar_prometheus()
+
+    declaradas, usadas = _familias(texto)
+    assert "consultor_pasarela_en_vuelo" in usadas
+    assert "consultor_gobernador_circuito" in usadas
+    assert usadas <= declaradas
+    assert set(re.findall(r"^# HELP (\S+) ", texto, re.M)) == declaradas
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_falso import LLMFalso
+
+
+def test_llamadas_identicas_en_vuelo_comparten_una_peticion(pasarela):
+    llm = LLMFalso(latencia=0.3, texto="Feedback compartido")
+    with ThreadPoolExecutor(4) as pool:
+        resultados = list(pool.map(lambda _: pasarela.invocar("clave", llm, [], 10), range(4)))
+
+    assert llm.llamadas == 1
+    assert [respuesta.content for respuesta, _ in resultados] == ["Feedback compartido"] * 4
+    assert sorted(compartida for _, compartida in resultados) == [False, True, True, True]
+    assert pasarela.estadisticas()["coalescidas"] == 3
+
+
+def test_claves_distintas_no_se_comparten(pasarela):
+    llm = LLMFalso(latencia=0.1)
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(lambda clave: pasarela.invocar(clave, llm, [], 10), ("a", "b")))
+    assert llm.llamadas == 2
+
+
+def test_una_llamada_terminada_no_se_reutiliza(pasarela):
+    llm = LLMFalso()
+    pasarela.invocar("clave", llm, [], 10)
+    _, compartida = pasarela.invocar("clave", llm, [], 10)
+    assert not compartida
+    assert llm.llamadas == 2
+
+
+def test_un_suscriptor_tardio_recibe_el_stream_completo(pasarela):
+    llm = LLMFalso(latencia=0.4, texto="Resumen y pitch del emprendimiento.", trozos=8)
+    primero = pasarela.transmitir("clave", llm, [], 10)
+    iterador = iter(primero)
+    inicio = next(iterador).content
+
+    tardio = pasarela.transmitir("clave", llm, [], 10)
+
+    assert tardio.compartida
+    assert "".join(trozo.content for trozo in tardio) == llm.texto
+    assert inicio + "".join(trozo.content for trozo in iterador) == llm.texto
+    assert llm.llamadas == 1
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+import plazos_llm
+from llm_falso import LLMFalso
+from plazos_llm import LlamadaCancelada, Plazo, PlazoVencido
+
+RESPUESTA = "Velas de soja artesanales para regalos de empresa, con aromas locales y envases reutilizables."
+
+
+def _esperar(condicion):
+    limite = time.monotonic() + 3
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert condicion()
+
+
+def _feedback(consultor, plazo=None, medicion=None):
+    pregunta = consultor.preguntas_emprendimiento[0]
+    return consultor.obtener_feedback_gemini(pregunta["texto"], pregunta["detalle"], RESPUESTA, "Velas Sol", "Ana", 0,
+                                             medicion=medicion, plazo=plazo)
+
+
+def test_el_hijo_vence_como_muy_tarde_con_el_padre():
+    padre = Plazo(0.05, "resumen")
+    hijo = padre.hijo("digesto")
+    assert hijo.vence == padre.vence
+    time.sleep(0.06)
+    with pytest.raises(PlazoVencido):
+        hijo.comprobar()
+    assert hijo.vencido
+
+
+def test_el_hijo_se_cancela_con_el_padre():
+    padre = Plazo(tipo="resumen")
+    hijo = padre.hijo("digesto")
+    padre.cancelar("sesion")
+    with pytest.raises(LlamadaCancelada):
+        hijo.comprobar()
+    assert hijo.motivo == "sesion"
+
+
+def test_feedback_lento_devuelve_el_aviso_y_cancela_la_peticion(consultor, pasarela, monkeypatch):
+    monkeypatch.setitem(plazos_llm.PLAZOS, "feedback", 0.1)
+    consultor.fijar_llm(LLMFalso(latencia=5.0))
+    medicion = {}
+
+    texto = _feedback(consultor, medicion=medicion)
+
+    assert texto == medicion["error"] == consultor.MENSAJE_IA_LENTA
+    _esperar(lambda: pasarela.estadisticas()["canceladas"] == 1)
+
+
+def test_feedback_con_el_padre_cancelado_no_llama_a_la_ia(consultor):
+    llm = LLMFalso()
+    consultor.fijar_llm(llm)
+    padre = Plazo()
+    padre.cancelar("sustituida")
+
+    assert _feedback(consultor, plazo=padre) == consultor.MENSAJE_IA_CANCELADA
+    assert llm.llamadas == 0
+
+
+def test_abandonar_el_resumen_cancela_las_secciones(consultor, gobernador, pasarela):
+    consultor.fijar_llm(LLMFalso(latencia=3.0, trozos=30))
+    respuestas = {pregunta["id"]: RESPUESTA for pregunta in consultor.preguntas_emprendimiento}
+    resultado = {}
+    flujo = consultor.transmitir_resumen_y_pitch(respuestas, consultor.preguntas_emprendimiento, "Velas Sol", "Ana",
+                                                 resultado=resultado)
+    next(flujo)
+    flujo.close()
+
+    _esperar(lambda: pasarela.estadisticas()["canceladas"] == 2)
+    _esperar(lambda: gobernador.estadisticas()["en_vuelo"] == 0)
+    assert gobernador._fallos_seguidos == 0
+    assert "texto" not in resultado
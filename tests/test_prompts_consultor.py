@@ -0,0 +1,19 @@
+from prompts_consultor import prompt_feedback
+
+
+def _prompt(nombre, rama):
+    return prompt_feedback("¿Cuál es la idea?", "(detalle)", "Velas de soja artesanales.", "Velas Sol", nombre, rama)
+
+
+def test_la_felicitacion_de_la_rama_c_lleva_el_nombre():
+    for rama in ("C", None):
+        sistema = _prompt("Ana", rama).sistema
+        assert "¡Muy bien, Ana!" in sistema
+        assert "{nombre_emprendedor}" not in sistema
+    assert "¡Muy bien, crack!" in _prompt("", "C").sistema
+
+
+def test_el_prefijo_no_depende_del_emprendedor():
+    ana, luis = _prompt("Ana", None).sistema, _prompt("Luis", None).sistema
+    assert ana.split("¡Muy bien,")[0] == luis.split("¡Muy bien,")[0]
+    assert _prompt("Ana", "A").sistema == _prompt("Luis", "A").sistema
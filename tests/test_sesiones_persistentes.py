@@ -0,0 +1,91 @@
+import pytest
+
+import sesiones_persistentes
+from sesiones_persistentes import AlmacenSesiones, AlmacenSQLite, EscrituraDiferida, instantanea, nuevo_token
+
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    almacen = EscrituraDiferida(AlmacenSQLite(str(tmp_path / "sesiones.sqlite3")), intervalo=3600)
+    monkeypatch.setattr(sesiones_persistentes, "_almacen_global", almacen)
+    return almacen
+
+
+def _estado_en_resumen():
+    respuestas = {q_id: f"Respuesta {q_id} con bastante detalle sobre el emprendimiento." for q_id in range(1, 11)}
+    return {
+        "nombre_emprendimiento": "Velas Sol", "nombre_emprendedor": "Ana", "info_inicial_guardada": True,
+        "pregunta_actual_idx": 10, "respuestas": respuestas,
+        "feedback_consultor": {q_id: f"Feedback {q_id}" for q_id in respuestas},
+        "edit_counts": {}, "editando_pregunta_id": None, "volver_a_resumen_despues_de_editar": False,
+        "resumen_y_pitch": None, "digestos_respuestas": {},
+    }
+
+
+def test_un_almacen_incompleto_falla_al_crearse():
+    class SinCompactar(AlmacenSesiones):
+        def cargar(self, token):
+            return None
+
+        def escribir_lote(self, cambios):
+            pass
+
+    with pytest.raises(TypeError):
+        SinCompactar()
+
+
+def test_guardar_y_cargar_conserva_los_ids_enteros(almacen):
+    token = nuevo_token()
+    almacen.guardar(token, _estado_en_resumen())
+    almacen.vaciar()
+    almacen._pendientes.clear()
+    cargado = almacen.cargar(token)
+    assert cargado == _estado_en_resumen()
+    assert set(cargado["feedback_consultor"]) == set(range(1, 11))
+
+
+def test_cargar_lo_pendiente_devuelve_una_copia(almacen):
+    token = nuevo_token()
+    almacen.guardar(token, _estado_en_resumen())
+    almacen.cargar(token)["feedback_consultor"][3] = "cambiado"
+    assert almacen.cargar(token)["feedback_consultor"][3] == "Feedback 3"
+
+
+def test_instantanea_copia_los_dicts_anidados():
+    estado = _estado_en_resumen()
+    estado["digestos_respuestas"] = {1: {"texto": "digesto"}}
+    copia = instantanea(estado)
+    estado["feedback_consultor"][3] = "cambiado"
+    estado["digestos_respuestas"][1]["texto"] = "otro"
+    assert copia["feedback_consultor"][3] == "Feedback 3"
+    assert copia["digestos_respuestas"][1]["texto"] == "digesto"
+
+
+def test_cambios_en_el_sitio_tras_restaurar_se_persisten(almacen, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    import consultor_ia
+    from gobernador_llm import configurar_gobernador
+    from llm_falso import LLMFalso
+
+    monkeypatch.setenv("CONSULTOR_FEEDBACK_FONDO", "0")
+    configurar_gobernador(rpm=0, tpm=0)
+    consultor_ia.fijar_llm(LLMFalso(texto="Feedback reintentado"))
+    token = nuevo_token()
+    estado = _estado_en_resumen()
+    estado["feedback_consultor"][3] = consultor_ia.MENSAJE_IA_LENTA
+    almacen.guardar(token, estado)
+    almacen.vaciar()  # La sesión se restaura desde SQLite, como tras un reinicio
+
+    at = AppTest.from_file("app.py", default_timeout=60)
+    at.query_params["sesion"] = token
+    at.run()
+    assert not at.exception
+    # reintentar_feedback modifica en el sitio el dict feedback_consultor restaurado.
+    at.button(key="reintentar_feedback_3").click()
+    at.run()
+    assert not at.exception
+    nuevo = at.session_state.feedback_consultor[3]
+    assert nuevo != consultor_ia.MENSAJE_IA_LENTA
+    almacen.vaciar()
+    assert almacen.almacen.cargar(token)["feedback_consultor"][3] == nuevo
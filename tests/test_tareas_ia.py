@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from llm_falso import LLMFalso
+from tareas_ia import FeedbackEnSegundoPlano
+
+
+@pytest.fixture
+def pool():
+    pool = ThreadPoolExecutor(2)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def _esperar_terminadas(gestor):
+    limite = time.monotonic() + 3
+    while gestor.pendientes() and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert not gestor.pendientes()
+
+
+def _tarea_hasta_cancelarla(empezada, plazos):
+    def tarea(plazo):
+        plazos.append(plazo)
+        empezada.set()
+        while True:
+            plazo.comprobar()
+            time.sleep(0.01)
+    return tarea
+
+
+def test_una_peticion_nueva_sustituye_a_la_que_esta_en_curso(pool):
+    gestor = FeedbackEnSegundoPlano(pool=pool)
+    empezada, plazos = threading.Event(), []
+    gestor.encolar(3, _tarea_hasta_cancelarla(empezada, plazos))
+    assert empezada.wait(2)
+
+    gestor.encolar(3, lambda texto, plazo: texto, "Feedback nuevo")
+    _esperar_terminadas(gestor)
+
+    assert plazos[0].motivo == "sustituida"
+    assert gestor.recoger() == {3: "Feedback nuevo"}
+
+
+def test_sustituir_un_feedback_real_cancela_su_llamada(consultor, pasarela, pool):
+    llm = LLMFalso(latencia=5.0)
+    consultor.fijar_llm(llm)
+    pregunta = consultor.preguntas_emprendimiento[0]
+    gestor = FeedbackEnSegundoPlano(pool=pool)
+    argumentos = (pregunta["texto"], pregunta["detalle"], "Velas de soja artesanales para regalos de empresa.",
+                  "Velas Sol", "Ana", 0)
+    gestor.encolar(1, consultor.obtener_feedback_gemini, *argumentos)
+    limite = time.monotonic() + 2
+    while not llm.llamadas and time.monotonic() < limite:
+        time.sleep(0.01)
+
+    gestor.encolar(1, lambda plazo: "Feedback nuevo")
+    _esperar_terminadas(gestor)
+
+    assert gestor.recoger() == {1: "Feedback nuevo"}
+    limite = time.monotonic() + 2
+    while not pasarela.estadisticas()["canceladas"] and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert pasarela.estadisticas()["canceladas"] == 1
+
+
+def test_cerrar_cancela_y_descarta_los_resultados(pool):
+    gestor = FeedbackEnSegundoPlano(pool=pool)
+    empezada, plazos = threading.Event(), []
+    gestor.encolar(5, _tarea_hasta_cancelarla(empezada, plazos))
+    assert empezada.wait(2)
+
+    gestor.cerrar()
+    gestor.encolar(6, lambda plazo: "no debería lanzarse")
+    pool.shutdown(wait=True)
+
+    assert plazos[0].motivo == "cerrada"
+    assert gestor.recoger() == {}
+    assert not gestor.pendientes()
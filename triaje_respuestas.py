@@ -0,0 +1,163 @@
+"""Triaje local de respuestas antes de llamar a Gemini.
+
+Clasifica cada respuesta en las mismas ramas que usa el prompt del consultor:
+    "A": vacía o trivial ("no sé", "vender cosas"...): se responde con una explicación y ejemplos
+         precalculados para esa pregunta, sin llamar a la IA.
+    "B": superficial o general: se envía un prompt corto solo con las instrucciones de la rama B.
+    "C": buena o detallada: se envía un prompt corto solo con las instrucciones de la rama C.
+
+La clasificación usa rasgos baratos: número de palabras con contenido, diversidad léxica y solapamiento
+con el "detalle" de la pregunta. CONSULTOR_TRIAJE=0 la desactiva (siempre prompt completo).
+"""
+import os
+import re
+import threading
+import unicodedata
+
+TRIAJE_ACTIVO = os.getenv("CONSULTOR_TRIAJE", "1") != "0"
+
+PALABRAS_MINIMAS_B = 3      # palabras con contenido por debajo de las cuales la respuesta es trivial (A)
+PALABRAS_ZONA_GRIS = 12     # entre esto y PALABRAS_MINIMAS_C decide el solapamiento con el detalle
+PALABRAS_MINIMAS_C = 25
+DIVERSIDAD_MINIMA_C = 0.45
+SOLAPAMIENTO_MINIMO_C = 0.2
+
+STOPWORDS = {
+    "a", "al", "algo", "como", "con", "de", "del", "el", "ella", "en", "es", "esa", "ese", "eso", "esta", "este",
+    "esto", "ha", "hay", "la", "las", "le", "lo", "los", "mas", "me", "mi", "mis", "muy", "no", "o", "para",
+    "pero", "por", "que", "se", "si", "sin", "sobre", "son", "su", "sus", "tambien", "te", "tu", "tus", "un",
+    "una", "uno", "unos", "unas", "y", "ya", "yo", "etc", "cual", "cuales", "quien", "donde", "cuando",
+}
+
+RESPUESTAS_TRIVIALES = {
+    "no se", "nose", "ns", "no lo se", "no tengo idea", "ni idea", "nada", "ninguno", "ninguna", "n/a", "na",
+    "no aplica", "no sabe", "pendiente", "por definir", "x", "xx", "xxx", "...", "-", "?", "ok", "si", "no",
+    "vender cosas", "vender", "ganar dinero", "hacer dinero",
+}
+
+# Explicación, ejemplos y pregunta guía precalculados para la rama A, por id de pregunta.
+EXPLICACIONES_RAMA_A = {
+    1: ("Esta pregunta busca que cuentes, en pocas frases, qué vas a vender u ofrecer y qué lo hace distinto de lo que ya existe.",
+        ["Una panadería de barrio que hornea pan sin gluten cada mañana y lo entrega en bicicleta.",
+         "Una app que conecta a dueños de mascotas con paseadores verificados de su mismo edificio.",
+         "Clases de robótica los sábados para niños de 8 a 12 años con kits que se llevan a casa."],
+        "Si tuvieras que explicarle tu negocio a un amigo en una sola frase, ¿qué le dirías?"),
+    2: ("Aquí se trata de describir a las personas (o empresas) que te comprarían: quiénes son, qué edad tienen, dónde están y qué necesitan.",
+        ["Mamás y papás que trabajan, de 30 a 45 años, que no tienen tiempo de cocinar entre semana.",
+         "Pequeñas tiendas de barrio que quieren vender por WhatsApp pero no saben cómo organizarse.",
+         "Estudiantes universitarios que buscan ropa de segunda mano a buen precio y con estilo."],
+        "Piensa en tu cliente ideal: ¿cómo es un día normal en su vida y qué problema le resuelves?"),
+    3: ("La propuesta de valor es la razón por la que alguien te elegiría a ti y no a otro: qué ganas le das o qué problema le quitas mejor que nadie.",
+        ["Comida casera saludable a domicilio por menos de lo que cuesta pedir comida rápida.",
+         "Reparación de celulares en 1 hora con garantía de 6 meses.",
+         "Ropa hecha con materiales reciclados que además dona parte de la venta a una causa local."],
+        "¿Qué es lo que tu cliente va a valorar tanto que te recomendaría a sus amigos?"),
+    4: ("El modelo de negocio explica cómo entra el dinero: qué cobras, a quién, cuánto y con qué frecuencia.",
+        ["Venta directa de cada producto con un margen del 40%.",
+         "Suscripción mensual de 30.000 pesos con entregas semanales.",
+         "App gratuita para usuarios que cobra una comisión del 10% a los negocios por cada venta."],
+        "¿Tu cliente te pagará una sola vez, cada mes o cada vez que use tu servicio?"),
+    5: ("Esta pregunta busca tu plan para que la gente se entere de que existes: en qué canales estarás y qué harás para atraer a tus primeros clientes.",
+        ["Publicar videos cortos en TikTok e Instagram mostrando el proceso de elaboración.",
+         "Alianzas con gimnasios del barrio para ofrecer una prueba gratis a sus socios.",
+         "Volantes y una promoción de lanzamiento en la feria local de los domingos."],
+        "¿Dónde pasa el tiempo tu cliente ideal, en internet o en la calle, para que te vea?"),
+    6: ("Aquí se trata de identificar quién más resuelve el mismo problema (directa o indirectamente), qué hacen bien, qué hacen mal y cómo te diferenciarás.",
+        ["Las cadenas de comida rápida: son baratas y rápidas, pero poco saludables.",
+         "Otros talleres de reparación del centro: tienen experiencia, pero tardan días y no dan garantía.",
+         "Hacerlo uno mismo con tutoriales de YouTube: es gratis, pero toma tiempo y sale mal con frecuencia."],
+        "Si tu cliente no te encontrara a ti, ¿qué haría hoy para resolver su problema?"),
+    7: ("Esta pregunta busca que revises qué permisos, registros o impuestos necesita tu negocio para funcionar de forma legal.",
+        ["Registro mercantil en la Cámara de Comercio y RUT para facturar.",
+         "Permiso sanitario si vas a preparar o vender alimentos.",
+         "Licencias de software o derechos de autor si usas contenido de terceros."],
+        "¿Tu negocio maneja alimentos, datos personales, salud o niños? Esos casos suelen tener reglas especiales."),
+    8: ("Aquí se trata de explicar cómo vas a organizar el día a día: quién hace qué, qué herramientas usarás y cómo llevarás las cuentas.",
+        ["Al inicio yo me encargo de ventas y un socio de producción; llevamos las cuentas en una hoja de cálculo.",
+         "Usaremos un sistema de inventario en línea y contrataremos un contador por horas.",
+         "Marketing lo hará una agencia externa y la atención al cliente se hará por WhatsApp Business."],
+        "¿Qué tareas harás tú mismo al principio y cuáles te gustaría delegar más adelante?"),
+    9: ("Esta pregunta busca tu visión: hasta dónde quieres llevar el negocio y por qué lo haces, además de algunas metas concretas.",
+        ["En 3 años, tener 5 puntos de venta en la ciudad y ser la marca de pan saludable más conocida.",
+         "Que ningún niño del barrio se quede sin aprender tecnología por falta de dinero.",
+         "Vender 1.000 suscripciones en el primer año y expandirnos a otra ciudad en el segundo."],
+        "Imagina tu negocio dentro de 5 años: ¿qué te gustaría ver y qué te haría sentir orgulloso/a?"),
+    10: ("Aquí se trata de estimar cuánto dinero necesitas para arrancar y en qué lo vas a gastar: local, equipos, inventario, tecnología, personal...",
+         ["5 millones: 2 para un horno industrial, 1 para el primer inventario y 2 para tres meses de arriendo.",
+          "800 mil pesos para un computador usado y publicidad digital durante los primeros dos meses.",
+          "Empezar desde casa con 300 mil pesos en materiales y reinvertir las primeras ventas."],
+         "¿Cuál es lo mínimo que necesitas comprar o pagar para hacer tu primera venta?"),
+}
+
+
+def _normalizar(texto):
+    sin_tildes = unicodedata.normalize("NFD", texto.lower())
+    return "".join(c for c in sin_tildes if unicodedata.category(c) != "Mn")
+
+
+def _palabras(texto):
+    return re.findall(r"[a-zñ0-9]+", _normalizar(texto))
+
+
+def rasgos(respuesta, detalle):
+    palabras = _palabras(respuesta)
+    contenido = [p for p in palabras if p not in STOPWORDS and len(p) > 1]
+    vocabulario_detalle = {p for p in _palabras(detalle) if p not in STOPWORDS and len(p) > 2}
+    return {
+        "palabras": len(palabras),
+        "palabras_contenido": len(contenido),
+        "diversidad": len(set(contenido)) / len(contenido) if contenido else 0.0,
+        "solapamiento_detalle": len(set(contenido) & vocabulario_detalle) / len(vocabulario_detalle) if vocabulario_detalle else 0.0,
+    }
+
+
+def clasificar_respuesta(respuesta, detalle):
+    """Devuelve "A", "B" o "C" según las ramas del prompt del consultor."""
+    texto = " ".join(_normalizar(respuesta or "").split()).strip(" .!¡?¿")
+    if not texto or texto in RESPUESTAS_TRIVIALES:
+        return "A"
+    r = rasgos(respuesta, detalle)
+    if r["palabras_contenido"] < PALABRAS_MINIMAS_B:
+        return "A"
+    # Una respuesta corta o repetitiva se trata como superficial.
+    if r["palabras"] < PALABRAS_ZONA_GRIS or r["diversidad"] < DIVERSIDAD_MINIMA_C:
+        return "B"
+    if r["palabras"] >= PALABRAS_MINIMAS_C:
+        return "C"
+    # Respuesta de longitud media: cuenta como buena si cubre lo que pide el detalle de la pregunta.
+    return "C" if r["solapamiento_detalle"] >= SOLAPAMIENTO_MINIMO_C else "B"
+
+
+def feedback_rama_a(q_id, nombre_emprendedor):
+    """Explicación y ejemplos precalculados para respuestas vacías o triviales; None si no hay para esa pregunta."""
+    if q_id not in EXPLICACIONES_RAMA_A:
+        return None
+    explicacion, ejemplos, pregunta_guia = EXPLICACIONES_RAMA_A[q_id]
+    nombre = nombre_emprendedor if nombre_emprendedor else "Emprendedor/a"
+    lista_ejemplos = "\n".join(f"- {ejemplo}" for ejemplo in ejemplos)
+    return (
+        f"¡Tranquilo/a, {nombre}! Parece que esta parte todavía no está clara, y eso es normal al empezar. "
+        f"{explicacion}\n\nAlgunos ejemplos para inspirarte:\n{lista_ejemplos}\n\n{pregunta_guia}"
+    )
+
+
+class EstadisticasTriaje:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.por_rama = {"A": 0, "B": 0, "C": 0}
+        self.llamadas_evitadas = 0
+        self.tokens_ahorrados = 0
+
+    def registrar(self, rama, tokens_ahorrados, llamada_evitada=False):
+        with self._lock:
+            self.por_rama[rama] += 1
+            self.tokens_ahorrados += max(0, tokens_ahorrados)
+            if llamada_evitada:
+                self.llamadas_evitadas += 1
+
+    def resumen(self):
+        with self._lock:
+            return {"por_rama": dict(self.por_rama), "llamadas_evitadas": self.llamadas_evitadas, "tokens_ahorrados": self.tokens_ahorrados}
+
+
+estadisticas_triaje = EstadisticasTriaje()